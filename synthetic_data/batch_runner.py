@@ -0,0 +1,509 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+import argparse
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from dotenv import load_dotenv
+from pipeline import create_generators, extract_code
+from generators import get_shared_async_http_client
+from response_cache import ResponseCache
+from dataset_writer import DatasetWriter, sample_id
+from dedupe import CodeDeduper
+from ledger import JobLedger, prompt_key
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.code_utils import eval_manim_code_tiers, DEFAULT_TIER_LADDER
+from utils.manim_worker import ManimWorkerPool
+from utils.eval_cache import EvalCache
+from utils.metrics import span, configure_metrics, get_recorder, record_eval_timings
+
+
+# Maximum number of concurrent calls per stage. LLM stages are async requests
+# on a shared connection pool, renders are CPU bound and run on a process pool.
+DEFAULT_STAGE_LIMITS = {
+    "scene_script": 8,
+    "manim_code": 8,
+    "render": os.cpu_count() or 1,
+}
+
+
+def read_prompts(prompt_file):
+    """
+    Lazily reads user prompts from a prompt file.
+
+    Plain text files contain one prompt per line (blank lines and lines starting
+    with '#' are skipped). JSONL files contain one object per line with a
+    'prompt' or 'user_prompt' key.
+
+    Args:
+        prompt_file (str): Path to the prompt file
+
+    Yields:
+        str: The next user prompt
+    """
+    is_jsonl = prompt_file.endswith(".jsonl")
+    with open(prompt_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or (not is_jsonl and line.startswith("#")):
+                continue
+            if is_jsonl:
+                record = json.loads(line)
+                yield record.get("prompt") or record["user_prompt"]
+            else:
+                yield line
+
+
+class BatchRunner:
+    """
+    Runs the generation pipeline over many prompts concurrently.
+
+    Every prompt flows through the same stages as run_pipeline (scene script,
+    Manim code, evaluation and fix loop). Each stage has its own concurrency
+    limit, so slow API calls never hold back renders and vice versa.
+    """
+    def __init__(self, api_key, stage_limits=None, max_in_flight=None,
+                 max_iterations=5, max_code_iterations=5, warm_pool=False, eval_cache=None,
+                 tiers=DEFAULT_TIER_LADDER, api_type="openai", generator_kwargs=None, max_repeated_errors=3,
+                 candidates=1, dataset_writer=None, deduper=None, ledger=None, metrics_file=None):
+        """
+        Initialize the batch runner.
+
+        Args:
+            api_key (str): The OpenRouter API key
+            stage_limits (dict, optional): Per-stage concurrency limits, merged
+                                           over DEFAULT_STAGE_LIMITS
+            max_in_flight (int, optional): Maximum number of prompts being processed
+                                           at once (defaults to twice the LLM limit)
+            max_iterations (int): Maximum number of scene scripts per prompt
+            max_code_iterations (int): Maximum number of code fix attempts per scene script
+            warm_pool (bool): Whether to render in a ManimWorkerPool instead of fresh interpreters
+            eval_cache (EvalCache, optional): Persistent cache of evaluation results
+            tiers (tuple): Validation tiers each candidate goes through, cheapest first
+            api_type (str): API type of the generators ('openai' or 'replay')
+            generator_kwargs (dict, optional): Additional Generator options (e.g. cache)
+            max_repeated_errors (int): Number of consecutive fix attempts failing with the same
+                                       error signature after which the scene script is replaced
+            candidates (int): Number of code candidates generated and validated concurrently for
+                              every code attempt; the first one that passes wins
+            dataset_writer (DatasetWriter, optional): Receives every validated sample as it completes
+            deduper (CodeDeduper, optional): Near-duplicate index; validated samples whose code
+                                             duplicates an earlier one are marked and not exported
+            ledger (JobLedger, optional): Records every stage output, so a restarted run skips
+                                          finished prompts and replays the rest up to where it stopped
+            metrics_file (str, optional): File the Prometheus metrics are rewritten to after every prompt
+        """
+        self.api_key = api_key
+        self.stage_limits = dict(DEFAULT_STAGE_LIMITS)
+        if stage_limits:
+            self.stage_limits.update(stage_limits)
+        self.max_in_flight = max_in_flight or 2 * self.stage_limits["manim_code"]
+        self.max_iterations = max_iterations
+        self.max_code_iterations = max_code_iterations
+        self.warm_pool = warm_pool
+        self.eval_cache = eval_cache
+        self.tiers = tuple(tiers)
+        self.api_type = api_type
+        self.generator_kwargs = generator_kwargs or {}
+        self.max_repeated_errors = max_repeated_errors
+        self.candidates = max(1, candidates)
+        self.dataset_writer = dataset_writer
+        self.deduper = deduper
+        self.ledger = ledger
+        self.metrics_file = metrics_file
+        if ledger is not None and dataset_writer is not None:
+            dataset_writer.on_shard_closed = ledger.mark_exported
+
+    async def _llm(self, stage, fn, *args, **kwargs):
+        """Await an async generator call under the stage's concurrency limit"""
+        with span(stage, stage=stage) as stage_span:
+            queued = time.perf_counter()
+            async with self._semaphores[stage]:
+                stage_span.set(queue_seconds=time.perf_counter() - queued)
+                return await fn(*args, **kwargs)
+
+    async def _step(self, key, stage, iteration, code_iteration, compute):
+        """Returns a step's output recorded in the ledger, or computes and records it"""
+        if self.ledger is not None:
+            output = self.ledger.get_step(key, stage, iteration, code_iteration)
+            if output is not None:
+                return output
+        output = await compute()
+        if self.ledger is not None:
+            self.ledger.record_step(key, stage, iteration, code_iteration, output)
+        return output
+
+    async def _generate_code(self, manim_coder, request):
+        manim_code = extract_code(await self._llm("manim_code", manim_coder.acall, **request))
+        return {"manim_code": manim_code, "history": manim_coder.conversation_history}
+
+    async def _attempt(self, key, iteration, code_iteration, manim_coder, request):
+        """One code attempt, as recorded in the ledger"""
+        if self.candidates == 1:
+            # The code is recorded before it renders, so a crash mid-render doesn't repeat the request
+            code = await self._step(key, "code", iteration, code_iteration,
+                                    functools.partial(self._generate_code, manim_coder, request))
+            success, details = await self._render(code["manim_code"])
+            return {**code, "success": success, "details": details}
+        manim_coder, manim_code, success, details = await self._speculate(manim_coder, **request)
+        return {"manim_code": manim_code, "success": success, "details": details,
+                "history": manim_coder.conversation_history}
+
+    async def _render(self, code_string, cancel_event=None):
+        loop = asyncio.get_running_loop()
+        with span("eval", stage="eval") as eval_span:
+            queued = time.perf_counter()
+            async with self._semaphores["render"]:
+                eval_span.set(queue_seconds=time.perf_counter() - queued)
+                evaluate = functools.partial(eval_manim_code_tiers, tiers=self.tiers,
+                                             save_code_py=False, cache=self.eval_cache)
+                if self._worker_pool:
+                    evaluate = functools.partial(evaluate, pool=self._worker_pool)
+                if cancel_event is not None:
+                    evaluate = functools.partial(evaluate, cancel_event=cancel_event)
+                success, details = await loop.run_in_executor(self._render_pool, evaluate, code_string)
+            # The phases ran in a pool process; record them as children of this span
+            eval_span.set(success=success, tier=details.get('tier'))
+            record_eval_timings(details)
+            return success, details
+
+    async def _code_candidate(self, manim_coder, cancel_event, **request):
+        """Generates one code candidate and validates it"""
+        manim_code = extract_code(await self._llm("manim_code", manim_coder.acall, **request))
+        success, details = await self._render(manim_code, cancel_event)
+        return manim_coder, manim_code, success, details
+
+    async def _speculate(self, manim_coder, **request):
+        """
+        Generates and validates self.candidates code candidates concurrently.
+
+        Every candidate continues its own fork of the coder's conversation. The
+        first candidate that passes wins, and the requests and renders of the
+        others are cancelled. If all fail, the one that got furthest through the
+        validation tiers is returned, so the fix loop continues from it.
+
+        Args:
+            manim_coder (ManimCoder): The coder whose conversation the candidates continue
+            **request: Arguments of ManimCoder.acall
+
+        Returns:
+            tuple: (manim_coder, manim_code, success, details) of the chosen candidate,
+                   where manim_coder holds that candidate's conversation history
+        """
+        if self.candidates == 1:
+            return await self._code_candidate(manim_coder, None, **request)
+
+        cancel_event = threading.Event()
+        # Each candidate caches and replays its own response to the shared request
+        tasks = [asyncio.create_task(self._code_candidate(manim_coder.fork(variant=k), cancel_event, **request))
+                 for k in range(self.candidates)]
+        failures, errors = [], []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    candidate = await next_done
+                except Exception as e:
+                    # A failed request only loses this candidate
+                    errors.append(e)
+                    continue
+                if candidate[2]:
+                    return candidate
+                failures.append(candidate)
+        finally:
+            # Stops running renders; cancelling the tasks drops pending requests and renders
+            cancel_event.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if not failures:
+            raise errors[-1]
+        return max(failures, key=lambda candidate: len(candidate[3].get('tiers_passed', [])))
+
+    async def process_prompt(self, user_prompt):
+        """
+        Runs the full pipeline for a single prompt.
+
+        Args:
+            user_prompt (str): The user's prompt describing the concept to visualize
+
+        Returns:
+            dict: The outcome of the run for this prompt
+        """
+        # Generators keep conversation history, so every prompt gets its own set;
+        # the critic stage is not part of the batch pipeline yet
+        scene_scriptor, manim_coder, _ = create_generators(self.api_key, stream=False, api_type=self.api_type,
+                                                           **self.generator_kwargs)
+        start_time = time.time()
+        result = {"user_prompt": user_prompt, "success": False, "error_signatures": []}
+        key = prompt_key(user_prompt)
+
+        try:
+            scene_script = await self._step(key, "scene_script", 1, 0, functools.partial(
+                self._llm, "scene_script", scene_scriptor.acall, user_prompt))
+            details = {}
+
+            for iteration in range(1, self.max_iterations + 1):
+                manim_coder.clear_history()
+                request = {"scene_script": scene_script, "user_prompt": user_prompt}
+
+                last_signature, repeated_errors = None, 0
+                for code_iteration in range(1, self.max_code_iterations + 1):
+                    attempt = await self._step(key, "attempt", iteration, code_iteration,
+                                               functools.partial(self._attempt, key, iteration, code_iteration,
+                                                                 manim_coder, request))
+                    # Continue from the winning candidate's conversation, live or replayed
+                    manim_coder.conversation_history = list(attempt["history"])
+                    manim_code, success, details = attempt["manim_code"], attempt["success"], attempt["details"]
+                    if success:
+                        break
+                    signature = details.get('error_signature')
+                    result["error_signatures"].append(signature)
+                    repeated_errors = repeated_errors + 1 if signature and signature == last_signature else 1
+                    last_signature = signature
+                    # Fixes that keep hitting the same kind of error are not converging
+                    if repeated_errors >= self.max_repeated_errors:
+                        break
+                    request = {"error_message": details['error'], "save_history": True}
+
+                if success:
+                    result.update({
+                        "success": True,
+                        "scene_script": scene_script,
+                        "manim_code": manim_code,
+                        "iterations": iteration,
+                        "code_iterations": code_iteration,
+                        "tier": details.get('tier'),
+                        "tiers_passed": details.get('tiers_passed'),
+                    })
+                    break
+
+                error_context = f"The previous scene script led to code that couldn't be fixed after {code_iteration} attempts. The error was: {details['error']}"
+                scene_script = await self._step(key, "scene_script", iteration + 1, 0, functools.partial(
+                    self._llm, "scene_script", scene_scriptor.acall,
+                    f"{error_context}\n\nPlease create a simpler scene script for: {user_prompt}"))
+            else:
+                result["error"] = details.get('error')
+        except Exception as e:
+            result["error"] = f"Error running pipeline: {str(e)}"
+            # Not a final result; a resumed run retries the prompt from its last recorded step
+            result["exception"] = type(e).__name__
+
+        result["duration"] = time.time() - start_time
+        return result
+
+    async def _worker(self, queue, results):
+        while True:
+            user_prompt = await queue.get()
+            try:
+                if user_prompt is None:
+                    return
+                with span("prompt", stage="prompt") as prompt_span:
+                    result = await self.process_prompt(user_prompt)
+                    prompt_span.set(success=result["success"])
+                results.put_nowait(result)
+            finally:
+                queue.task_done()
+
+    async def run(self, prompts, output_file):
+        """
+        Processes all prompts and appends one JSON line per prompt to output_file.
+
+        Args:
+            prompts (iterable): The user prompts to process
+            output_file (str): Path of the JSONL file to write results to
+
+        Returns:
+            dict: Summary with the number of processed, successful, duplicate and skipped
+                  (finished in an earlier run) prompts
+        """
+        self._semaphores = {stage: asyncio.Semaphore(limit) for stage, limit in self.stage_limits.items()}
+        if self.warm_pool:
+            # Warm workers do the rendering, threads only wait on them
+            self._worker_pool = ManimWorkerPool(size=self.stage_limits["render"])
+            self._render_pool = ThreadPoolExecutor(max_workers=self.stage_limits["render"])
+        elif self.candidates > 1:
+            # Renders run in subprocesses either way; waiting on them from threads lets a
+            # cancel event reach them when another candidate wins
+            self._worker_pool = None
+            self._render_pool = ThreadPoolExecutor(max_workers=self.stage_limits["render"])
+        else:
+            self._worker_pool = None
+            self._render_pool = ProcessPoolExecutor(max_workers=self.stage_limits["render"])
+
+        # Bounded queue so the prompt file is read lazily as capacity frees up
+        queue = asyncio.Queue(maxsize=self.max_in_flight)
+        results = asyncio.Queue()
+        workers = [asyncio.create_task(self._worker(queue, results)) for _ in range(self.max_in_flight)]
+
+        async def write_results():
+            with open(output_file, "a", encoding="utf-8") as f:
+                while True:
+                    result = await results.get()
+                    if result is None:
+                        return
+                    summary["processed"] += 1
+                    summary["successful"] += int(result["success"])
+                    if self.deduper is not None and result["success"]:
+                        result["duplicate_of"] = self.deduper.check_and_add(sample_id(result), result["manim_code"])
+                        summary["duplicates"] += int(result["duplicate_of"] is not None)
+                    f.write(json.dumps(result) + "\n")
+                    f.flush()
+                    if self.ledger is not None and "exception" not in result:
+                        exported = self.dataset_writer and result["success"] and not result.get("duplicate_of")
+                        self.ledger.finish(prompt_key(result["user_prompt"]), result,
+                                           sample_id(result) if exported else None)
+                    if self.dataset_writer:
+                        self.dataset_writer.write_result(result)
+                    if self.metrics_file:
+                        get_recorder().write_prometheus(self.metrics_file)
+                    status = ('DUP ' if result.get('duplicate_of') else 'OK  ') if result['success'] else 'FAIL'
+                    print(f"[{summary['processed']}] {status} "
+                          f"{result['duration']:.1f}s {result['user_prompt'][:60]}")
+
+        summary = {"processed": 0, "successful": 0, "duplicates": 0, "skipped": 0}
+        if self.ledger is not None and self.dataset_writer:
+            # Samples that were in a shard the previous run never completed
+            for result in self.ledger.unexported_results():
+                self.dataset_writer.write_result(result)
+        writer = asyncio.create_task(write_results())
+        try:
+            for user_prompt in prompts:
+                if self.ledger is not None and self.ledger.get_result(prompt_key(user_prompt)) is not None:
+                    summary["skipped"] += 1
+                    continue
+                await queue.put(user_prompt)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+            results.put_nowait(None)
+            await writer
+        finally:
+            await get_shared_async_http_client().aclose()
+            self._render_pool.shutdown(wait=True, cancel_futures=True)
+            if self._worker_pool:
+                self._worker_pool.close()
+            if self.dataset_writer:
+                self.dataset_writer.close()
+        return summary
+
+
+def run_batch(prompt_file, output_file, stage_limits=None, max_in_flight=None, warm_pool=False,
+              eval_cache_path=None, tiers=DEFAULT_TIER_LADDER, llm_cache_path=None, llm_cache_ttl=None,
+              replay=False, replay_latency=0.0, replay_token_latency=0.0, candidates=1,
+              dataset_dir=None, shard_size_mb=64, dataset_format="jsonl", dedupe_index=None,
+              dedupe_threshold=0.8, ledger_path=None, base_url=None, metrics_jsonl=None, metrics_file=None,
+              metrics_port=None):
+    """
+    Runs the pipeline over every prompt in a prompt file.
+
+    Args:
+        prompt_file (str): Path to a .txt or .jsonl prompt file
+        output_file (str): Path of the JSONL file to write results to
+        stage_limits (dict, optional): Per-stage concurrency limits
+        max_in_flight (int, optional): Maximum number of prompts processed at once
+        warm_pool (bool): Whether to render in a pool of warm Manim workers
+        eval_cache_path (str, optional): Path of a persistent evaluation cache to use
+        tiers (tuple): Validation tiers each candidate goes through, cheapest first
+        llm_cache_path (str, optional): Path of a persistent LLM response cache to use
+        llm_cache_ttl (float, optional): Maximum age in seconds of cached LLM responses
+        replay (bool): Whether to serve LLM responses only from the cache (no network)
+        replay_latency (float): Seconds of latency injected before each replayed response
+        replay_token_latency (float): Seconds of latency injected before each replayed chunk
+        candidates (int): Number of code candidates generated and validated concurrently per attempt
+        dataset_dir (str, optional): Directory validated samples are exported to as dataset shards
+        shard_size_mb (float): Compressed size at which a dataset shard is closed
+        dataset_format (str): Shard format, 'jsonl' (gzip) or 'parquet'
+        dedupe_index (str, optional): SQLite file of the near-duplicate index validated samples are checked against
+        dedupe_threshold (float): Estimated similarity at which a sample counts as a near-duplicate
+        ledger_path (str, optional): SQLite job ledger; rerunning with the same ledger resumes the run
+        base_url (str, optional): OpenAI-compatible endpoint to use instead of OpenRouter
+        metrics_jsonl (str, optional): File the timing spans are appended to as JSON lines
+        metrics_file (str, optional): File the Prometheus metrics are written to
+        metrics_port (int, optional): Port the Prometheus metrics are served on at /metrics
+
+    Returns:
+        dict: Summary with the number of processed, successful, duplicate and skipped prompts
+    """
+    load_dotenv()
+    openrouter_api_key = os.getenv('OPENROUTER_API_KEY')
+    if metrics_jsonl or metrics_port:
+        configure_metrics(metrics_jsonl, metrics_port)
+    generator_kwargs = {"base_url": base_url} if base_url else {}
+    if llm_cache_path:
+        generator_kwargs["cache"] = ResponseCache(llm_cache_path, ttl_seconds=llm_cache_ttl)
+    elif replay:
+        raise ValueError("Replay mode needs an LLM cache to replay from")
+    if replay:
+        generator_kwargs.update(replay_latency=replay_latency, replay_token_latency=replay_token_latency)
+
+    dataset_writer = DatasetWriter(dataset_dir, shard_size_mb, dataset_format) if dataset_dir else None
+    runner = BatchRunner(openrouter_api_key, stage_limits=stage_limits, max_in_flight=max_in_flight,
+                         warm_pool=warm_pool,
+                         eval_cache=EvalCache(eval_cache_path) if eval_cache_path else None,
+                         tiers=tiers,
+                         api_type="replay" if replay else "openai",
+                         generator_kwargs=generator_kwargs,
+                         candidates=candidates,
+                         dataset_writer=dataset_writer,
+                         deduper=CodeDeduper(dedupe_index, dedupe_threshold) if dedupe_index else None,
+                         ledger=JobLedger(ledger_path) if ledger_path else None,
+                         metrics_file=metrics_file)
+
+    start_time = time.time()
+    summary = asyncio.run(runner.run(read_prompts(prompt_file), output_file))
+    elapsed = time.time() - start_time
+    print(f"Processed {summary['processed']} prompts ({summary['successful']} successful, "
+          f"{summary['duplicates']} duplicates, {summary['skipped']} already finished) in {elapsed:.1f} seconds")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the generation pipeline over a file of prompts.")
+    parser.add_argument("prompt_file", help="Text file with one prompt per line, or JSONL with a 'prompt' key")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL file to append results to")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="Maximum number of prompts processed at once")
+    parser.add_argument("--warm-pool", action="store_true", help="Render in warm pre-forked Manim workers")
+    parser.add_argument("--tiers", default=",".join(DEFAULT_TIER_LADDER),
+                        help="Comma-separated validation tiers, cheapest first (default: %(default)s)")
+    parser.add_argument("--eval-cache", default=None, help="SQLite file caching evaluation results across runs")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="Code candidates generated and validated concurrently; the first valid one wins")
+    parser.add_argument("--dataset-dir", default=None, help="Directory to export validated samples to as shards")
+    parser.add_argument("--shard-size-mb", type=float, default=64, help="Compressed size of a dataset shard")
+    parser.add_argument("--dataset-format", choices=["jsonl", "parquet"], default="jsonl",
+                        help="Dataset shard format (default: %(default)s)")
+    parser.add_argument("--dedupe-index", default=None,
+                        help="SQLite file of the near-duplicate index; duplicate samples are not exported")
+    parser.add_argument("--dedupe-threshold", type=float, default=0.8,
+                        help="Estimated AST similarity at which samples count as duplicates (default: %(default)s)")
+    parser.add_argument("--ledger", default=None,
+                        help="SQLite job ledger recording every stage; rerun with the same ledger to resume")
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-compatible endpoint to use instead of OpenRouter (e.g. a local stub server)")
+    parser.add_argument("--metrics-jsonl", default=None, help="File to append per-stage timing spans to (JSONL)")
+    parser.add_argument("--metrics-file", default=None, help="File to write Prometheus metrics to after every prompt")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Port to serve Prometheus metrics on at /metrics")
+    parser.add_argument("--llm-cache", default=None, help="SQLite file caching (and recording) LLM responses")
+    parser.add_argument("--llm-cache-ttl", type=float, default=None, help="Maximum age in seconds of cached LLM responses")
+    parser.add_argument("--replay", action="store_true", help="Serve LLM responses from --llm-cache only, without network")
+    parser.add_argument("--replay-latency", type=float, default=0.0, help="Injected latency before each replayed response")
+    parser.add_argument("--replay-token-latency", type=float, default=0.0, help="Injected latency before each replayed chunk")
+    for stage, limit in DEFAULT_STAGE_LIMITS.items():
+        parser.add_argument(f"--{stage.replace('_', '-')}-concurrency", type=int, default=limit,
+                            help=f"Concurrency limit for the {stage} stage (default: {limit})")
+    args = parser.parse_args()
+
+    stage_limits = {stage: getattr(args, f"{stage}_concurrency") for stage in DEFAULT_STAGE_LIMITS}
+    run_batch(args.prompt_file, args.output, stage_limits=stage_limits, max_in_flight=args.max_in_flight,
+              warm_pool=args.warm_pool, eval_cache_path=args.eval_cache, tiers=args.tiers.split(","),
+              llm_cache_path=args.llm_cache, llm_cache_ttl=args.llm_cache_ttl, replay=args.replay,
+              replay_latency=args.replay_latency, replay_token_latency=args.replay_token_latency,
+              candidates=args.candidates, dataset_dir=args.dataset_dir, shard_size_mb=args.shard_size_mb,
+              dataset_format=args.dataset_format, dedupe_index=args.dedupe_index,
+              dedupe_threshold=args.dedupe_threshold, ledger_path=args.ledger,
+              base_url=args.base_url, metrics_jsonl=args.metrics_jsonl, metrics_file=args.metrics_file,
+              metrics_port=args.metrics_port)
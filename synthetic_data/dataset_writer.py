@@ -0,0 +1,243 @@
+import os
+import re
+import glob
+import gzip
+import json
+import time
+import hashlib
+
+# Fields of a dataset record, in order; missing values are written as null
+RECORD_FIELDS = [
+    "id",
+    "user_prompt",
+    "scene_script",
+    "manim_code",
+    "tier",
+    "tiers_passed",
+    "iterations",
+    "code_iterations",
+    "duration",
+    "created",
+]
+
+SHARD_FORMATS = ("jsonl", "parquet")
+
+# Suffix of shards that are still being written; they are renamed once complete
+PARTIAL_SUFFIX = ".partial"
+
+
+def sample_id(result):
+    """Returns the id of a sample, derived from its prompt and its code"""
+    return hashlib.sha256(f"{result['user_prompt']}\0{result['manim_code']}".encode("utf-8")).hexdigest()[:16]
+
+
+def make_record(result):
+    """
+    Builds a dataset record from a successful pipeline result.
+
+    Args:
+        result (dict): A result from BatchRunner.process_prompt
+
+    Returns:
+        dict: The record, with an id derived from the prompt and the code
+    """
+    record = {field: result.get(field) for field in RECORD_FIELDS}
+    record["id"] = sample_id(result)
+    record["created"] = record["created"] or time.time()
+    return record
+
+
+def _write_json_atomic(path, data):
+    partial_path = path + PARTIAL_SUFFIX
+    with open(partial_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial_path, path)
+
+
+class _JsonlShard:
+    """Gzip-compressed JSON Lines shard"""
+    extension = ".jsonl.gz"
+
+    def __init__(self, path):
+        self._raw = open(path, "wb")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb")
+
+    def write(self, record):
+        self._gzip.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    @property
+    def size(self):
+        # Compressed bytes written so far; gzip holds back at most a small buffer
+        return self._raw.tell()
+
+    def close(self):
+        self._gzip.close()
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        self._raw.close()
+
+
+class _ParquetShard:
+    """Parquet shard, written one row group at a time"""
+    extension = ".parquet"
+
+    def __init__(self, path, row_group_size=256):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.string()),
+            ("user_prompt", pa.string()),
+            ("scene_script", pa.string()),
+            ("manim_code", pa.string()),
+            ("tier", pa.string()),
+            ("tiers_passed", pa.list_(pa.string())),
+            ("iterations", pa.int32()),
+            ("code_iterations", pa.int32()),
+            ("duration", pa.float64()),
+            ("created", pa.float64()),
+        ])
+        self._path = path
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+        self._rows = []
+        self._row_group_size = row_group_size
+
+    def write(self, record):
+        self._rows.append(record)
+        if len(self._rows) >= self._row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    @property
+    def size(self):
+        # Only flushed row groups count; the pending rows are bounded by row_group_size
+        return os.path.getsize(self._path)
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+class DatasetWriter:
+    """
+    Streams validated samples into size-bounded, compressed dataset shards.
+
+    Records are written as they arrive to shard-NNNNN.jsonl.gz (or .parquet)
+    files in output_dir. A shard is written under a '.partial' name and only
+    renamed into place once it is closed, so readers never see half-written
+    shards. Every completed shard gets a shard-NNNNN.manifest.json with its
+    record count, size and checksum, and manifest.json indexes all shards.
+    Reopening a directory continues after the last completed shard.
+    """
+    def __init__(self, output_dir, shard_size_mb=64, shard_format="jsonl", on_shard_closed=None):
+        """
+        Args:
+            output_dir (str): Directory the shards are written to
+            shard_size_mb (float): Compressed size at which a shard is closed
+            shard_format (str): 'jsonl' (gzip) or 'parquet' (needs pyarrow)
+            on_shard_closed (callable, optional): Called with the record ids of every completed shard
+        """
+        if shard_format not in SHARD_FORMATS:
+            raise ValueError(f"Unsupported shard format: {shard_format}. Use one of {list(SHARD_FORMATS)}.")
+        self.output_dir = output_dir
+        self.shard_size_bytes = int(shard_size_mb * 1024 * 1024)
+        self.shard_format = shard_format
+        self.on_shard_closed = on_shard_closed
+        self._shard_class = _JsonlShard if shard_format == "jsonl" else _ParquetShard
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Shards left half-written by an interrupted run are incomplete; drop them
+        for partial_path in glob.glob(os.path.join(output_dir, f"*{PARTIAL_SUFFIX}")):
+            os.remove(partial_path)
+        self._manifest_path = os.path.join(output_dir, "manifest.json")
+        self.manifest = self._load_manifest()
+        self._shard = None
+        self._shard_ids = []
+
+    def _load_manifest(self):
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest["format"] != self.shard_format:
+                raise ValueError(f"{self.output_dir} holds {manifest['format']} shards, not {self.shard_format}")
+            return manifest
+        return {"format": self.shard_format, "fields": RECORD_FIELDS, "num_records": 0, "shards": []}
+
+    def _shard_name(self, index):
+        return f"shard-{index:05d}"
+
+    def _open_shard(self):
+        name = self._shard_name(len(self.manifest["shards"]))
+        self._shard_path = os.path.join(self.output_dir, name + self._shard_class.extension)
+        self._shard = self._shard_class(self._shard_path + PARTIAL_SUFFIX)
+        self._shard_ids = []
+        self._shard_started = time.time()
+
+    def write(self, record):
+        """
+        Appends a record to the current shard, starting a new shard when it is full.
+
+        Args:
+            record (dict): The record (see make_record)
+        """
+        if self._shard is None:
+            self._open_shard()
+        self._shard.write(record)
+        self._shard_ids.append(record["id"])
+        if self._shard.size >= self.shard_size_bytes:
+            self.close_shard()
+
+    def write_result(self, result):
+        """Writes a successful pipeline result; failed and duplicate results are skipped"""
+        if result.get("success") and not result.get("duplicate_of"):
+            self.write(make_record(result))
+
+    def close_shard(self):
+        """Completes the current shard: renames it into place and records its manifest"""
+        if self._shard is None:
+            return
+        self._shard.close()
+        self._shard = None
+        partial_path = self._shard_path + PARTIAL_SUFFIX
+
+        hasher = hashlib.sha256()
+        with open(partial_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(block)
+        os.replace(partial_path, self._shard_path)
+
+        file_name = os.path.basename(self._shard_path)
+        shard_manifest = {
+            "file": file_name,
+            "format": self.shard_format,
+            "num_records": len(self._shard_ids),
+            "size_bytes": os.path.getsize(self._shard_path),
+            "sha256": hasher.hexdigest(),
+            "started": self._shard_started,
+            "completed": time.time(),
+        }
+        manifest_name = re.sub(r"\.(jsonl\.gz|parquet)$", ".manifest.json", file_name)
+        _write_json_atomic(os.path.join(self.output_dir, manifest_name), shard_manifest)
+
+        self.manifest["shards"].append(shard_manifest)
+        self.manifest["num_records"] += len(self._shard_ids)
+        _write_json_atomic(self._manifest_path, self.manifest)
+        if self.on_shard_closed:
+            self.on_shard_closed(self._shard_ids)
+
+    def close(self):
+        """Completes the last shard"""
+        self.close_shard()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
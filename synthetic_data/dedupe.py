@@ -0,0 +1,240 @@
+import os
+import ast
+import zlib
+import sqlite3
+import contextlib
+import numpy as np
+
+# Modulus of the MinHash permutations (a Mersenne prime larger than any 32-bit shingle hash)
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Placeholders for abstracted identifiers and literals
+IDENTIFIER_TOKEN = "ID"
+LITERAL_TOKENS = {bool: "BOOL", int: "NUM", float: "NUM", complex: "NUM", str: "STR", bytes: "BYTES"}
+
+
+def ast_tokens(code_string):
+    """
+    Turns code into a normalized token sequence for near-duplicate detection.
+
+    The sequence is a pre-order walk of the AST: node types, plus the names of
+    things the code uses but does not define (manim classes and animations,
+    builtins) and attribute names (methods like shift or play). Names the code
+    binds itself (variables, functions, classes, parameters, import aliases)
+    and all literals are abstracted, so scenes that differ only in variable
+    names or constants produce the same tokens.
+
+    Args:
+        code_string (str): Python source
+
+    Returns:
+        list: The tokens (empty if the code does not parse)
+    """
+    try:
+        tree = ast.parse(code_string)
+    except SyntaxError:
+        return []
+    tokens = []
+    # Names are emitted as-is and abstracted once the walk knows every bound name
+    name_positions = []
+    bound = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        tokens.append(type(node).__name__)
+        if isinstance(node, ast.Name):
+            name_positions.append(len(tokens))
+            tokens.append(node.id)
+            if not isinstance(node.ctx, ast.Load):
+                bound.add(node.id)
+        elif isinstance(node, ast.Attribute):
+            tokens.append(node.attr)
+        elif isinstance(node, ast.Constant):
+            tokens.append(LITERAL_TOKENS.get(type(node.value), "CONST"))
+            continue
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            # Import lines are boilerplate shared by every sample
+            bound.update(alias.asname for alias in node.names if alias.asname)
+            continue
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(node.name)
+        elif isinstance(node, ast.arg):
+            bound.add(node.arg)
+        stack.extend(reversed(list(ast.iter_child_nodes(node))))
+    for position in name_positions:
+        if tokens[position] in bound:
+            tokens[position] = IDENTIFIER_TOKEN
+    return tokens
+
+
+def shingle_hashes(tokens, shingle_size=5):
+    """
+    Hashes every run of shingle_size consecutive tokens.
+
+    Returns:
+        np.ndarray: Unique 32-bit shingle hashes (uint64)
+    """
+    if len(tokens) < shingle_size:
+        shingles = [" ".join(tokens)] if tokens else []
+    else:
+        shingles = [" ".join(tokens[i:i + shingle_size]) for i in range(len(tokens) - shingle_size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64,
+                                 count=len(shingles)))
+
+
+class CodeDeduper:
+    """
+    Near-duplicate index for generated Manim code.
+
+    Each sample is reduced to the MinHash signature of its normalized AST
+    shingles (see ast_tokens). Signatures are split into LSH bands; samples
+    sharing a band are candidates, and a candidate is a duplicate when the
+    estimated Jaccard similarity of the two signatures reaches threshold.
+
+    The band tables live in memory, so a lookup costs one signature plus a
+    few dict probes. With a path, signatures are also stored in SQLite as
+    they are added, and the index is rebuilt from there when reopened.
+    """
+    def __init__(self, path=None, threshold=0.8, num_perm=128, bands=16, shingle_size=5, seed=1):
+        """
+        Args:
+            path (str, optional): SQLite file the index is persisted to (in memory only if None)
+            threshold (float): Estimated Jaccard similarity at which samples count as duplicates
+            num_perm (int): Number of MinHash permutations
+            bands (int): Number of LSH bands; num_perm must be divisible by it
+            shingle_size (int): Number of tokens per shingle
+            seed (int): Seed of the MinHash permutations (must stay fixed for a persisted index)
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        # a * hash + b stays below 2 ** 64 for 32-bit hashes, so uint64 arithmetic is exact
+        self._a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+
+        self._signatures = {}
+        self._band_tables = [{} for _ in range(bands)]
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS signatures (key TEXT PRIMARY KEY, signature BLOB NOT NULL)")
+                conn.execute("CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                self._check_settings(conn, seed)
+                for key, blob in conn.execute("SELECT key, signature FROM signatures"):
+                    self._index(key, np.frombuffer(blob, dtype=np.uint64))
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Yields a connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _check_settings(self, conn, seed):
+        """Signatures are only comparable with the same permutations and shingling"""
+        settings = {"num_perm": self.num_perm, "shingle_size": self.shingle_size, "seed": seed}
+        stored = dict(conn.execute("SELECT name, value FROM settings"))
+        if not stored:
+            conn.executemany("INSERT INTO settings VALUES (?, ?)", [(k, str(v)) for k, v in settings.items()])
+        elif stored != {k: str(v) for k, v in settings.items()}:
+            raise ValueError(f"{self.path} was built with different MinHash settings: {stored}")
+
+    def signature(self, code_string):
+        """
+        Computes the MinHash signature of a code sample.
+
+        Returns:
+            np.ndarray: num_perm uint64 values (all MERSENNE_PRIME for code without shingles)
+        """
+        hashes = shingle_hashes(ast_tokens(code_string), self.shingle_size)
+        if not len(hashes):
+            return np.full(self.num_perm, MERSENNE_PRIME, dtype=np.uint64)
+        permuted = (np.outer(hashes, self._a) + self._b) % np.uint64(MERSENNE_PRIME)
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _index(self, key, signature):
+        self._signatures[key] = signature
+        for table, band_key in zip(self._band_tables, self._band_keys(signature)):
+            table.setdefault(band_key, []).append(key)
+
+    def query(self, code_string=None, signature=None):
+        """
+        Finds indexed samples similar to a code sample.
+
+        Args:
+            code_string (str, optional): The code to look up
+            signature (np.ndarray, optional): Its precomputed signature
+
+        Returns:
+            list: (key, estimated Jaccard similarity) of samples at or above threshold, most similar first
+        """
+        if signature is None:
+            signature = self.signature(code_string)
+        if signature[0] == MERSENNE_PRIME:
+            # Code without shingles (e.g. unparseable) is not comparable
+            return []
+        candidates = set()
+        for table, band_key in zip(self._band_tables, self._band_keys(signature)):
+            candidates.update(table.get(band_key, ()))
+        matches = []
+        for key in candidates:
+            similarity = float(np.mean(self._signatures[key] == signature))
+            if similarity >= self.threshold:
+                matches.append((key, similarity))
+        return sorted(matches, key=lambda match: -match[1])
+
+    def add(self, key, code_string=None, signature=None):
+        """
+        Adds a sample to the index (and to the SQLite file, if any).
+
+        Args:
+            key (str): Identifier of the sample
+            code_string (str, optional): The code
+            signature (np.ndarray, optional): Its precomputed signature
+        """
+        if key in self._signatures:
+            return
+        if signature is None:
+            signature = self.signature(code_string)
+        self._index(key, signature)
+        if self.path:
+            with self._connect() as conn:
+                conn.execute("INSERT OR IGNORE INTO signatures (key, signature) VALUES (?, ?)",
+                             (key, signature.tobytes()))
+
+    def check_and_add(self, key, code_string):
+        """
+        Checks a new sample and indexes it unless it duplicates an indexed one.
+
+        Returns:
+            str: Key of the most similar indexed sample if this one is a duplicate, otherwise None
+        """
+        if key in self._signatures:
+            # The sample itself, checked again (e.g. by a resumed run)
+            return None
+        signature = self.signature(code_string)
+        matches = self.query(signature=signature)
+        if matches:
+            return matches[0][0]
+        self.add(key, signature=signature)
+        return None
+
+    def __len__(self):
+        return len(self._signatures)
@@ -1,7 +1,11 @@
 import os
+import copy
 import json
-from openai import OpenAI
-from groq import Groq
+import asyncio
+import weakref
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from groq import Groq, AsyncGroq
 from dotenv import load_dotenv
 from prompts import (
     scene_script_prompt_template,
@@ -12,23 +16,60 @@ import time
 from PIL import Image
 import base64
 import io
+from response_cache import ReplayClient, make_request_key
+from streaming import CodeFenceWatcher
+from rate_limiter import get_rate_limiter, provider_name
+from history import estimate_tokens
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.frame_sampler import FrameSampler, VIDEO_EXTENSIONS
+from utils.metrics import span, get_recorder
+
+# Connection pool limits of the HTTP client shared by all async generators
+ASYNC_HTTP_LIMITS = httpx.Limits(max_connections=200, max_keepalive_connections=50)
+ASYNC_HTTP_TIMEOUT = httpx.Timeout(600.0, connect=10.0)
+
+# One pooled HTTP client per event loop, since httpx clients are bound to the loop they run on
+_shared_async_http_clients = weakref.WeakKeyDictionary()
+
+def get_shared_async_http_client():
+    """
+    Returns the pooled async HTTP client shared by every generator on the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _shared_async_http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(limits=ASYNC_HTTP_LIMITS, timeout=ASYNC_HTTP_TIMEOUT)
+        _shared_async_http_clients[loop] = client
+    return client
 
 class Generator:
     """
     Base class for all generators that use LLM APIs.
     Handles common functionality like API selection and response generation.
     """
-    def __init__(self, model_name, api_key, api_type="openai", base_url=None, stream=False, save_history=False):
+    def __init__(self, model_name, api_key, api_type="openai", base_url=None, stream=False, save_history=False,
+                 cache=None, replay_latency=0.0, replay_token_latency=0.0, history_compactor=None, rate_limit=True):
         """
         Initialize the generator with model and API details.
         
         Args:
             model_name (str): The name of the model to use
             api_key (str): The API key
-            api_type (str): The type of API to use ('openai' or 'groq')
+            api_type (str): The type of API to use ('openai', 'groq' or 'replay')
             base_url (str, optional): The base URL for the API (if needed)
             stream (bool): Whether to stream the response
             save_history (bool): Whether to save conversation history
+            cache (ResponseCache, optional): Response cache; responses are served from it
+                                             when possible and recorded into it otherwise.
+                                             Required for 'replay', where it holds the transcripts
+            replay_latency (float): Seconds of latency injected before each replayed response
+            replay_token_latency (float): Seconds of latency injected before each replayed chunk
+            history_compactor (callable, optional): Policy applied to the messages of requests
+                                                    that use the history (e.g. HistoryCompactor);
+                                                    the compacted messages become the new history
+            rate_limit (bool): Whether requests go through the rate limiter shared by all generators
+                               using the same provider and model (with retries and backoff)
         """
         load_dotenv()
         
@@ -39,34 +80,83 @@ class Generator:
         self.stream = stream
         self.save_history = save_history
         self.conversation_history = []
+        self.history_compactor = history_compactor
+        self.cache = cache
+        self.replay_latency = replay_latency
+        self.replay_token_latency = replay_token_latency
+        # Set on forks, so concurrent identical requests are cached and replayed separately
+        self.cache_variant = None
+        self.rate_limiter = None
+        if rate_limit and self.api_type != "replay":
+            self.rate_limiter = get_rate_limiter(provider_name(self.api_type, base_url), model_name)
+        # The rate limiter does the retrying, so it sees every 429
+        self._max_retries = 0 if self.rate_limiter else 2
         
         # Initialize the appropriate client
         if self.api_type == "openai":
-            self.client = OpenAI(api_key=self.api_key, base_url=self.base_url if base_url else None)
+            self.client = OpenAI(api_key=self.api_key, base_url=self.base_url if base_url else None,
+                                 max_retries=self._max_retries)
         elif self.api_type == "groq":
-            self.client = Groq(api_key=self.api_key)
+            self.client = Groq(api_key=self.api_key, max_retries=self._max_retries)
+        elif self.api_type == "replay":
+            if cache is None:
+                raise ValueError("The 'replay' API type needs a cache holding the recorded transcripts.")
+            self.client = ReplayClient(cache, replay_latency, replay_token_latency)
         else:
-            raise ValueError(f"Unsupported API type: {api_type}. Use 'openai' or 'groq'.")
+            raise ValueError(f"Unsupported API type: {api_type}. Use 'openai', 'groq' or 'replay'.")
+        
+        # Async client, created lazily on the event loop that first uses it
+        self._async_client = None
+        self._async_client_loop = None
+    
+    def _get_async_client(self):
+        """Returns the async client for the running event loop, backed by the shared HTTP pool"""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            http_client = get_shared_async_http_client()
+            if self.api_type == "replay":
+                self._async_client = ReplayClient(self.cache, self.replay_latency, self.replay_token_latency,
+                                                  async_client=True, variant=self.cache_variant)
+            elif self.api_type == "openai":
+                self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url if self.base_url else None,
+                                                 http_client=http_client, max_retries=self._max_retries)
+            else:
+                self._async_client = AsyncGroq(api_key=self.api_key, http_client=http_client,
+                                               max_retries=self._max_retries)
+            self._async_client_loop = loop
+        return self._async_client
     
     def clear_history(self):
         """Clear the conversation history"""
         self.conversation_history = []
         return self
     
-    def generate_response(self, prompt, max_tokens=4096, temperature=0.7, save_history=None, **kwargs):
+    def fork(self, variant=None):
         """
-        Generate a response using the configured API.
+        Returns a copy of the generator with its own conversation history.
+        
+        The copy shares the clients, cache and settings, so forks are cheap and can
+        be used for concurrent requests that continue the same conversation.
         
         Args:
-            prompt (str): The prompt to send to the API
-            max_tokens (int): Maximum number of tokens to generate
-            temperature (float): Temperature for response generation
-            save_history (bool, optional): Whether to save this exchange in conversation history
-                                          (overrides instance setting if provided)
-            **kwargs: Additional parameters specific to the API
-            
+            variant (int, optional): Cache key variant of the fork's requests. Forks sending
+                                     identical requests need distinct variants, or they
+                                     overwrite each other's cached (and replayed) responses
+        """
+        forked = copy.copy(self)
+        forked.conversation_history = list(self.conversation_history)
+        forked.cache_variant = variant
+        if self.api_type == "replay":
+            forked.client = ReplayClient(self.cache, self.replay_latency, self.replay_token_latency, variant=variant)
+            forked._async_client = None
+        return forked
+    
+    def _prepare_request(self, content, max_tokens, temperature, save_history, extra_params, default_params=True):
+        """
+        Builds the request parameters for a chat completion.
+        
         Returns:
-            str: The generated response
+            tuple: (params, should_save_history)
         """
         # Determine whether to save history for this exchange
         should_save_history = save_history if save_history is not None else self.save_history
@@ -77,7 +167,11 @@ class Generator:
             messages.extend(self.conversation_history)
         
         # Add the current prompt
-        messages.append({"role": "user", "content": prompt})
+        messages.append({"role": "user", "content": content})
+        
+        # Keep the prompt from growing with every exchange
+        if should_save_history and self.history_compactor is not None:
+            messages = self.history_compactor(messages)
         
         # Common parameters for both APIs
         params = {
@@ -88,44 +182,227 @@ class Generator:
         }
         
         # Add API-specific parameters
-        if self.api_type == "openai":
+        # Replayed requests are shaped like OpenAI ones so they match the recorded keys
+        if self.api_type in ("openai", "replay"):
             params["max_tokens"] = max_tokens
         elif self.api_type == "groq":
             params["max_completion_tokens"] = max_tokens
             # Default Groq parameters that can be overridden
-            params.setdefault("top_p", 0.95)
+            if default_params:
+                params.setdefault("top_p", 0.95)
 
         # Add any additional parameters
-        params.update(kwargs)
+        params.update(extra_params)
+        return params, should_save_history
+    
+    def _cache_lookup(self, params):
+        """
+        Looks up a request in the response cache.
         
-        # Generate response using API
-        response = self.client.chat.completions.create(**params)
+        Returns:
+            tuple: (cache_key, cached_content); both None if caching does not apply.
+                   In replay mode the client itself serves from the cache.
+        """
+        if self.cache is None or self.api_type == "replay":
+            return None, None
+        cache_key = make_request_key(params, self.cache_variant)
+        cached_content = self.cache.get(cache_key)
+        if cached_content is not None and self.stream:
+            print(cached_content, end="", flush=True)
+        return cache_key, cached_content
+    
+    def _complete(self, params, consume, stats=None):
+        """
+        Sends a chat completion request (through the rate limiter, if any).
         
-        # Handle streaming response
-        if self.stream:
-            full_response = ""
-            for chunk in response:
-                if chunk.choices[0].delta.content is not None:
-                    content = chunk.choices[0].delta.content
-                    print(content, end="", flush=True)
-                    full_response += content
-            
-            # Update conversation history if needed
-            if should_save_history:
-                self.conversation_history.append({"role": "user", "content": prompt})
-                self.conversation_history.append({"role": "assistant", "content": full_response})
-                
-            return full_response
+        Args:
+            params (dict): The request parameters
+            consume (callable): Turns the response into the response text
+            stats (dict, optional): Gets the time the request was sent in stats['sent'],
+                                    i.e. once the rate limiter granted it a slot
             
-        # Extract response and update history
-        response_content = response.choices[0].message.content
+        Returns:
+            str: The response text
+        """
+        def create():
+            if stats is not None:
+                stats["sent"] = time.perf_counter()
+            return self.client.chat.completions.create(**params)
         
-        # Update conversation history if needed
+        if self.rate_limiter is None:
+            return consume(create())
+        return self.rate_limiter.call(create, consume)
+    
+    async def _acomplete(self, params, consume, stats=None):
+        """Async version of _complete; consume is a coroutine function"""
+        async def create():
+            if stats is not None:
+                stats["sent"] = time.perf_counter()
+            return await self._get_async_client().chat.completions.create(**params)
+        
+        if self.rate_limiter is None:
+            return await consume(await create())
+        return await self.rate_limiter.acall(create, consume)
+    
+    def _llm_span(self):
+        """Span of one request, from queueing it to the last token"""
+        return span("llm", generator=type(self).__name__, model=self.model_name, stream=self.stream)
+    
+    def _non_stream_content(self, response, stats):
+        stats["usage"] = getattr(response, "usage", None)
+        return response.choices[0].message.content
+    
+    def _record_llm_stats(self, llm_span, response_content, stats):
+        """Adds queue wait, time to first token and tokens per second to the request's span"""
+        completion_tokens = getattr(stats.get("usage"), "completion_tokens", None)
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(response_content or "")
+        get_recorder().record_llm_call(llm_span, completion_tokens, stats.get("first_token"), stats.get("sent"))
+    
+    def _cache_store(self, cache_key, params, response_content):
+        if cache_key is not None and response_content is not None:
+            self.cache.put(cache_key, params, response_content)
+    
+    def _finish_request(self, params, response_content, should_save_history):
+        """Updates the conversation history if needed and returns the response"""
         if should_save_history:
-            self.conversation_history.append({"role": "user", "content": prompt})
+            # The sent messages are the (possibly compacted) history plus the new prompt
+            self.conversation_history = list(params["messages"])
             self.conversation_history.append({"role": "assistant", "content": response_content})
-            
         return response_content
+    
+    @staticmethod
+    def _chunk_content(chunk):
+        if chunk.choices and chunk.choices[0].delta.content is not None:
+            return chunk.choices[0].delta.content
+        return None
+    
+    def _consume_stream(self, response, stop_condition=None, stats=None):
+        """
+        Prints a streamed response as it arrives and returns the full text.
+        The stream is closed early once stop_condition(chunk) returns True.
+        The arrival time of the first chunk is stored in stats['first_token'].
+        """
+        # Collect chunks in a list; repeated string concatenation is quadratic on long answers
+        chunks = []
+        for chunk in response:
+            content = self._chunk_content(chunk)
+            if content is not None:
+                if stats is not None and not chunks:
+                    stats["first_token"] = time.perf_counter()
+                print(content, end="", flush=True)
+                chunks.append(content)
+                if stop_condition is not None and stop_condition(content):
+                    response.close()
+                    break
+        return "".join(chunks)
+    
+    async def _aconsume_stream(self, response, stop_condition=None, stats=None):
+        """Async counterpart of _consume_stream"""
+        chunks = []
+        try:
+            async for chunk in response:
+                content = self._chunk_content(chunk)
+                if content is not None:
+                    if stats is not None and not chunks:
+                        stats["first_token"] = time.perf_counter()
+                    print(content, end="", flush=True)
+                    chunks.append(content)
+                    if stop_condition is not None and stop_condition(content):
+                        await self._aclose_stream(response)
+                        break
+        except asyncio.CancelledError:
+            # Close the connection so a cancelled request stops generating tokens
+            await self._aclose_stream(response)
+            raise
+        return "".join(chunks)
+    
+    @staticmethod
+    async def _aclose_stream(response):
+        close = getattr(response, "close", None) or getattr(response, "aclose", None)
+        if close is not None:
+            await close()
+    
+    def generate_response(self, prompt, max_tokens=4096, temperature=0.7, save_history=None, stop_condition=None,
+                          **kwargs):
+        """
+        Generate a response using the configured API.
+        
+        Args:
+            prompt (str): The prompt to send to the API
+            max_tokens (int): Maximum number of tokens to generate
+            temperature (float): Temperature for response generation
+            save_history (bool, optional): Whether to save this exchange in conversation history
+                                          (overrides instance setting if provided)
+            stop_condition (callable, optional): Called with every streamed chunk; the stream is
+                                                 closed as soon as it returns True (streaming only)
+            **kwargs: Additional parameters specific to the API
+            
+        Returns:
+            str: The generated response
+        """
+        params, should_save_history = self._prepare_request(prompt, max_tokens, temperature, save_history, kwargs)
+        
+        with self._llm_span() as llm_span:
+            cache_key, cached_content = self._cache_lookup(params)
+            if cached_content is not None:
+                llm_span.set(cached=True)
+                return self._finish_request(params, cached_content, should_save_history)
+            
+            # Generate response using API
+            stats = {}
+            def consume(response):
+                # Handle streaming response
+                if self.stream:
+                    return self._consume_stream(response, stop_condition, stats)
+                return self._non_stream_content(response, stats)
+            
+            response_content = self._complete(params, consume, stats)
+            self._record_llm_stats(llm_span, response_content, stats)
+            
+        self._cache_store(cache_key, params, response_content)
+        return self._finish_request(params, response_content, should_save_history)
+    
+    async def agenerate_response(self, prompt, max_tokens=4096, temperature=0.7, save_history=None,
+                                 stop_condition=None, **kwargs):
+        """
+        Async version of generate_response.
+        
+        Uses async clients that share one pooled HTTP connection per event loop,
+        so many requests can be in flight from a single process.
+        
+        Args:
+            prompt (str): The prompt to send to the API
+            max_tokens (int): Maximum number of tokens to generate
+            temperature (float): Temperature for response generation
+            save_history (bool, optional): Whether to save this exchange in conversation history
+                                          (overrides instance setting if provided)
+            stop_condition (callable, optional): Called with every streamed chunk; the stream is
+                                                 closed as soon as it returns True (streaming only)
+            **kwargs: Additional parameters specific to the API
+            
+        Returns:
+            str: The generated response
+        """
+        params, should_save_history = self._prepare_request(prompt, max_tokens, temperature, save_history, kwargs)
+        
+        with self._llm_span() as llm_span:
+            cache_key, cached_content = self._cache_lookup(params)
+            if cached_content is not None:
+                llm_span.set(cached=True)
+                return self._finish_request(params, cached_content, should_save_history)
+            
+            stats = {}
+            async def consume(response):
+                if self.stream:
+                    return await self._aconsume_stream(response, stop_condition, stats)
+                return self._non_stream_content(response, stats)
+            
+            response_content = await self._acomplete(params, consume, stats)
+            self._record_llm_stats(llm_span, response_content, stats)
+            
+        self._cache_store(cache_key, params, response_content)
+        return self._finish_request(params, response_content, should_save_history)
 
     def debug_conversation_history(self):
         """
@@ -146,8 +423,8 @@ class SceneScriptor(Generator):
     """
     Generator for creating scene scripts from user prompts.
     """
-    def __init__(self, model_name, api_key, api_type="openai", base_url=None, stream=False, save_history=False):
-        super().__init__(model_name, api_key, api_type, base_url, stream, save_history)
+    def __init__(self, model_name, api_key, api_type="openai", base_url=None, stream=False, save_history=False, **kwargs):
+        super().__init__(model_name, api_key, api_type, base_url, stream, save_history, **kwargs)
         self.prompt_template = scene_script_prompt_template
 
     def __call__(self, user_prompt, save_history=None):
@@ -166,14 +443,24 @@ class SceneScriptor(Generator):
         response = self.generate_response(prompt, save_history=save_history)
         return response
 
+    async def acall(self, user_prompt, save_history=None):
+        """
+        Async version of __call__.
+        """
+        prompt = self.prompt_template.format(user_prompt)
+        return await self.agenerate_response(prompt, save_history=save_history)
+
 
 class ManimCoder(Generator):
     """
     Generator for creating Manim code from scene scripts.
     """
-    def __init__(self, model_name, api_key, api_type="openai", base_url=None, voiceover=False, stream=False, save_history=False):
-        super().__init__(model_name, api_key, api_type, base_url, stream, save_history)
+    def __init__(self, model_name, api_key, api_type="openai", base_url=None, voiceover=False, stream=False, save_history=False,
+                 stop_at_code_fence=True, **kwargs):
+        super().__init__(model_name, api_key, api_type, base_url, stream, save_history, **kwargs)
         self.voiceover = voiceover
+        # Stop streaming once the code block closes (or turns out not to parse)
+        self.stop_at_code_fence = stop_at_code_fence
         
         # Select the appropriate prompt template
         self.prompt_template = manim_code_prompt_template
@@ -198,6 +485,50 @@ class ManimCoder(Generator):
         Returns:
             str: The generated Manim code
         """
+        final_prompt = self.build_prompt(prompt, scene_script, user_prompt, error_message)
+        
+        watcher = self._code_watcher()
+        
+        # Use higher max_tokens and lower temperature for code generation
+        response = self.generate_response(
+            final_prompt, 
+            temperature=0.6,
+            save_history=save_history,
+            stop_condition=watcher
+        )
+        self._report_stream_syntax_error(watcher)
+        return response
+
+    async def acall(self, prompt=None, scene_script=None, user_prompt=None, error_message=None, save_history=None):
+        """
+        Async version of __call__.
+        """
+        final_prompt = self.build_prompt(prompt, scene_script, user_prompt, error_message)
+        watcher = self._code_watcher()
+        response = await self.agenerate_response(final_prompt, temperature=0.6, save_history=save_history,
+                                                 stop_condition=watcher)
+        self._report_stream_syntax_error(watcher)
+        return response
+
+    def _code_watcher(self):
+        """Returns a fresh CodeFenceWatcher for a streamed request, or None"""
+        if self.stream and self.stop_at_code_fence:
+            return CodeFenceWatcher()
+        return None
+
+    @staticmethod
+    def _report_stream_syntax_error(watcher):
+        if watcher is not None and watcher.syntax_error:
+            error = watcher.syntax_error
+            print(f"\n[Stopped streaming: syntax error at line {error['line']} of the code: {error['message']}]")
+
+    def build_prompt(self, prompt=None, scene_script=None, user_prompt=None, error_message=None):
+        """
+        Build the prompt for a code generation request (see __call__ for the calling patterns).
+        
+        Returns:
+            str: The prompt to send
+        """
         # Determine the prompt based on provided parameters
         if prompt is not None:
             # Use the provided prompt directly
@@ -217,14 +548,7 @@ class ManimCoder(Generator):
                 user_prompt=user_prompt,
                 scene_script=scene_script
             )
-        
-        # Use higher max_tokens and lower temperature for code generation
-        response = self.generate_response(
-            final_prompt, 
-            temperature=0.6,
-            save_history=save_history
-        )
-        return response
+        return final_prompt
 
 
 class ManimCritic(Generator):
@@ -232,8 +556,11 @@ class ManimCritic(Generator):
     Generator for critiquing Manim animations based on image frames.
     Uses vision-capable models for visual understanding.
     """
-    def __init__(self, model_name, api_key, api_type="openai", base_url=None, stream=True, save_history=False):
-        super().__init__(model_name, api_key, api_type, base_url, stream, save_history)
+    def __init__(self, model_name, api_key, api_type="openai", base_url=None, stream=True, save_history=False,
+                 frame_sampler=None, **kwargs):
+        super().__init__(model_name, api_key, api_type, base_url, stream, save_history, **kwargs)
+        # Turns rendered videos into a few contact sheets instead of one image per frame
+        self.frame_sampler = frame_sampler or FrameSampler()
 
     def read_image(self, image_path):
         """
@@ -249,102 +576,123 @@ class ManimCritic(Generator):
             image_b64 = base64.b64encode(f.read()).decode()
         return image_b64
     
-    def generate_response_with_image(self, prompt, image_data, save_history=None):
+    def load_images(self, image_path):
+        """
+        Loads the images to critique.
+        
+        Args:
+            image_path (str or list): A rendered video, which is sampled into contact
+                                      sheets, frames captured while rendering (the
+                                      (scene time, PNG bytes) list from eval_manim_code
+                                      with capture_frames=True), or one or more PNG image paths
+            
+        Returns:
+            tuple: (list of base64-encoded images, MIME type of the images)
+        """
+        if isinstance(image_path, str) and image_path.lower().endswith(VIDEO_EXTENSIONS):
+            return self.frame_sampler(image_path), self.frame_sampler.mime_type
+        if isinstance(image_path, list) and image_path and isinstance(image_path[0], tuple):
+            # Captured frames skip the video encode/decode round trip
+            return self.frame_sampler(image_path), self.frame_sampler.mime_type
+        paths = [image_path] if isinstance(image_path, str) else image_path
+        return [self.read_image(path) for path in paths], "image/png"
+    
+    def _build_image_content(self, prompt, image_data, mime_type="image/png"):
+        """Formats a text prompt and one or more images for vision models"""
+        images = [image_data] if isinstance(image_data, str) else image_data
+        return [{"type": "text", "text": prompt}] + [
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{mime_type};base64,{data}"
+                }
+            }
+            for data in images
+        ]
+    
+    def generate_response_with_image(self, prompt, image_data, save_history=None, mime_type="image/png"):
         """
         Generate a response based on text prompt and image data.
         
         Args:
             prompt (str): The text prompt
-            image_data (str): Base64-encoded image data
+            image_data (str or list): Base64-encoded image data, or a list of images
             save_history (bool, optional): Whether to save this exchange in conversation history
                                           (overrides instance setting if provided)
+            mime_type (str): MIME type of the images
             
         Returns:
             str: The generated response
         """
-        # Determine whether to save history for this exchange
-        should_save_history = save_history if save_history is not None else self.save_history
+        params, should_save_history = self._prepare_request(
+            self._build_image_content(prompt, image_data, mime_type), 1024, 0.7, save_history, {}, default_params=False
+        )
         
-        # Format messages with image for vision models
-        messages = []
-        if should_save_history and self.conversation_history:
-            messages.extend(self.conversation_history)
+        with self._llm_span() as llm_span:
+            cache_key, cached_content = self._cache_lookup(params)
+            if cached_content is not None:
+                llm_span.set(cached=True)
+                return self._finish_request(params, cached_content, should_save_history)
             
-        messages.append({
-            "role": "user", 
-            "content": [
-                {"type": "text", "text": prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/png;base64,{image_data}"
-                    }
-                }
-            ]
-        })
-        
-        # Common parameters
-        params = {
-            "model": self.model_name,
-            "messages": messages,
-            "temperature": 0.7,
-            "stream": self.stream
-        }
-        
-        # Add API-specific parameters
-        if self.api_type == "openai":
-            params["max_tokens"] = 1024
-        elif self.api_type == "groq":
-            params["max_completion_tokens"] = 1024
-        
-        # Generate response
-        response = self.client.chat.completions.create(**params)
-
-        # Handle streaming response
-        if self.stream:
-            full_response = ""
-            try:
-                for chunk in response:
-                    if chunk.choices[0].delta.content is not None:
-                        content = chunk.choices[0].delta.content
-                        print(content, end="", flush=True)
-                        full_response += content
-                        
-                # Update conversation history if needed
-                if should_save_history:
-                    self.conversation_history.append(messages[-1])  # Add user message with image
-                    self.conversation_history.append({"role": "assistant", "content": full_response})
-                    
-                return full_response
-            except Exception as e:
-                print(f"Error during streaming: {str(e)}")
-                return None
+            # Generate response
+            stats = {}
+            def consume(response):
+                # Handle streaming response
+                if self.stream:
+                    try:
+                        return self._consume_stream(response, stats=stats)
+                    except Exception as e:
+                        print(f"Error during streaming: {str(e)}")
+                        return None
+                return self._non_stream_content(response, stats)
 
-        # Update conversation history for non-streaming response
-        response_content = response.choices[0].message.content
-        if should_save_history:
-            self.conversation_history.append(messages[-1])  # Add user message with image
-            self.conversation_history.append({"role": "assistant", "content": response_content})
+            response_content = self._complete(params, consume, stats)
+            if response_content is None:
+                return None
+            self._record_llm_stats(llm_span, response_content, stats)
             
-        return response_content
+        self._cache_store(cache_key, params, response_content)
+        return self._finish_request(params, response_content, should_save_history)
 
-    def __call__(self, image_path, user_prompt, scene_script, manim_code, save_history=None):
+    async def agenerate_response_with_image(self, prompt, image_data, save_history=None, mime_type="image/png"):
         """
-        Generate a critique of a Manim animation frame.
+        Async version of generate_response_with_image.
+        """
+        params, should_save_history = self._prepare_request(
+            self._build_image_content(prompt, image_data, mime_type), 1024, 0.7, save_history, {}, default_params=False
+        )
         
-        Args:
-            image_path (str): Path to the image file
-            user_prompt (str): The original user prompt
-            scene_script (str): The scene script
-            manim_code (str): The Manim code
-            save_history (bool, optional): Whether to save this exchange in conversation history
-                                          (overrides instance setting if provided)
+        with self._llm_span() as llm_span:
+            cache_key, cached_content = self._cache_lookup(params)
+            if cached_content is not None:
+                llm_span.set(cached=True)
+                return self._finish_request(params, cached_content, should_save_history)
             
-        Returns:
-            str: The generated critique
+            stats = {}
+            async def consume(response):
+                if self.stream:
+                    try:
+                        return await self._aconsume_stream(response, stats=stats)
+                    except Exception as e:
+                        print(f"Error during streaming: {str(e)}")
+                        return None
+                return self._non_stream_content(response, stats)
+
+            response_content = await self._acomplete(params, consume, stats)
+            if response_content is None:
+                return None
+            self._record_llm_stats(llm_span, response_content, stats)
+            
+        self._cache_store(cache_key, params, response_content)
+        return self._finish_request(params, response_content, should_save_history)
+
+    def build_prompt(self, user_prompt, scene_script, manim_code):
         """
-        image_data = self.read_image(image_path)
+        Build the critique prompt with all necessary context.
         
+        Returns:
+            str: The prompt to send along with the image
+        """
         # Format the prompt with all necessary context
         prompt = critic_prompt_template.format(
             user_prompt=user_prompt,
@@ -354,9 +702,42 @@ class ManimCritic(Generator):
         
         # Add explicit instruction to return "Approved:" if everything is good
         system_instruction = "Remember: If the animation looks good with no issues, start your response with 'Approved:' followed by a brief explanation."
-        prompt = f"{prompt}\n\n{system_instruction}"
+        return f"{prompt}\n\n{system_instruction}"
+
+    def __call__(self, image_path, user_prompt, scene_script, manim_code, save_history=None):
+        """
+        Generate a critique of a Manim animation.
+        
+        Args:
+            image_path (str or list): Path to the rendered video (sampled into contact
+                                      sheets), captured frames, or one or more image files
+            user_prompt (str): The original user prompt
+            scene_script (str): The scene script
+            manim_code (str): The Manim code
+            save_history (bool, optional): Whether to save this exchange in conversation history
+                                          (overrides instance setting if provided)
             
-        return self.generate_response_with_image(prompt, image_data, save_history=save_history)
+        Returns:
+            str: The generated critique
+        """
+        with span("critic", stage="critic"):
+            with span("critic.frames"):
+                image_data, mime_type = self.load_images(image_path)
+            prompt = self.build_prompt(user_prompt, scene_script, manim_code)
+            return self.generate_response_with_image(prompt, image_data, save_history=save_history,
+                                                     mime_type=mime_type)
+
+    async def acall(self, image_path, user_prompt, scene_script, manim_code, save_history=None):
+        """
+        Async version of __call__.
+        """
+        with span("critic", stage="critic"):
+            with span("critic.frames"):
+                # Decoding and tiling frames is CPU bound; keep it off the event loop
+                image_data, mime_type = await asyncio.to_thread(self.load_images, image_path)
+            prompt = self.build_prompt(user_prompt, scene_script, manim_code)
+            return await self.agenerate_response_with_image(prompt, image_data, save_history=save_history,
+                                                            mime_type=mime_type)
 
 
 def main():
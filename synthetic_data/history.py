@@ -0,0 +1,152 @@
+import re
+import json
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:  # tiktoken is optional; fall back to a character estimate
+    _ENCODING = None
+
+# Rough number of characters per token when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Placeholder that replaces code listings superseded by a later fix
+SUPERSEDED_CODE_NOTE = "[Earlier version of the code omitted; superseded by a later fix.]"
+
+FENCED_BLOCK_PATTERN = re.compile(r"```[^\n]*\n(.*?)```", re.DOTALL)
+
+# First line of a raw Python traceback, whose exception comes last
+TRACEBACK_HEADER = "Traceback (most recent call last)"
+
+
+def estimate_tokens(text):
+    """
+    Estimates the number of tokens in a text.
+
+    Uses tiktoken's cl100k_base encoding when installed, and len(text) / 4 otherwise.
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def count_message_tokens(messages):
+    """
+    Estimates the prompt size of a list of chat messages.
+
+    Args:
+        messages (list): Chat messages with 'role' and 'content'
+
+    Returns:
+        int: Estimated token count
+    """
+    total = 0
+    for message in messages:
+        content = message["content"]
+        if not isinstance(content, str):
+            # Multi-part (e.g. image) content; measure its serialized form
+            content = json.dumps(content)
+        total += estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+def condense_error(message, max_lines):
+    """
+    Shortens an error fix prompt by keeping only the part of the error that identifies it.
+
+    Distilled errors (see utils.error_parser.distill_error) start with the
+    exception and the failing location, followed by a code snippet, so their
+    head is kept. Raw Python tracebacks end with the exception, and the frames
+    above it mostly repeat library paths, so their tail is kept.
+
+    Args:
+        message (str): The error fix prompt, with the error in a fenced block
+        max_lines (int): Maximum number of error lines to keep
+
+    Returns:
+        str: The prompt with the fenced error trimmed to max_lines lines
+    """
+    def trim(match):
+        lines = match.group(1).rstrip().strip("\n").splitlines()
+        if len(lines) <= max_lines:
+            return match.group(0)
+        omitted = len(lines) - max_lines
+        if lines[0].startswith(TRACEBACK_HEADER):
+            kept = "\n".join(lines[-max_lines:])
+            return f"```\n[... {omitted} earlier lines omitted ...]\n{kept}\n```"
+        kept = "\n".join(lines[:max_lines])
+        return f"```\n{kept}\n[... {omitted} more lines omitted ...]\n```"
+
+    return FENCED_BLOCK_PATTERN.sub(trim, message, count=1)
+
+
+class HistoryCompactor:
+    """
+    Compaction policy for the conversation history of a code fix loop.
+
+    The history of a fix loop looks like [task prompt, code, error, code, error, ...].
+    Only the task prompt and the latest code are still needed in full, so the
+    compactor keeps those, replaces superseded code listings with a short note,
+    condenses the errors (the pending one to max_error_lines lines, older ones to
+    their exception and location, see condense_error) and then drops the oldest exchanges until the
+    messages fit in token_budget. The task prompt, the latest code and the
+    pending message are never dropped.
+    """
+    def __init__(self, token_budget=8000, max_error_lines=20, max_old_error_lines=2):
+        """
+        Args:
+            token_budget (int): Target maximum size of the prompt in estimated tokens
+            max_error_lines (int): Error lines kept in the pending error prompt
+            max_old_error_lines (int): Error lines kept in earlier error prompts
+        """
+        self.token_budget = token_budget
+        self.max_error_lines = max_error_lines
+        self.max_old_error_lines = max_old_error_lines
+
+    def __call__(self, messages):
+        """
+        Compacts the messages of a request.
+
+        Args:
+            messages (list): The full message list, ending with the pending user message
+
+        Returns:
+            list: A new, compacted message list (the input is not modified)
+        """
+        if len(messages) <= 2:
+            return list(messages)
+
+        assistant_indices = [i for i, message in enumerate(messages) if message["role"] == "assistant"]
+        last_assistant = assistant_indices[-1] if assistant_indices else None
+        pending = len(messages) - 1
+
+        compacted = []
+        for i, message in enumerate(messages):
+            content = message["content"]
+            if i == 0 or not isinstance(content, str):
+                compacted.append(message)
+            elif message["role"] == "assistant" and i != last_assistant:
+                compacted.append({"role": "assistant", "content": SUPERSEDED_CODE_NOTE})
+            elif message["role"] == "user":
+                max_lines = self.max_error_lines if i == pending else self.max_old_error_lines
+                compacted.append({"role": "user", "content": condense_error(content, max_lines)})
+            else:
+                compacted.append(message)
+
+        # Drop the oldest (superseded code, error it produced) exchanges until the budget is met
+        while count_message_tokens(compacted) > self.token_budget:
+            droppable = [i for i in range(1, len(compacted) - 2)
+                         if compacted[i]["content"] == SUPERSEDED_CODE_NOTE]
+            if not droppable:
+                break
+            del compacted[droppable[0]:droppable[0] + 2]
+        return compacted
@@ -0,0 +1,408 @@
+import os
+import re
+import sys
+import glob
+import gzip
+import json
+import time
+import argparse
+import functools
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from dataset_writer import DatasetWriter
+from dedupe import CodeDeduper
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.code_utils import eval_manim_code_tiers
+from utils.manim_worker import ManimWorkerPool
+from utils.eval_cache import EvalCache
+
+# File extensions read by iter_record_batches
+PARQUET_EXTENSIONS = (".parquet",)
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+JSONL_EXTENSIONS = (".jsonl", ".jsonl.gz", ".json", ".json.gz")
+
+# Fields tried, in order, when a record's code or prompt field is not given explicitly;
+# these cover the column names used by the common open Manim datasets
+CODE_FIELDS = ("manim_code", "code", "python_code", "answer", "output", "completion", "response", "solution")
+PROMPT_FIELDS = ("user_prompt", "prompt", "query", "instruction", "question", "input", "description")
+
+# Tiers ingested samples go through by default; full renders are too slow for whole datasets
+DEFAULT_INGEST_TIERS = ("dry_run", "preview")
+
+FENCE_PATTERN = re.compile(r"```[ \t]*(?:python|py)?[ \t]*\n(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+
+
+def dataset_files(path):
+    """
+    Lists the dataset files at a path.
+
+    Args:
+        path (str): A Parquet, Arrow or JSONL file, or a directory (searched recursively)
+
+    Returns:
+        list: Sorted file paths
+    """
+    if os.path.isfile(path):
+        return [path]
+    extensions = PARQUET_EXTENSIONS + ARROW_EXTENSIONS + JSONL_EXTENSIONS
+    return sorted(
+        file_path for file_path in glob.glob(os.path.join(path, "**", "*"), recursive=True)
+        if file_path.endswith(extensions)
+    )
+
+
+def _iter_arrow_batches(path, columns):
+    """Yields the record batches of an Arrow IPC file or stream (Hugging Face cache files are streams)"""
+    import pyarrow as pa
+
+    with pa.memory_map(path, "r") as source:
+        try:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        except pa.ArrowInvalid:
+            source.seek(0)
+            batches = pa.ipc.open_stream(source)
+        for batch in batches:
+            yield batch.select(columns) if columns else batch
+
+
+def _iter_jsonl_batches(path, batch_size, columns):
+    opener = gzip.open if path.endswith(".gz") else open
+    batch = []
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            batch.append({column: record.get(column) for column in columns} if columns else record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def iter_record_batches(path, batch_size=256, columns=None):
+    """
+    Reads a dataset file in batches of records.
+
+    Parquet and Arrow files are memory-mapped and read one record batch at a
+    time (needs pyarrow), so only the current batch is ever materialized as
+    Python objects. JSONL files (optionally gzipped) are streamed line by line.
+
+    Args:
+        path (str): Path of the dataset file
+        batch_size (int): Maximum number of records per batch
+        columns (list, optional): Fields to read (all fields if None)
+
+    Yields:
+        list: Records (dicts) of the next batch
+    """
+    if path.endswith(JSONL_EXTENSIONS):
+        yield from _iter_jsonl_batches(path, batch_size, columns)
+        return
+    if path.endswith(PARQUET_EXTENSIONS):
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=batch_size, columns=columns)
+    elif path.endswith(ARROW_EXTENSIONS):
+        batches = _iter_arrow_batches(path, columns)
+    else:
+        raise ValueError(f"Unsupported dataset file: {path}")
+    for batch in batches:
+        # IPC batches keep the size they were written with; split them to batch_size
+        for start in range(0, batch.num_rows, batch_size):
+            yield batch.slice(start, batch_size).to_pylist()
+
+
+def extract_sample_code(text):
+    """
+    Extracts the code from a dataset field, like extract_code does for model responses.
+
+    The first ```python (or ```py, or bare ```) block is used if there is one,
+    otherwise the whole text. Chat-formatted fields (lists of messages) use the
+    last assistant message.
+
+    Args:
+        text (str or list): The field value
+
+    Returns:
+        str: The code (empty if there is none)
+    """
+    if isinstance(text, list):
+        messages = [m for m in text if isinstance(m, dict) and m.get("role") == "assistant"]
+        text = messages[-1].get("content", "") if messages else ""
+    if not isinstance(text, str):
+        return ""
+    match = FENCE_PATTERN.search(text)
+    return (match.group(1) if match else text).strip()
+
+
+def _first_field(record, fields):
+    for field in fields:
+        if record.get(field):
+            return record[field]
+    return None
+
+
+def record_sample(record, code_field=None, prompt_field=None):
+    """
+    Picks the prompt and the code out of a dataset record.
+
+    Args:
+        record (dict): The record
+        code_field (str, optional): Field holding the code (tried from CODE_FIELDS if None)
+        prompt_field (str, optional): Field holding the prompt (tried from PROMPT_FIELDS if None)
+
+    Returns:
+        tuple: (prompt or None, code)
+    """
+    code = record.get(code_field) if code_field else _first_field(record, CODE_FIELDS)
+    prompt = record.get(prompt_field) if prompt_field else _first_field(record, PROMPT_FIELDS)
+    return prompt, extract_sample_code(code)
+
+
+_eval_cache = None
+
+
+def _init_worker(eval_cache_path):
+    """Opens the evaluation cache once per pool process"""
+    global _eval_cache
+    _eval_cache = EvalCache(eval_cache_path) if eval_cache_path else None
+
+
+def validate_sample(code_string, tiers=DEFAULT_INGEST_TIERS, pool=None):
+    """
+    Validates one sample through the tier ladder.
+
+    Args:
+        code_string (str): The sample's code
+        tiers (tuple): Validation tiers, cheapest first
+        pool (ManimWorkerPool, optional): Warm worker pool to render in
+
+    Returns:
+        dict: The validation status written alongside the record
+    """
+    if not code_string:
+        return {"valid": False, "tier": None, "tiers_passed": [], "error_type": "missing_code",
+                "error_class": None, "error_category": None, "error_signature": None, "error": "No code found"}
+    success, details = eval_manim_code_tiers(code_string, tiers=tiers, save_code_py=False, pool=pool,
+                                             cache=_eval_cache)
+    error_type = details.get("error_type")
+    error_class = details.get("error_class") or ("SyntaxError" if error_type == "syntax" else None)
+    return {
+        "valid": success,
+        "tier": details.get("tier"),
+        "tiers_passed": details.get("tiers_passed", []),
+        "error_type": error_type,
+        "error_class": error_class,
+        "error_category": details.get("error_category"),
+        "error_signature": details.get("error_signature"),
+        "error": details.get("error"),
+    }
+
+
+def worker_crash_status(error):
+    """
+    Status of a sample whose validation never returned, e.g. because the
+    process validating it was killed (segfault, OOM killer).
+
+    Args:
+        error (Exception): The exception the sample's future raised
+
+    Returns:
+        dict: The validation status written alongside the record
+    """
+    return {"valid": False, "tier": None, "tiers_passed": [], "error_type": "worker_crash",
+            "error_class": type(error).__name__, "error_category": None, "error_signature": None,
+            "error": str(error) or type(error).__name__}
+
+
+class DatasetIngester:
+    """
+    Validates the samples of local dataset dumps on a pool of workers.
+
+    Records are read batch by batch (see iter_record_batches), their code is
+    extracted and every sample goes through eval_manim_code_tiers on a process
+    pool (or on threads feeding a warm ManimWorkerPool). Each record is written
+    to the output JSONL with its validation status next to it, in completion
+    order with its source file and index. Throughput is reported as it runs.
+
+    A sample whose validation crashes is written with error_type
+    'worker_crash'. When a pool process dies, every sample in flight on the
+    pool fails with it and the pool is replaced, so ingestion carries on.
+    """
+    def __init__(self, output_file, tiers=DEFAULT_INGEST_TIERS, workers=None, warm_pool=False,
+                 eval_cache_path=None, code_field=None, prompt_field=None, columns=None, batch_size=256,
+                 dataset_writer=None, deduper=None, report_interval=10.0):
+        """
+        Args:
+            output_file (str): JSONL file the records and their status are appended to
+            tiers (tuple): Validation tiers, cheapest first
+            workers (int, optional): Number of concurrent validations (defaults to the CPU count)
+            warm_pool (bool): Whether to render in a ManimWorkerPool instead of fresh interpreters
+            eval_cache_path (str, optional): Path of a persistent evaluation cache to use
+            code_field (str, optional): Record field holding the code
+            prompt_field (str, optional): Record field holding the prompt
+            columns (list, optional): Fields to read and carry to the output (all if None)
+            batch_size (int): Records read per batch
+            dataset_writer (DatasetWriter, optional): Receives every valid sample that has a prompt
+            deduper (CodeDeduper, optional): Near-duplicate index; duplicates are marked and not exported
+            report_interval (float): Seconds between throughput reports
+        """
+        self.output_file = output_file
+        self.tiers = tuple(tiers)
+        self.workers = workers or os.cpu_count() or 1
+        self.warm_pool = warm_pool
+        self.eval_cache_path = eval_cache_path
+        self.code_field = code_field
+        self.prompt_field = prompt_field
+        self.columns = columns
+        self.batch_size = batch_size
+        self.dataset_writer = dataset_writer
+        self.deduper = deduper
+        self.report_interval = report_interval
+
+    def _records(self, path):
+        """Yields (source file, index in file, record) for every record under path"""
+        columns = self.columns
+        if columns:
+            columns = list(dict.fromkeys(columns + [f for f in (self.code_field, self.prompt_field) if f]))
+        for file_path in dataset_files(path):
+            index = 0
+            for batch in iter_record_batches(file_path, self.batch_size, columns):
+                for record in batch:
+                    yield file_path, index, record
+                    index += 1
+
+    def _write(self, f, source, index, record, prompt, code, status, summary):
+        if status["valid"] and self.deduper is not None:
+            key = f"{source}:{index}"
+            status["duplicate_of"] = self.deduper.check_and_add(key, code)
+            summary["duplicates"] += int(status["duplicate_of"] is not None)
+        f.write(json.dumps({**record, "source": source, "index": index, **status},
+                           ensure_ascii=False, default=str) + "\n")
+        summary["processed"] += 1
+        summary["valid"] += int(status["valid"])
+        summary["error_classes"][status["error_class"] or status["error_type"] or "ok"] += 1
+        if self.dataset_writer and prompt:
+            self.dataset_writer.write_result({"user_prompt": prompt, "manim_code": code,
+                                              "success": status["valid"], "tier": status["tier"],
+                                              "tiers_passed": status["tiers_passed"],
+                                              "duplicate_of": status.get("duplicate_of")})
+
+    def _report(self, summary, start_time):
+        elapsed = time.time() - start_time
+        rate = summary["processed"] / elapsed if elapsed > 0 else 0.0
+        print(f"{summary['processed']} samples ({summary['valid']} valid) in {elapsed:.1f}s, "
+              f"{rate:.2f} samples/s")
+        return elapsed, rate
+
+    def _process_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   initargs=(self.eval_cache_path,))
+
+    def run(self, path):
+        """
+        Ingests every dataset file under path.
+
+        Args:
+            path (str): A dataset file or a directory of them
+
+        Returns:
+            dict: Summary with the processed, valid and duplicate counts, the count per
+                  error class, the elapsed time and samples_per_second
+        """
+        summary = {"processed": 0, "valid": 0, "duplicates": 0, "error_classes": Counter()}
+        worker_pool = None
+        if self.warm_pool:
+            worker_pool = ManimWorkerPool(size=self.workers)
+            _init_worker(self.eval_cache_path)
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+            validate = functools.partial(validate_sample, tiers=self.tiers, pool=worker_pool)
+        else:
+            executor = self._process_executor()
+            validate = functools.partial(validate_sample, tiers=self.tiers)
+
+        start_time = last_report = time.time()
+        # Bounded number of submitted samples, so records are read only as fast as they are validated
+        max_pending = 4 * self.workers
+        pending = {}
+        try:
+            with open(self.output_file, "a", encoding="utf-8") as f:
+                def drain(block_until):
+                    nonlocal last_report, executor
+                    while len(pending) > block_until:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            submitted_to, sample = pending.pop(future)
+                            try:
+                                status = future.result()
+                            except Exception as e:
+                                status = worker_crash_status(e)
+                                # Replace a broken pool once; its other futures fail with the same error
+                                if isinstance(e, BrokenProcessPool) and submitted_to is executor:
+                                    executor.shutdown(wait=False, cancel_futures=True)
+                                    executor = self._process_executor()
+                            self._write(f, *sample, status, summary)
+                    if time.time() - last_report >= self.report_interval:
+                        f.flush()
+                        self._report(summary, start_time)
+                        last_report = time.time()
+
+                for source, index, record in self._records(path):
+                    prompt, code = record_sample(record, self.code_field, self.prompt_field)
+                    pending[executor.submit(validate, code)] = (executor, (source, index, record, prompt, code))
+                    drain(max_pending - 1)
+                drain(0)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if worker_pool:
+                worker_pool.close()
+            if self.dataset_writer:
+                self.dataset_writer.close()
+
+        summary["elapsed"], summary["samples_per_second"] = self._report(summary, start_time)
+        summary["error_classes"] = dict(summary["error_classes"].most_common())
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate local Manim dataset dumps (Parquet, Arrow or JSONL).")
+    parser.add_argument("path", help="Dataset file, or a directory of dataset files (e.g. a Hugging Face download)")
+    parser.add_argument("--output", default="ingest_results.jsonl",
+                        help="JSONL file to append the records and their validation status to")
+    parser.add_argument("--tiers", default=",".join(DEFAULT_INGEST_TIERS),
+                        help="Comma-separated validation tiers, cheapest first (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of concurrent validations")
+    parser.add_argument("--warm-pool", action="store_true", help="Render in warm pre-forked Manim workers")
+    parser.add_argument("--eval-cache", default=None, help="SQLite file caching evaluation results across runs")
+    parser.add_argument("--code-field", default=None, help=f"Field holding the code (default: first of {CODE_FIELDS})")
+    parser.add_argument("--prompt-field", default=None,
+                        help=f"Field holding the prompt (default: first of {PROMPT_FIELDS})")
+    parser.add_argument("--columns", default=None, help="Comma-separated fields to read and carry to the output")
+    parser.add_argument("--batch-size", type=int, default=256, help="Records read per batch")
+    parser.add_argument("--dataset-dir", default=None, help="Directory to export valid samples to as shards")
+    parser.add_argument("--shard-size-mb", type=float, default=64, help="Compressed size of a dataset shard")
+    parser.add_argument("--dataset-format", choices=["jsonl", "parquet"], default="jsonl",
+                        help="Dataset shard format (default: %(default)s)")
+    parser.add_argument("--dedupe-index", default=None,
+                        help="SQLite file of the near-duplicate index; duplicate samples are not exported")
+    args = parser.parse_args()
+
+    ingester = DatasetIngester(
+        args.output,
+        tiers=args.tiers.split(","),
+        workers=args.workers,
+        warm_pool=args.warm_pool,
+        eval_cache_path=args.eval_cache,
+        code_field=args.code_field,
+        prompt_field=args.prompt_field,
+        columns=args.columns.split(",") if args.columns else None,
+        batch_size=args.batch_size,
+        dataset_writer=DatasetWriter(args.dataset_dir, args.shard_size_mb, args.dataset_format)
+        if args.dataset_dir else None,
+        deduper=CodeDeduper(args.dedupe_index) if args.dedupe_index else None,
+    )
+    summary = ingester.run(args.path)
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import contextlib
+
+# Default location of the job ledger, next to the other run state in temp/
+DEFAULT_LEDGER_PATH = os.path.join('temp', 'job_ledger.sqlite')
+
+
+def prompt_key(user_prompt):
+    """Returns the ledger key of a prompt"""
+    return hashlib.sha256(user_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class JobLedger:
+    """
+    SQLite ledger of batch run progress, so a crashed run can resume.
+
+    Every stage output of a prompt is recorded as a step, keyed by the prompt,
+    the stage name, the scene script iteration and the code iteration. The
+    pipeline loop is deterministic given these outputs, so a restarted run
+    replays the recorded steps instead of repeating LLM calls and renders, and
+    continues live from the first step that was never recorded.
+
+    Prompts with a final result are skipped entirely. Results also record
+    whether their sample has reached a completed dataset shard, so samples
+    lost with an interrupted shard are exported again.
+    """
+    def __init__(self, path=DEFAULT_LEDGER_PATH):
+        """
+        Args:
+            path (str): Path of the SQLite file
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS steps ("
+                " prompt_key TEXT NOT NULL,"
+                " stage TEXT NOT NULL,"
+                " iteration INTEGER NOT NULL,"
+                " code_iteration INTEGER NOT NULL,"
+                " output TEXT NOT NULL,"
+                " created REAL NOT NULL,"
+                " PRIMARY KEY (prompt_key, stage, iteration, code_iteration))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                " prompt_key TEXT PRIMARY KEY,"
+                " user_prompt TEXT NOT NULL,"
+                " success INTEGER NOT NULL,"
+                " sample_id TEXT,"
+                " exported INTEGER NOT NULL DEFAULT 0,"
+                " result TEXT NOT NULL,"
+                " completed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS results_sample_id ON results (sample_id)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Yields a connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_step(self, key, stage, iteration, code_iteration=0):
+        """
+        Looks up a recorded step.
+
+        Args:
+            key (str): The prompt key (see prompt_key)
+            stage (str): Name of the stage
+            iteration (int): Scene script iteration
+            code_iteration (int): Code iteration within the scene script (0 for scene scripts)
+
+        Returns:
+            The recorded output, or None if the step was never recorded
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT output FROM steps WHERE prompt_key = ? AND stage = ? AND iteration = ? AND code_iteration = ?",
+                (key, stage, iteration, code_iteration)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record_step(self, key, stage, iteration, code_iteration, output):
+        """Records the output of a step (must be JSON-serializable)"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO steps (prompt_key, stage, iteration, code_iteration, output, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, iteration, code_iteration, json.dumps(output, default=str), time.time())
+            )
+
+    def get_result(self, key):
+        """Returns the final result of a prompt, or None if it has not finished"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT result FROM results WHERE prompt_key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def finish(self, key, result, sample_id=None):
+        """
+        Records the final result of a prompt; it is skipped from then on.
+
+        Args:
+            key (str): The prompt key
+            result (dict): The result of BatchRunner.process_prompt
+            sample_id (str, optional): Dataset id of the result's sample, if it is to be exported
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (prompt_key, user_prompt, success, sample_id, exported, result, completed) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                (key, result["user_prompt"], int(bool(result.get("success"))), sample_id,
+                 json.dumps(result, default=str), time.time())
+            )
+
+    def mark_exported(self, sample_ids):
+        """Marks samples as written to a completed dataset shard"""
+        with self._connect() as conn:
+            conn.executemany("UPDATE results SET exported = 1 WHERE sample_id = ?",
+                             [(sample_id,) for sample_id in sample_ids])
+
+    def unexported_results(self):
+        """
+        Finished results whose sample was to be exported but never reached a completed shard.
+
+        Returns:
+            list: The results, in completion order
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT result FROM results WHERE sample_id IS NOT NULL AND exported = 0 ORDER BY completed"
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def clear_prompt(self, key):
+        """Forgets everything recorded for a prompt, so it runs from scratch"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM steps WHERE prompt_key = ?", (key,))
+            conn.execute("DELETE FROM results WHERE prompt_key = ?", (key,))
+
+    def __len__(self):
+        """Number of prompts with a final result"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
@@ -2,13 +2,18 @@ import os
 import time
 from glob import glob
 from generators import SceneScriptor, ManimCoder, ManimCritic
+from history import HistoryCompactor
 import os, sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.code_utils import eval_manim_code
+from utils.code_utils import eval_manim_code_tiers
+from utils.metrics import span, configure_metrics, get_recorder, record_eval_timings
 from dotenv import load_dotenv
-from prompts import example_scene_script
+from prompts import exmaple_scene_script as example_scene_script
 
 
+# OpenAI-compatible endpoint the generators talk to
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+
 def extract_code(response):
     """Extract code between ```python and ``` tags"""
     if "```python" in response and "```" in response:
@@ -16,30 +21,30 @@ def extract_code(response):
         return code.strip()
     return response
 
-def run_pipeline(user_prompt):
+def create_generators(api_key, stream=True, api_type="openai", history_token_budget=8000,
+                      base_url=OPENROUTER_BASE_URL, **generator_kwargs):
     """
-    Runs the full pipeline to generate and validate Manim animations.
-    
-    The pipeline maintains conversation history with the ManimCoder to enable
-    iterative improvements and error corrections without losing context.
+    Creates the SceneScriptor, ManimCoder and ManimCritic used by the pipeline.
     
     Args:
-        user_prompt (str): The user's prompt describing the concept to visualize
+        api_key (str): The OpenRouter API key
+        stream (bool): Whether the generators stream their responses to stdout
+        api_type (str): The type of API to use ('openai' for OpenRouter, or 'replay')
+        history_token_budget (int, optional): Token budget of the ManimCoder fix loop history
+                                              (None disables history compaction)
+        base_url (str): OpenAI-compatible API endpoint (e.g. a local stub server for testing)
+        **generator_kwargs: Additional Generator options (e.g. cache, replay_latency)
         
     Returns:
-        bool: Whether the pipeline completed successfully
+        tuple: (scene_scriptor, manim_coder, critic)
     """
-    # Load environment variables
-    load_dotenv()
-    openrouter_api_key = os.getenv('OPENROUTER_API_KEY')
-
-    # Initialize generators
     scene_scriptor = SceneScriptor(
         model_name="google/gemma-3-27b-it:free",
-        api_key=openrouter_api_key,
-        api_type="openai",
-        base_url="https://openrouter.ai/api/v1",
-        stream=True
+        api_key=api_key,
+        api_type=api_type,
+        base_url=base_url,
+        stream=stream,
+        **generator_kwargs
     )
     
     # Only enable history saving for ManimCoder
@@ -47,21 +52,45 @@ def run_pipeline(user_prompt):
     # google/gemini-2.0-pro-exp-02-05:free BEST
     manim_coder = ManimCoder(
         model_name="google/gemini-2.0-pro-exp-02-05:free",
-        api_key=openrouter_api_key,
-        api_type="openai",
-        base_url="https://openrouter.ai/api/v1",
+        api_key=api_key,
+        api_type=api_type,
+        base_url=base_url,
         voiceover=False,
-        stream=True,
-        save_history=True  # Enable conversation history
+        stream=stream,
+        save_history=True,  # Enable conversation history
+        history_compactor=HistoryCompactor(history_token_budget) if history_token_budget else None,
+        **generator_kwargs
     )
     
     critic = ManimCritic(
         model_name="google/gemma-3-27b-it:free",
-        api_key=openrouter_api_key,
-        api_type="openai",
-        base_url="https://openrouter.ai/api/v1",
-        stream=True
+        api_key=api_key,
+        api_type=api_type,
+        base_url=base_url,
+        stream=stream,
+        **generator_kwargs
     )
+    return scene_scriptor, manim_coder, critic
+
+def run_pipeline(user_prompt):
+    """
+    Runs the full pipeline to generate and validate Manim animations.
+    
+    The pipeline maintains conversation history with the ManimCoder to enable
+    iterative improvements and error corrections without losing context.
+    
+    Args:
+        user_prompt (str): The user's prompt describing the concept to visualize
+        
+    Returns:
+        bool: Whether the pipeline completed successfully
+    """
+    # Load environment variables
+    load_dotenv()
+    openrouter_api_key = os.getenv('OPENROUTER_API_KEY')
+
+    # Initialize generators
+    scene_scriptor, manim_coder, critic = create_generators(openrouter_api_key)
 
     # Generate initial scene script
     print("\nGenerating scene script...")
@@ -87,7 +116,8 @@ def run_pipeline(user_prompt):
         
         # Generate Manim code
         print("\nGenerating Manim code...")
-        manim_code = manim_coder(scene_script=scene_script, user_prompt=user_prompt)
+        with span("manim_code", stage="manim_code", iteration=iteration):
+            manim_code = manim_coder(scene_script=scene_script, user_prompt=user_prompt)
         manim_code = extract_code(manim_code)
         print("\nManim code generated.")
 
@@ -95,7 +125,11 @@ def run_pipeline(user_prompt):
         while code_iterations < max_code_iterations:
             # Evaluate the code
             print("\nEvaluating Manim code...")
-            success, details = eval_manim_code(manim_code, save_code_py=True)
+            # Cheap dry-run and preview tiers first, full render only if those pass
+            with span("eval", stage="eval", iteration=iteration, attempt=code_iterations + 1) as eval_span:
+                success, details = eval_manim_code_tiers(manim_code, save_code_py=True)
+                eval_span.set(success=success, tier=details.get('tier'))
+                record_eval_timings(details)
 
             if success:
                 print("\nCode evaluation successful!")
@@ -103,8 +137,10 @@ def run_pipeline(user_prompt):
                 
             # Code has errors, try to fix it
             code_iterations += 1
-            print(f"\nCode evaluation failed (attempt {code_iterations}/{max_code_iterations}).")
+            print(f"\nCode evaluation failed at tier '{details.get('tier')}' (attempt {code_iterations}/{max_code_iterations}).")
             print(f"Error: {details['error']}")
+            if details.get('error_signature'):
+                print(f"Error signature: {details['error_signature']}")
             
             if code_iterations >= max_code_iterations:
                 print("\nReached maximum code fix attempts. Moving to a new scene script.")
@@ -116,7 +152,8 @@ def run_pipeline(user_prompt):
                 
             print("\nSending error back to ManimCoder for fixing...")
             error_message = details['error']
-            manim_code = manim_coder(error_message=error_message, save_history=True)
+            with span("manim_code", stage="manim_code", iteration=iteration, attempt=code_iterations + 1):
+                manim_code = manim_coder(error_message=error_message, save_history=True)
             manim_code = extract_code(manim_code)
             
             print("\nFixed code generated.")
@@ -125,7 +162,8 @@ def run_pipeline(user_prompt):
         if not success:
             print("\nGenerating a new scene script with error context...")
             error_context = f"The previous scene script led to code that couldn't be fixed after {max_code_iterations} attempts. The error was: {details['error']}"
-            scene_script = scene_scriptor(f"{error_context}\n\nPlease create a simpler scene script for: {user_prompt}")
+            with span("scene_script", stage="scene_script", iteration=iteration + 1):
+                scene_script = scene_scriptor(f"{error_context}\n\nPlease create a simpler scene script for: {user_prompt}")
             print("\nNew scene script generated.")
             continue
 
@@ -137,5 +175,8 @@ def run_pipeline(user_prompt):
 
 if __name__ == "__main__":
     user_prompt = "Explain the concept of derivatives using geometric intuition"
-    run_pipeline(user_prompt)
+    configure_metrics(os.path.join("temp", "metrics", "spans.jsonl"))
+    with span("pipeline", stage="pipeline"):
+        run_pipeline(user_prompt)
+    get_recorder().write_prometheus(os.path.join("temp", "metrics", "metrics.prom"))
 
@@ -6,7 +6,7 @@ This prompt is used to evaluate the quality and correctness of the generated ani
 critic_prompt_template = """You are **ManimCritic**, a multimodal evaluator. You are given:
 1. The **scene script** (textual instructions for each scene).
 2. The **Manim code** (a single Scene class).
-3. A set of **1-fps PNG frames** from the final rendered animation.
+3. **Frames** from the final rendered animation, sampled at about 1 fps with near-identical frames removed. They are tiled into contact sheets in playback order; each thumbnail is labeled with its frame number and timestamp.
 
 ### Your Tasks
 
@@ -15,7 +15,7 @@ critic_prompt_template = """You are **ManimCritic**, a multimodal evaluator. You
    - Note any missing or extra steps not accounted for in the script.
 
 **2. Rendered Frames Review**  
-   - Check each PNG frame to see if the visuals match the script's intended layout (positions, colors, transitions).
+   - Check each frame to see if the visuals match the script's intended layout (positions, colors, transitions).
    - Assess the overall clarity: ensure no overlapping, out-of-bound elements, and text is large enough.
    - Confirm each step (frame sequence) logically progresses and aligns with the script's storyline.
    - Check if any shapes, text, or labels are cut off or placed outside the frame.
@@ -0,0 +1,355 @@
+import time
+import random
+import asyncio
+import threading
+import email.utils
+from urllib.parse import urlparse
+import openai
+import groq
+
+# Request limits per provider. Models with a ':free' suffix get the '<provider>:free' entry;
+# OpenRouter's free tier allows 20 requests per minute.
+DEFAULT_RATE_LIMITS = {
+    "openrouter:free": {"requests_per_minute": 20, "burst": 4, "max_concurrency": 4},
+    "openrouter": {"requests_per_minute": 200, "burst": 10, "max_concurrency": 32},
+    "groq": {"requests_per_minute": 30, "burst": 4, "max_concurrency": 8},
+    "default": {"requests_per_minute": 60, "burst": 8, "max_concurrency": 16},
+}
+
+# Errors that are worth retrying: throttling, timeouts, dropped connections and server errors
+RETRYABLE_ERRORS = (
+    openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError,
+    groq.RateLimitError, groq.APIConnectionError, groq.InternalServerError,
+)
+RATE_LIMIT_ERRORS = (openai.RateLimitError, groq.RateLimitError)
+
+# Granularity at which waiting callers re-check for a free slot
+POLL_INTERVAL = 0.05
+
+
+def provider_name(api_type, base_url=None):
+    """
+    Names the provider a generator talks to, e.g. 'openrouter' for https://openrouter.ai/api/v1.
+
+    Args:
+        api_type (str): The generator's API type
+        base_url (str, optional): The generator's base URL
+
+    Returns:
+        str: The provider name
+    """
+    if api_type == "groq":
+        return "groq"
+    host = urlparse(base_url).hostname if base_url else "api.openai.com"
+    parts = (host or "").split(".")
+    # Second-level domain for public hosts, the full host for local stubs
+    return parts[-2] if len(parts) >= 2 and not host.replace(".", "").isdigit() else host
+
+
+def _parse_duration(value):
+    """Parses durations like '1m30.5s', '250ms' or '12.5' (seconds)"""
+    total, number = 0.0, ""
+    value = value.strip()
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char.isdigit() or char == ".":
+            number += char
+        elif value.startswith("ms", i):
+            total += float(number) / 1000
+            number = ""
+            i += 1
+        elif char in "hms":
+            total += float(number) * {"h": 3600, "m": 60, "s": 1}[char]
+            number = ""
+        else:
+            raise ValueError(f"Invalid duration: {value}")
+        i += 1
+    return total + (float(number) if number else 0.0)
+
+
+def retry_after_seconds(headers, now=None):
+    """
+    Reads how long the server asked us to wait from rate limit response headers.
+
+    Understands Retry-After (seconds or an HTTP date), retry-after-ms,
+    X-RateLimit-Reset (a timestamp in seconds or milliseconds, as sent by
+    OpenRouter) and x-ratelimit-reset-requests (a duration, as sent by Groq).
+
+    Args:
+        headers (Mapping): Response headers
+        now (float, optional): Current time.time()
+
+    Returns:
+        float: Seconds to wait, or None if the headers say nothing
+    """
+    if not headers:
+        return None
+    now = time.time() if now is None else now
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        if headers.get("retry-after"):
+            value = headers["retry-after"]
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - now)
+        if headers.get("x-ratelimit-reset"):
+            reset = float(headers["x-ratelimit-reset"])
+            # Epoch milliseconds, epoch seconds, or a relative number of seconds
+            if reset > 1e12:
+                reset /= 1000
+            return max(0.0, reset - now) if reset > 1e9 else reset
+        if headers.get("x-ratelimit-reset-requests"):
+            return _parse_duration(headers["x-ratelimit-reset-requests"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+class RateLimiter:
+    """
+    Admission control for the requests to one model of one provider.
+
+    A request needs a token from a token bucket (requests_per_minute, with
+    bursts of up to burst requests) and one of limit concurrency slots. The
+    concurrency limit adapts AIMD-style: it grows by 1/limit after every
+    healthy response, halves after a 429 and shrinks by a quarter after a
+    response much slower than the recent average, at most once per average
+    latency so one burst of failures counts once. A Retry-After from the
+    server pauses all requests to the model until it has passed.
+
+    call/acall wrap a request with admission and retries: rate limit errors
+    wait as long as the server asked (plus jitter), other retryable errors
+    back off exponentially with full jitter. A server asking for a wait longer
+    than max_retry_after (e.g. OpenRouter's daily reset of the free tier) gets
+    its error raised instead of a retry, and does not pause the model.
+
+    The limiter is thread-safe and shared by sync and async callers; async
+    callers wait by polling, so one limiter serves every event loop.
+    """
+    def __init__(self, requests_per_minute=60, burst=8, max_concurrency=16, initial_concurrency=4,
+                 max_retries=6, base_backoff=1.0, max_backoff=60.0, max_retry_after=300.0, latency_tolerance=4.0):
+        """
+        Args:
+            requests_per_minute (float): Sustained request rate
+            burst (int): Requests that can be sent at once after an idle period
+            max_concurrency (int): Upper bound of the adaptive concurrency limit
+            initial_concurrency (int): Concurrency limit to start from
+            max_retries (int): Retries of a request before its error is raised
+            base_backoff (float): Backoff in seconds before the first retry (doubled per retry)
+            max_backoff (float): Upper bound of a single backoff in seconds
+            max_retry_after (float): Longest server-requested wait in seconds that is
+                                     honoured; longer waits raise the error instead
+            latency_tolerance (float): Multiple of the average latency above which a
+                                       response counts as a sign of overload
+        """
+        self.rate = requests_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(min(initial_concurrency, self.max_concurrency))
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.latency_tolerance = latency_tolerance
+
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self.in_flight = 0
+        self.latency = None
+        self.stats = {"requests": 0, "rate_limited": 0, "retries": 0, "errors": 0}
+
+    def _try_acquire(self):
+        """Takes a token and a slot if possible; otherwise returns how long to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.in_flight >= int(self.limit):
+                return None
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+            self.in_flight += 1
+            self.stats["requests"] += 1
+            return 0.0
+
+    def acquire(self):
+        """Blocks until the request may be sent"""
+        while True:
+            wait = self._try_acquire()
+            if wait == 0.0:
+                return
+            with self._condition:
+                # Slots are handed back through release, which notifies
+                self._condition.wait(wait if wait is not None else POLL_INTERVAL)
+
+    async def aacquire(self):
+        """Async counterpart of acquire"""
+        while True:
+            wait = self._try_acquire()
+            if wait == 0.0:
+                return
+            await asyncio.sleep(min(wait, 1.0) if wait is not None else POLL_INTERVAL)
+
+    def release(self, latency=None, rate_limited=False, retry_after=None):
+        """
+        Hands back a slot and adapts the concurrency limit to how the request went.
+
+        Args:
+            latency (float, optional): Seconds until the response arrived, i.e. the first chunk
+                                       for streams (None if the request failed)
+            rate_limited (bool): Whether the server answered 429
+            retry_after (float, optional): Seconds the server asked to wait
+        """
+        with self._condition:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            slow = latency is not None and self.latency is not None and latency > self.latency_tolerance * self.latency
+            if latency is not None:
+                self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            if rate_limited or slow:
+                if now - self._last_decrease >= (self.latency or 1.0):
+                    self.limit = max(1.0, self.limit * (0.5 if rate_limited else 0.75))
+                    self._last_decrease = now
+            elif latency is not None:
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def _retry_delay(self, error, attempt):
+        """
+        Decides whether and how long to wait before retrying a failed request.
+
+        Returns:
+            tuple: (delay in seconds or None if the error is not retried, server retry-after or None)
+        """
+        if not isinstance(error, RETRYABLE_ERRORS) or attempt >= self.max_retries:
+            return None, None
+        response = getattr(error, "response", None)
+        retry_after = retry_after_seconds(response.headers if response is not None else None)
+        if retry_after is not None and retry_after > self.max_retry_after:
+            # E.g. a daily quota reset: waiting would stall every caller for hours
+            return None, None
+        if retry_after is not None:
+            # A little jitter so callers paused together don't return together
+            return retry_after + random.uniform(0, min(1.0, 0.1 * retry_after + 0.1)), retry_after
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt)), None
+
+    def _failed(self, error, attempt):
+        """Records a failed attempt and returns the retry delay (None to give up)"""
+        delay, retry_after = self._retry_delay(error, attempt)
+        rate_limited = isinstance(error, RATE_LIMIT_ERRORS)
+        self.release(rate_limited=rate_limited, retry_after=retry_after)
+        with self._lock:
+            self.stats["rate_limited" if rate_limited else "errors"] += 1
+            if delay is not None:
+                self.stats["retries"] += 1
+        return delay
+
+    def call(self, create, consume=None):
+        """
+        Sends a request under the limiter, retrying retryable errors.
+
+        Args:
+            create (callable): Sends the request and returns the response
+            consume (callable, optional): Turns the response into the result (e.g. reads a
+                                          stream); runs while the slot is still held
+
+        Returns:
+            The result of consume, or the response
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            start = time.monotonic()
+            try:
+                response = create()
+                latency = time.monotonic() - start
+                result = consume(response) if consume else response
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self.release(latency)
+            return result
+
+    async def acall(self, create, consume=None):
+        """
+        Async counterpart of call.
+
+        Args:
+            create (callable): Returns an awaitable that sends the request
+            consume (callable, optional): Returns an awaitable turning the response into the result
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.aacquire()
+            start = time.monotonic()
+            try:
+                response = await create()
+                latency = time.monotonic() - start
+                result = await consume(response) if consume else response
+            except asyncio.CancelledError:
+                self.release()
+                raise
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self.release(latency)
+            return result
+
+
+_rate_limiters = {}
+_rate_limit_overrides = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def configure_rate_limit(provider, model=None, **settings):
+    """
+    Overrides the limiter settings of a provider, or of one of its models.
+
+    Applies to limiters created afterwards; call it before creating generators.
+
+    Args:
+        provider (str): Provider name (see provider_name)
+        model (str, optional): Model name; the whole provider if None
+        **settings: RateLimiter arguments, e.g. requests_per_minute or max_concurrency
+    """
+    with _rate_limiters_lock:
+        _rate_limit_overrides.setdefault((provider, model), {}).update(settings)
+
+
+def get_rate_limiter(provider, model):
+    """
+    Returns the limiter shared by every generator that sends requests to a model of a provider.
+
+    Args:
+        provider (str): Provider name (see provider_name)
+        model (str): Model name
+
+    Returns:
+        RateLimiter: The shared limiter
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get((provider, model))
+        if limiter is None:
+            tier = f"{provider}:free" if model.endswith(":free") else provider
+            settings = dict(DEFAULT_RATE_LIMITS.get(tier) or DEFAULT_RATE_LIMITS.get(provider)
+                            or DEFAULT_RATE_LIMITS["default"])
+            settings.update(_rate_limit_overrides.get((provider, None), {}))
+            settings.update(_rate_limit_overrides.get((provider, model), {}))
+            limiter = _rate_limiters[(provider, model)] = RateLimiter(**settings)
+        return limiter
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+import sqlite3
+import contextlib
+from types import SimpleNamespace
+
+# Default location of the on-disk LLM response cache
+DEFAULT_CACHE_PATH = os.path.join('temp', 'llm_cache.sqlite')
+
+# Characters per chunk when replaying a response as a stream
+REPLAY_CHUNK_SIZE = 16
+
+
+def make_request_key(params, variant=None):
+    """
+    Builds the cache key for a chat completion request.
+
+    Args:
+        params (dict): Request parameters as sent to chat.completions.create
+        variant (int, optional): Distinguishes identical requests that should get
+                                 different responses (e.g. speculative candidates)
+
+    Returns:
+        str: Hex digest of the model, messages, temperature, max_tokens and variant
+    """
+    max_tokens = params.get("max_tokens", params.get("max_completion_tokens"))
+    request = {
+        "model": params["model"],
+        "messages": params["messages"],
+        "temperature": params.get("temperature"),
+        "max_tokens": max_tokens,
+    }
+    # Variant 0 shares the key of a plain request
+    if variant:
+        request["variant"] = variant
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of LLM responses.
+
+    Responses are stored zlib-compressed and keyed on make_request_key().
+    Entries older than ttl_seconds are treated as misses (except when replaying),
+    and the least recently used entries are evicted once the compressed size
+    exceeds max_size_mb. The cache doubles as the transcript store for the
+    'replay' API type.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=None, max_size_mb=512):
+        """
+        Open (and create if needed) the cache.
+
+        Args:
+            path (str): Path of the SQLite database
+            ttl_seconds (float, optional): Maximum age of a usable entry (no limit if None)
+            max_size_mb (float): Maximum total compressed size in megabytes
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Yields a connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key, ignore_ttl=False):
+        """
+        Looks up a cached response.
+
+        Args:
+            key (str): Key from make_request_key()
+            ignore_ttl (bool): Whether to return expired entries too
+
+        Returns:
+            str: The response content, or None on a miss
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if not ignore_ttl and self.ttl_seconds is not None and time.time() - row[1] > self.ttl_seconds:
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))["content"]
+
+    def put(self, key, params, content):
+        """
+        Stores a response and evicts expired and least recently used entries.
+
+        Args:
+            key (str): Key from make_request_key()
+            params (dict): The request parameters (the messages are kept with the response)
+            content (str): The response content
+        """
+        record = {"model": params["model"], "messages": params["messages"], "content": content}
+        payload = zlib.compress(json.dumps(record).encode('utf-8'))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, payload, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, params["model"], payload, len(payload), now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        if self.ttl_seconds is not None:
+            conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        evicted_keys = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            if total <= self.max_size_bytes:
+                break
+            evicted_keys.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", evicted_keys)
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def _completion(content):
+    """Builds an object shaped like a non-streaming chat completion"""
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content))])
+
+
+def _chunk(content):
+    """Builds an object shaped like a streamed chat completion chunk"""
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class _ReplayCompletions:
+    def __init__(self, transcripts, latency, token_latency, variant=None):
+        self.transcripts = transcripts
+        self.variant = variant
+        self.latency = latency
+        self.token_latency = token_latency
+
+    def _lookup(self, params):
+        content = self.transcripts.get(make_request_key(params, self.variant), ignore_ttl=True)
+        if content is None:
+            raise LookupError(f"No recorded response for this request to {params['model']}")
+        return content
+
+    def _pieces(self, content):
+        return [content[i:i + REPLAY_CHUNK_SIZE] for i in range(0, len(content), REPLAY_CHUNK_SIZE)]
+
+    def create(self, **params):
+        content = self._lookup(params)
+        time.sleep(self.latency)
+        if not params.get("stream"):
+            time.sleep(self.token_latency * len(self._pieces(content)))
+            return _completion(content)
+        return self._stream(content)
+
+    def _stream(self, content):
+        for piece in self._pieces(content):
+            time.sleep(self.token_latency)
+            yield _chunk(piece)
+
+
+class _AsyncReplayCompletions(_ReplayCompletions):
+    async def create(self, **params):
+        content = self._lookup(params)
+        await asyncio.sleep(self.latency)
+        if not params.get("stream"):
+            await asyncio.sleep(self.token_latency * len(self._pieces(content)))
+            return _completion(content)
+        return self._stream(content)
+
+    async def _stream(self, content):
+        for piece in self._pieces(content):
+            await asyncio.sleep(self.token_latency)
+            yield _chunk(piece)
+
+
+class ReplayClient:
+    """
+    Stand-in for the OpenAI/Groq clients that serves recorded responses.
+
+    Responses come from a ResponseCache filled by earlier runs, with optional
+    injected latency before the first chunk and between chunks, so the pipeline
+    can be load tested deterministically without network access.
+    """
+    def __init__(self, transcripts, latency=0.0, token_latency=0.0, async_client=False, variant=None):
+        """
+        Args:
+            transcripts (ResponseCache): Store of recorded responses
+            latency (float): Seconds to wait before the first chunk
+            token_latency (float): Seconds to wait before each streamed chunk
+            async_client (bool): Whether create() is a coroutine, like AsyncOpenAI
+            variant (int, optional): Request key variant the responses were recorded under
+        """
+        completions_class = _AsyncReplayCompletions if async_client else _ReplayCompletions
+        self.chat = SimpleNamespace(completions=completions_class(transcripts, latency, token_latency, variant))
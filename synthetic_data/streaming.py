@@ -0,0 +1,110 @@
+import re
+import ast
+import codeop
+import warnings
+
+# Lines at column 0 that continue the previous top-level statement instead of starting a new one
+CONTINUATION_PATTERN = re.compile(r'(else|elif|except|finally)\b|[)\]}]')
+
+
+class CodeFenceWatcher:
+    """
+    Stop condition for streamed responses that contain a fenced code block.
+
+    Fed every streamed chunk, it follows the first ```<language> block and asks
+    the stream to stop as soon as that block's closing fence arrives, so the
+    explanation models like to add after the code is never generated.
+
+    While the block streams, each completed top-level statement (a class,
+    function, import, ...) is parsed with ast.parse as soon as the next one
+    starts. A block that fails to parse and is not merely incomplete (as judged
+    by codeop) is recorded in syntax_error, and with stop_on_syntax_error the
+    stream stops right there instead of generating the rest of a broken file.
+    """
+    def __init__(self, language="python", stop_on_syntax_error=True):
+        """
+        Args:
+            language (str): Language tag of the fence to watch
+            stop_on_syntax_error (bool): Whether to stop the stream at the first syntax error
+        """
+        self.language = language.lower()
+        self.stop_on_syntax_error = stop_on_syntax_error
+        self.in_code = False
+        self.closed = False
+        self.code_lines = []
+        self.syntax_error = None
+        self._partial_line = ""
+        self._block_start = 0
+
+    @property
+    def code(self):
+        """The code received so far"""
+        return "\n".join(self.code_lines)
+
+    @property
+    def should_stop(self):
+        return self.closed or (self.stop_on_syntax_error and self.syntax_error is not None)
+
+    def __call__(self, chunk):
+        """
+        Feeds a streamed chunk.
+
+        Args:
+            chunk (str): The newly received text
+
+        Returns:
+            bool: True once the stream should be stopped
+        """
+        *lines, self._partial_line = (self._partial_line + chunk).split("\n")
+        for line in lines:
+            self._feed_line(line)
+            if self.should_stop:
+                return True
+        # A line starting with a fence inside the block can only be the closing one
+        if self.in_code and self._partial_line.lstrip().startswith("```"):
+            self._close()
+        return self.should_stop
+
+    def _feed_line(self, line):
+        stripped = line.strip()
+        if not self.in_code:
+            if stripped.lower().startswith("```" + self.language):
+                self.in_code = True
+            return
+        if stripped.startswith("```"):
+            self._close()
+            return
+        starts_statement = line[:1] not in ("", " ", "\t", "#") and not CONTINUATION_PATTERN.match(line)
+        if starts_statement:
+            # Everything before this line is a run of complete top-level statements
+            self._check_block(final=False)
+        self.code_lines.append(line)
+
+    def _close(self):
+        self._check_block(final=True)
+        self.closed = True
+
+    def _check_block(self, final):
+        """Parses the lines since the last successfully parsed top-level statement"""
+        block = "\n".join(self.code_lines[self._block_start:])
+        if self.syntax_error is not None or not block.strip():
+            return
+        try:
+            ast.parse(block)
+        except SyntaxError as e:
+            if not final and self._is_incomplete(block):
+                # e.g. a decorator waiting for its function; parse again with more lines
+                return
+            self.syntax_error = {'message': e.msg, 'line': self._block_start + (e.lineno or 1)}
+            return
+        self._block_start = len(self.code_lines)
+
+    @staticmethod
+    def _is_incomplete(block):
+        """Checks whether a block that fails to parse could still become valid with more lines"""
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            try:
+                return codeop.compile_command(block + "\n", "<stream>", "exec") is None
+            except (SyntaxError, ValueError, OverflowError):
+                return False
@@ -0,0 +1,740 @@
+import os
+import ast
+import sys
+import json
+import time
+import inspect
+import difflib
+import builtins
+import textwrap
+import argparse
+import threading
+import importlib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.eval_cache import get_manim_version
+from utils.error_parser import categorize_error, error_signature, code_snippet
+
+# Default location of the cached index, next to the other run state in temp/
+DEFAULT_INDEX_PATH = os.path.join('temp', 'manim_api_index.json')
+
+# Version of the stored index format; bumped whenever its fields change
+INDEX_FORMAT_VERSION = 1
+
+# Names every module and class body has without binding them
+MODULE_NAMES = {"__file__", "__builtins__", "__annotations__", "__module__", "__qualname__", "__class__"}
+
+# Minimum similarity of a "did you mean" suggestion
+SUGGESTION_CUTOFF = 0.75
+
+# Method decorators that keep the signature of the decorated function
+TRANSPARENT_DECORATORS = ("staticmethod", "classmethod", "property", "abstractmethod", "overload")
+
+
+def _class_key(cls):
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def _signature_info(function, skip_first=False):
+    """
+    Reads the keyword parameters of a callable.
+
+    Args:
+        function (callable): The callable
+        skip_first (bool): Whether to drop the first parameter (self of a plain method)
+
+    Returns:
+        dict: 'params' (names that can be passed by keyword) and 'varkw' (whether it
+              takes **kwargs), or None if the callable has no readable signature
+    """
+    try:
+        parameters = list(inspect.signature(function).parameters.values())
+    except (TypeError, ValueError):
+        return None
+    if skip_first:
+        parameters = parameters[1:]
+    keyword_kinds = (inspect.Parameter.POSITIONAL_OR_KEYWORD, inspect.Parameter.KEYWORD_ONLY)
+    return {
+        "params": [p.name for p in parameters if p.kind in keyword_kinds],
+        "varkw": any(p.kind == inspect.Parameter.VAR_KEYWORD for p in parameters),
+    }
+
+
+def _parse_function(function):
+    """Returns the FunctionDef of a Python function, or None if its source is unavailable"""
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(function)))
+    except (OSError, TypeError, SyntaxError):
+        return None
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return node
+    return None
+
+
+def _scan_method(node):
+    """
+    Finds the attributes a method assigns.
+
+    Returns:
+        tuple: (attributes assigned on its first argument, attributes assigned on other
+                objects, whether it sets attributes on itself dynamically)
+    """
+    arguments = node.args.posonlyargs + node.args.args
+    self_name = arguments[0].arg if arguments else None
+    own, foreign, dynamic = set(), set(), False
+    for child in ast.walk(node):
+        if isinstance(child, ast.Attribute):
+            if isinstance(child.value, ast.Name) and child.value.id == self_name:
+                if not isinstance(child.ctx, ast.Load):
+                    own.add(child.attr)
+                elif child.attr == "__dict__":
+                    dynamic = True
+            elif not isinstance(child.ctx, ast.Load):
+                foreign.add(child.attr)
+        elif (isinstance(child, ast.Call) and isinstance(child.func, ast.Name) and child.func.id == "setattr"
+              and child.args and isinstance(child.args[0], ast.Name) and child.args[0].id == self_name):
+            dynamic = True
+    return own, foreign, dynamic
+
+
+def _getattr_prefixes(node):
+    """
+    Reads which attribute names a __getattr__ answers, from the str.startswith checks it makes.
+
+    Mobject.__getattr__ for example synthesizes get_<attribute> and set_<attribute>
+    and raises AttributeError for everything else.
+
+    Returns:
+        list: The prefixes, or None if it may answer any name
+    """
+    # Names that match no prefix must end in an AttributeError
+    if not node.body or not isinstance(node.body[-1], ast.Raise):
+        return None
+    prefixes = []
+    for child in ast.walk(node):
+        if (isinstance(child, ast.Call) and isinstance(child.func, ast.Attribute)
+                and child.func.attr == "startswith" and child.args):
+            argument = child.args[0]
+            values = argument.elts if isinstance(argument, ast.Tuple) else [argument]
+            if not all(isinstance(v, ast.Constant) and isinstance(v.value, str) for v in values):
+                return None
+            prefixes.extend(v.value for v in values)
+    return prefixes or None
+
+
+def _class_info(cls):
+    """
+    Introspects one class (not its bases).
+
+    Returns:
+        tuple: (info, foreign) where info is a dict with its attribute names (including
+               instance attributes assigned in its methods), method signatures, __init__
+               signature and how complete the attribute list is, and foreign the attributes
+               its methods assign on other objects
+    """
+    info = {
+        "bases": [_class_key(base) for base in cls.__mro__[1:]],
+        "attributes": set(cls.__dict__),
+        "methods": {},
+        "complete": True,
+        # False, or the prefixes of the names __getattr__ answers (None: any name)
+        "dynamic": False,
+        "custom_new": "__new__" in cls.__dict__ and cls is not object,
+    }
+    info["attributes"].update(cls.__dict__.get("__annotations__", {}))
+    info["attributes"].update(getattr(cls, "__dataclass_fields__", {}))
+    slots = cls.__dict__.get("__slots__", ())
+    info["attributes"].update([slots] if isinstance(slots, str) else slots)
+    if type(cls).__call__ is not type.__call__:
+        # A metaclass __call__ decides the constructor arguments itself
+        info["custom_new"] = True
+
+    foreign = set()
+    for name, raw in cls.__dict__.items():
+        if isinstance(raw, property):
+            functions = [f for f in (raw.fget, raw.fset) if inspect.isfunction(f)]
+        elif isinstance(raw, (staticmethod, classmethod)):
+            functions = [raw.__func__] if inspect.isfunction(raw.__func__) else []
+        else:
+            functions = [raw] if inspect.isfunction(raw) else []
+
+        # Wrapping decorators (e.g. manim's deprecated_params) may accept more than the signature says
+        wrapped = any(hasattr(function, "__wrapped__") for function in functions)
+        for function in functions:
+            # Generated methods (e.g. dataclass __init__) have no source; their fields are listed above
+            if function.__code__.co_filename.startswith("<"):
+                continue
+            node = _parse_function(function)
+            if node is None:
+                info["complete"] = False
+                continue
+            wrapped = wrapped or any(
+                (d.id if isinstance(d, ast.Name) else d.attr if isinstance(d, ast.Attribute) else None)
+                not in TRANSPARENT_DECORATORS for d in node.decorator_list
+            )
+            own, other, dynamic = _scan_method(node)
+            info["attributes"].update(own)
+            foreign.update(other)
+            if dynamic:
+                info["complete"] = False
+            if name == "__getattr__":
+                info["dynamic"] = _getattr_prefixes(node)
+
+        if functions and not isinstance(raw, property):
+            signature = None if wrapped else _signature_info(getattr(cls, name), skip_first=inspect.isfunction(raw))
+            if name == "__init__":
+                info["init"] = signature
+            else:
+                info["methods"][name] = signature
+        elif name == "__init__":
+            # Slot wrappers and other non-Python constructors
+            info["init"] = _signature_info(raw, skip_first=True)
+
+    if "__getattr__" in cls.__dict__ and info["dynamic"] is False:
+        # A __getattr__ without readable source may answer anything
+        info["dynamic"] = None
+    info["attributes"] = sorted(info["attributes"])
+    return info, foreign
+
+
+class ManimAPIIndex:
+    """
+    Index of the public API of manim, built by introspection.
+
+    Holds what `from manim import *` exports and, for every class reachable
+    from there (including the classes of exported constants like BLUE or
+    config), its attributes, its method signatures and its __init__
+    signature. Instance attributes are found by scanning the methods' source
+    for assignments to self.
+
+    Building takes a few seconds, so the index is cached as JSON and rebuilt
+    only when the manim version changes (see get_api_index).
+    """
+    def __init__(self, data):
+        """
+        Args:
+            data (dict): Index data, as built by build or stored by save
+        """
+        self.data = data
+        self.exports = data["exports"]
+        self.classes = data["classes"]
+        self.foreign_attributes = set(data["foreign_attributes"])
+        self._class_attributes = {}
+
+    @classmethod
+    def build(cls, module_name="manim"):
+        """
+        Builds the index by introspecting a module.
+
+        Args:
+            module_name (str): Module whose star-exports are indexed
+
+        Returns:
+            ManimAPIIndex: The index
+        """
+        module = importlib.import_module(module_name)
+        names = getattr(module, "__all__", None) or [name for name in dir(module) if not name.startswith("_")]
+        classes = {}
+        foreign_attributes = set()
+
+        def add_class(klass):
+            for c in klass.__mro__:
+                key = _class_key(c)
+                if key in classes:
+                    continue
+                try:
+                    classes[key], foreign = _class_info(c)
+                    foreign_attributes.update(foreign)
+                except Exception:
+                    # Descriptors can raise anything; such classes are indexed as opaque and never checked
+                    classes[key] = {"bases": [_class_key(base) for base in c.__mro__[1:]],
+                                    "attributes": sorted(c.__dict__), "methods": {}, "complete": False,
+                                    "dynamic": None, "custom_new": True}
+            return _class_key(klass)
+
+        exports = {}
+        for name in names:
+            try:
+                value = getattr(module, name)
+            except AttributeError:
+                continue
+            if inspect.isclass(value):
+                exports[name] = {"kind": "class", "class": add_class(value)}
+            elif inspect.ismodule(value):
+                exports[name] = {"kind": "module", "module": value.__name__, "attributes": sorted(dir(value)),
+                                 "dynamic": hasattr(value, "__getattr__")}
+            elif inspect.isfunction(value) or inspect.isbuiltin(value):
+                exports[name] = {"kind": "function", "signature": _signature_info(value)}
+            else:
+                exports[name] = {"kind": "instance", "class": add_class(type(value)),
+                                 "attributes": sorted(vars(value)) if hasattr(value, "__dict__") else []}
+
+        return cls({
+            "format_version": INDEX_FORMAT_VERSION,
+            "manim_version": get_manim_version(),
+            "module": module_name,
+            "exports": exports,
+            "classes": classes,
+            "foreign_attributes": sorted(foreign_attributes),
+        })
+
+    @classmethod
+    def load(cls, path):
+        """Loads an index saved with save"""
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        """Writes the index to a JSON file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        partial_path = f"{path}.{os.getpid()}.tmp"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(partial_path, path)
+
+    def _mro(self, key):
+        return [k for k in [key] + self.classes[key]["bases"] if k in self.classes]
+
+    def class_attributes(self, key):
+        """
+        Collects the attributes of instances of a class, over its whole MRO.
+
+        Returns:
+            tuple: (attribute names, whether the list is complete, prefixes of names a
+                   __getattr__ answers or None if it answers any name)
+        """
+        cached = self._class_attributes.get(key)
+        if cached is None:
+            attributes, complete, prefixes = set(), True, set()
+            for k in self._mro(key):
+                info = self.classes[k]
+                attributes.update(info["attributes"])
+                complete = complete and info["complete"]
+                if info["dynamic"] is None:
+                    prefixes = None
+                elif info["dynamic"] and prefixes is not None:
+                    prefixes.update(info["dynamic"])
+            cached = self._class_attributes[key] = (attributes, complete,
+                                                    tuple(prefixes) if prefixes is not None else None)
+        return cached
+
+    def has_attribute(self, key, name):
+        """Whether instances of a class may have an attribute (True whenever the index can't tell)"""
+        attributes, complete, prefixes = self.class_attributes(key)
+        if name in attributes or name in self.foreign_attributes or not complete or prefixes is None:
+            return True
+        return name.startswith(prefixes) if prefixes else False
+
+    def constructor_keywords(self, key):
+        """
+        Keyword arguments a class accepts.
+
+        An __init__ taking **kwargs may pop its own options from them or hand
+        them to something other than super() (e.g. Arrow pops tip_shape,
+        Paragraph forwards them to Text), so its keywords can't be known.
+
+        Returns:
+            set: The accepted keywords, or None if any keyword may be accepted
+        """
+        for k in self._mro(key):
+            info = self.classes[k]
+            if info["custom_new"]:
+                return None
+            if "init" not in info:
+                continue
+            if info["init"] is None or info["init"]["varkw"]:
+                return None
+            return set(info["init"]["params"])
+        return None
+
+    def method_keywords(self, key, method):
+        """
+        Keyword arguments a method of a class accepts.
+
+        Returns:
+            set: The accepted keywords, or None if unknown or if it takes **kwargs
+        """
+        for k in self._mro(key):
+            info = self.classes[k]
+            if method in info["attributes"]:
+                signature = info["methods"].get(method)
+                if signature is None or signature["varkw"]:
+                    return None
+                return set(signature["params"])
+        return None
+
+
+def _bindings(tree):
+    """
+    Collects the names a module binds anywhere, ignoring scopes.
+
+    Returns:
+        tuple: (all bound names, names bound other than by assignment to a plain name)
+    """
+    assigned, other = set(), set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            assigned.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            other.add(node.name)
+        elif isinstance(node, ast.arg):
+            other.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            other.update((alias.asname or alias.name).split(".")[0] for alias in node.names if alias.name != "*")
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            other.add(node.name)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            other.update(node.names)
+        elif isinstance(node, (ast.MatchAs, ast.MatchStar)) and node.name:
+            other.add(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            other.add(node.rest)
+    return assigned | other, other
+
+
+def bound_names(tree):
+    """Returns the names a parsed module binds anywhere (assignments, definitions, imports, parameters)"""
+    return _bindings(tree)[0]
+
+
+class _APIChecker(ast.NodeVisitor):
+    """Resolves the names, attributes and call keywords of a parsed module against a ManimAPIIndex"""
+    def __init__(self, index, tree, extra_names=()):
+        self.index = index
+        self.problems = []
+        self.user_names, other_bindings = _bindings(tree)
+        self.known_names = self.user_names | set(extra_names) | set(dir(builtins)) | MODULE_NAMES
+        nodes = list(ast.walk(tree))
+        # Names from another star import can't be resolved
+        self.check_names = not any(
+            isinstance(node, ast.ImportFrom) and node.module != self.index.data["module"]
+            and any(alias.name == "*" for alias in node.names) for node in nodes
+        )
+        # Attributes the code sets itself exist wherever they are read
+        self.assigned_attributes = {node.attr for node in nodes
+                                    if isinstance(node, ast.Attribute) and not isinstance(node.ctx, ast.Load)}
+        self.check_attributes = not any(
+            isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in ("setattr", "exec", "eval", "globals", "vars") for node in nodes
+        )
+        self.variable_classes = self._variable_classes(nodes, other_bindings)
+        self.user_classes = {node.name: node for node in nodes if isinstance(node, ast.ClassDef)}
+        self._self = None
+
+    def _export(self, name, kind=None):
+        """Returns the index entry of a manim name the code doesn't rebind"""
+        if name in self.user_names:
+            return None
+        export = self.index.exports.get(name)
+        return export if export is not None and (kind is None or export["kind"] == kind) else None
+
+    def _constructed_class(self, node):
+        """Returns the class key if node constructs a manim class, e.g. Square(...)"""
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            export = self._export(node.func.id, "class")
+            return export["class"] if export else None
+        return None
+
+    def _variable_classes(self, nodes, other_bindings):
+        """Variables whose every assignment constructs the same manim class"""
+        constructed = {}
+        for node in nodes:
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                constructed[id(node.targets[0])] = self._constructed_class(node.value)
+            elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name) and node.value is not None:
+                constructed[id(node.target)] = self._constructed_class(node.value)
+        candidates = {}
+        for node in nodes:
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                candidates.setdefault(node.id, set()).add(constructed.get(id(node)))
+        return {name: next(iter(keys)) for name, keys in candidates.items()
+                if len(keys) == 1 and None not in keys and name not in other_bindings}
+
+    def _user_class(self, name, seen=None):
+        """
+        Collects the attributes of a class defined in the code and the manim classes it derives from.
+
+        Returns:
+            tuple: (attribute names, manim class keys), or None if a base can't be resolved
+        """
+        seen = seen or set()
+        node = self.user_classes.get(name)
+        if node is None or name in seen or node.decorator_list or node.keywords:
+            return None
+        seen.add(name)
+        attributes = set()
+        for child in ast.walk(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                attributes.add(child.name)
+            elif isinstance(child, ast.Name) and not isinstance(child.ctx, ast.Load):
+                attributes.add(child.id)
+        keys = []
+        for base in node.bases:
+            export = self._export(base.id, "class") if isinstance(base, ast.Name) else None
+            if export is not None:
+                keys.append(export["class"])
+                continue
+            resolved = self._user_class(base.id, seen) if isinstance(base, ast.Name) else None
+            if resolved is None:
+                return None
+            attributes.update(resolved[0])
+            keys.extend(resolved[1])
+        return attributes, keys
+
+    def _target(self, node):
+        """
+        Works out what an expression is, as far as the index can tell.
+
+        Returns:
+            tuple: ('class', key, is_type) for manim classes and their instances,
+                   ('instance', export) for exported instances (e.g. config),
+                   ('module', export) for manim modules, ('user', attributes, keys, name)
+                   for self in a class deriving from manim classes, or None
+        """
+        if isinstance(node, ast.Name):
+            if self._self is not None and node.id == self._self[0]:
+                return self._self[1]
+            if node.id in self.variable_classes:
+                return ("class", self.variable_classes[node.id], False)
+            export = self._export(node.id)
+            if export is None:
+                return None
+            if export["kind"] == "class":
+                return ("class", export["class"], True)
+            if export["kind"] == "instance":
+                return ("instance", export)
+            if export["kind"] == "module":
+                return ("module", export)
+            return None
+        key = self._constructed_class(node)
+        return ("class", key, False) if key else None
+
+    def _problem(self, node, error_class, message, word=None, candidates=()):
+        if word is not None:
+            matches = difflib.get_close_matches(word, list(candidates), n=1, cutoff=SUGGESTION_CUTOFF)
+            suggestion = f" (did you mean '{matches[0]}'?)" if matches else ""
+        else:
+            suggestion = ""
+        self.problems.append({"line": node.lineno, "error_class": error_class, "message": message,
+                              "suggestion": suggestion})
+
+    def visit_ClassDef(self, node):
+        resolved = self._user_class(node.name)
+        for child in node.body:
+            arguments = (child.args.posonlyargs + child.args.args
+                         if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)) else [])
+            is_method = arguments and not any(
+                isinstance(d, ast.Name) and d.id in ("staticmethod", "classmethod") for d in child.decorator_list
+            )
+            if is_method and resolved is not None and resolved[1]:
+                outer, self._self = self._self, (arguments[0].arg, ("user", resolved[0], resolved[1], node.name))
+                self.visit(child)
+                self._self = outer
+            else:
+                self.visit(child)
+        for child in node.bases + node.keywords + node.decorator_list:
+            self.visit(child)
+
+    def visit_Name(self, node):
+        if (self.check_names and isinstance(node.ctx, ast.Load) and node.id not in self.known_names
+                and node.id not in self.index.exports):
+            self._problem(node, "NameError", f"name '{node.id}' is not defined", node.id,
+                          set(self.index.exports) | self.known_names)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.ctx, ast.Load) and self.check_attributes and node.attr not in self.assigned_attributes:
+            self._check_attribute(node)
+        self.generic_visit(node)
+
+    def _check_attribute(self, node):
+        target = self._target(node.value)
+        if target is None:
+            return
+        attr = node.attr
+        if target[0] == "class":
+            _, key, is_type = target
+            if self.index.has_attribute(key, attr):
+                return
+            name = key.rsplit(".", 1)[-1]
+            message = (f"type object '{name}' has no attribute '{attr}'" if is_type
+                       else f"'{name}' object has no attribute '{attr}'")
+            self._problem(node, "AttributeError", message, attr, self.index.class_attributes(key)[0])
+        elif target[0] == "instance":
+            export = target[1]
+            if attr in export["attributes"] or self.index.has_attribute(export["class"], attr):
+                return
+            name = export["class"].rsplit(".", 1)[-1]
+            self._problem(node, "AttributeError", f"'{name}' object has no attribute '{attr}'", attr,
+                          self.index.class_attributes(export["class"])[0] | set(export["attributes"]))
+        elif target[0] == "module":
+            export = target[1]
+            if export["dynamic"] or attr in export["attributes"]:
+                return
+            self._problem(node, "AttributeError", f"module '{export['module']}' has no attribute '{attr}'",
+                          attr, export["attributes"])
+        elif target[0] == "user":
+            _, attributes, keys, name = target
+            if attr in attributes or any(self.index.has_attribute(key, attr) for key in keys):
+                return
+            candidates = set(attributes).union(*(self.index.class_attributes(key)[0] for key in keys))
+            self._problem(node, "AttributeError", f"'{name}' object has no attribute '{attr}'", attr, candidates)
+
+    def visit_Call(self, node):
+        keywords, callee = self._call_keywords(node.func)
+        if keywords is not None:
+            for keyword in node.keywords:
+                if keyword.arg is not None and keyword.arg not in keywords:
+                    self._problem(keyword, "TypeError",
+                                  f"{callee}() got an unexpected keyword argument '{keyword.arg}'",
+                                  keyword.arg, keywords)
+        self.generic_visit(node)
+
+    def _call_keywords(self, func):
+        """Returns (accepted keywords or None if any, name of the callee) of a call's function"""
+        if isinstance(func, ast.Name):
+            export = self._export(func.id)
+            if export is None:
+                return None, None
+            if export["kind"] == "class":
+                return self.index.constructor_keywords(export["class"]), func.id
+            if export["kind"] == "function" and export["signature"] and not export["signature"]["varkw"]:
+                return set(export["signature"]["params"]), func.id
+            return None, None
+        if not isinstance(func, ast.Attribute):
+            return None, None
+        target = self._target(func.value)
+        if target is None:
+            return None, None
+        if target[0] == "class":
+            key = target[1]
+        elif target[0] == "instance":
+            key = target[1]["class"]
+        elif target[0] == "user" and func.attr not in target[1]:
+            key = next((k for k in target[2] if func.attr in self.index.class_attributes(k)[0]), None)
+        else:
+            return None, None
+        if key is None:
+            return None, None
+        return self.index.method_keywords(key, func.attr), f"{key.rsplit('.', 1)[-1]}.{func.attr}"
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_api_index(path=DEFAULT_INDEX_PATH):
+    """
+    Returns the index of the installed manim, loading it from path or building
+    (and saving) it if the file is missing or was built for another version.
+
+    Returns:
+        ManimAPIIndex: The index, or None if manim can't be introspected
+    """
+    with _indexes_lock:
+        if path in _indexes:
+            return _indexes[path]
+        index = None
+        try:
+            index = ManimAPIIndex.load(path)
+            if (index.data.get("format_version") != INDEX_FORMAT_VERSION
+                    or index.data.get("manim_version") != get_manim_version()):
+                index = None
+        except (OSError, ValueError, KeyError):
+            index = None
+        if index is None:
+            try:
+                index = ManimAPIIndex.build()
+            except Exception:
+                # The precheck is only an early exit; evaluation works without it
+                index = None
+            else:
+                try:
+                    index.save(path)
+                except OSError:
+                    pass
+        _indexes[path] = index
+        return index
+
+
+def precheck_manim_code(code_string, index=None, extra_names=()):
+    """
+    Statically checks Manim code against the manim API, without running it.
+
+    Reports names that are never defined, attributes that manim classes,
+    instances and modules don't have, and keyword arguments that manim
+    constructors and methods don't accept. Whatever the index can't resolve
+    (variables of unknown type, classes with dynamic attributes, callables
+    taking **kwargs) passes, so valid code is never rejected.
+
+    Args:
+        code_string (str): The Manim code to check (must parse)
+        index (ManimAPIIndex, optional): The index; get_api_index() if None
+        extra_names (iterable): Names available without being bound in the code (e.g. added imports)
+
+    Returns:
+        tuple: (success, details) where details holds, on failure, 'error' (the
+               problems with the first one's code snippet), 'error_class',
+               'error_category', 'error_signature', 'error_line' and 'api_problems'
+    """
+    index = index if index is not None else get_api_index()
+    if index is None:
+        return True, {}
+    tree = ast.parse(code_string)
+    checker = _APIChecker(index, tree, extra_names)
+    checker.visit(tree)
+    if not checker.problems:
+        return True, {}
+
+    problems = []
+    for problem in sorted(checker.problems, key=lambda p: p["line"]):
+        if problem not in problems:
+            problems.append(problem)
+    first = problems[0]
+    parts = [f"{first['error_class']}: {first['message']}{first['suggestion']}", f"at line {first['line']}:"]
+    snippet = code_snippet(code_string, first["line"])
+    if snippet:
+        parts.append(snippet)
+    if len(problems) > 1:
+        parts.append("Other problems:")
+        parts.extend(f"line {p['line']}: {p['error_class']}: {p['message']}{p['suggestion']}" for p in problems[1:])
+    return False, {
+        'error': "\n".join(parts),
+        'error_class': first["error_class"],
+        'error_category': categorize_error(first["error_class"], first["message"]),
+        'error_signature': error_signature(first["error_class"], first["message"]),
+        'error_line': first["line"],
+        'api_problems': problems,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the manim API index and check scene files against it.")
+    parser.add_argument("files", nargs="*", help="Python files to check")
+    parser.add_argument("--path", default=DEFAULT_INDEX_PATH, help="Location of the cached index")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index even if it is up to date")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(args.path):
+        os.remove(args.path)
+    start_time = time.perf_counter()
+    api_index = get_api_index(args.path)
+    if api_index is None:
+        sys.exit("manim could not be introspected")
+    print(f"Index of manim {api_index.data['manim_version']}: {len(api_index.exports)} exports, "
+          f"{len(api_index.classes)} classes ({time.perf_counter() - start_time:.2f}s)")
+
+    failed = False
+    for file_path in args.files:
+        with open(file_path, encoding="utf-8") as f:
+            source = f.read()
+        start_time = time.perf_counter()
+        ok, check_details = precheck_manim_code(source, api_index)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        print(f"{file_path}: {'ok' if ok else 'rejected'} ({elapsed_ms:.1f}ms)")
+        if not ok:
+            failed = True
+            print(check_details['error'])
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Import from utils directly since it's at the project root level
+from code_utils import eval_manim_code, REPO_ROOT
+from eval_cache import EvalCache, get_manim_version
+from manim_worker import ManimWorkerPool
+from test_manim_run import valid_code, invalid_code_1, invalid_code_2, invalid_code_3, test_code_1
+
+# Default file benchmark runs are appended to, one JSON object per run
+DEFAULT_RESULTS_PATH = os.path.join('temp', 'benchmarks', 'eval_benchmark.jsonl')
+
+# How each mode calls eval_manim_code: the tier, and whether it renders in the
+# warm worker pool or goes through a pre-warmed result cache
+BENCHMARK_MODES = {
+    # A fresh interpreter per scene, as without --warm-pool
+    "cold": {"tier": "preview", "pool": False, "cache": False},
+    # The same renders in a ManimWorkerPool
+    "warm": {"tier": "preview", "pool": True, "cache": False},
+    # construct() only, no frames, in a fresh interpreter
+    "dry_run": {"tier": "dry_run", "pool": False, "cache": False},
+    # Every scene already in the EvalCache
+    "cached": {"tier": "preview", "pool": False, "cache": True},
+}
+
+# Scenes from test_manim_run.py: (name, code, expected validity)
+BUILTIN_CORPUS = [
+    ("valid_code", valid_code, True),
+    ("invalid_code_1", invalid_code_1, False),
+    ("invalid_code_2", invalid_code_2, False),
+    # eval_manim_code adds the missing manim import itself
+    ("invalid_code_3", invalid_code_3, True),
+    ("test_code_1", test_code_1, False),
+]
+
+
+def load_corpus(path, code_field="code", valid_field="valid"):
+    """
+    Loads benchmark scenes from a JSONL file.
+
+    Args:
+        path (str): JSONL file with one scene per line
+        code_field (str): Field holding the scene code
+        valid_field (str): Field holding whether the scene is expected to pass (optional per line)
+
+    Returns:
+        list: (name, code, expected validity or None) tuples
+    """
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get(code_field):
+                continue
+            name = record.get("name") or f"{os.path.basename(path)}:{line_number}"
+            corpus.append((name, record[code_field], record.get(valid_field)))
+    return corpus
+
+
+def latency_summary(latencies, wall_time):
+    """
+    Summarizes the per-scene latencies of one benchmark run.
+
+    Args:
+        latencies (list): Seconds per eval_manim_code call
+        wall_time (float): Seconds the whole run took
+
+    Returns:
+        dict: p50/p95/p99/mean latency in seconds and throughput in scenes per minute
+    """
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "mean": float(np.mean(latencies)),
+        "scenes_per_minute": len(latencies) / wall_time * 60 if wall_time > 0 else None,
+    }
+
+
+def run_mode(corpus, concurrency, repeat=1, **eval_kwargs):
+    """
+    Evaluates the corpus repeat times with concurrency parallel calls.
+
+    Args:
+        corpus (list): (name, code, expected validity) tuples
+        concurrency (int): Number of scenes evaluated at once
+        repeat (int): Number of passes over the corpus
+        **eval_kwargs: Arguments of eval_manim_code (tier, pool, cache)
+
+    Returns:
+        dict: Latency summary plus the scene count, cache hits and scenes whose
+              result differed from their expected validity
+    """
+    scenes = corpus * repeat
+
+    def evaluate(scene):
+        name, code, expected = scene
+        start_time = time.perf_counter()
+        success, details = eval_manim_code(code, save_code_py=False, **eval_kwargs)
+        return name, expected, success, details, time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(evaluate, scenes))
+    wall_time = time.perf_counter() - start_time
+
+    mismatches = sorted({name for name, expected, success, _, _ in results
+                         if expected is not None and success != expected})
+    summary = latency_summary([latency for *_, latency in results], wall_time)
+    summary.update({
+        "scenes": len(results),
+        "passed": sum(success for _, _, success, _, _ in results),
+        "cache_hits": sum(bool(details.get("cached")) for _, _, _, details, _ in results),
+        "wall_time": wall_time,
+        "mismatches": mismatches,
+    })
+    return summary
+
+
+def git_commit():
+    """Returns the checked out commit, or None outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(corpus, modes=tuple(BENCHMARK_MODES), concurrency_levels=(1, 2, 4), repeat=3):
+    """
+    Benchmarks eval_manim_code for every mode at every concurrency level.
+
+    The worker pool is started and the cache filled before anything is timed,
+    so warm and cached runs measure steady state only.
+
+    Args:
+        corpus (list): (name, code, expected validity) tuples
+        modes (tuple): Names of BENCHMARK_MODES to run
+        concurrency_levels (tuple): Numbers of scenes evaluated at once
+        repeat (int): Passes over the corpus per run
+
+    Returns:
+        dict: The benchmark record: environment, commit and one result per mode and concurrency level
+    """
+    pool = None
+    cache_dir = None
+    record = {
+        "timestamp": time.time(),
+        "git_commit": git_commit(),
+        "manim_version": get_manim_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "corpus_size": len(corpus),
+        "repeat": repeat,
+        "results": [],
+    }
+    print(f"{'mode':>8} {'conc':>5} {'p50 (s)':>9} {'p95 (s)':>9} {'p99 (s)':>9} {'scenes/min':>11} {'mismatches':>11}")
+    try:
+        for mode in modes:
+            settings = BENCHMARK_MODES[mode]
+            eval_kwargs = {"tier": settings["tier"]}
+            if settings["pool"]:
+                if pool is None:
+                    pool = ManimWorkerPool(size=max(concurrency_levels))
+                eval_kwargs["pool"] = pool
+            if settings["cache"]:
+                cache_dir = cache_dir or tempfile.mkdtemp(prefix="eval_benchmark_")
+                eval_kwargs["cache"] = EvalCache(os.path.join(cache_dir, f"{mode}.sqlite"))
+                run_mode(corpus, max(concurrency_levels), **eval_kwargs)
+
+            for concurrency in concurrency_levels:
+                summary = run_mode(corpus, concurrency, repeat, **eval_kwargs)
+                record["results"].append({"mode": mode, "tier": settings["tier"], "concurrency": concurrency,
+                                          **summary})
+                print(f"{mode:>8} {concurrency:>5} {summary['p50']:>9.3f} {summary['p95']:>9.3f} "
+                      f"{summary['p99']:>9.3f} {summary['scenes_per_minute']:>11.1f} {len(summary['mismatches']):>11}")
+    finally:
+        if pool is not None:
+            pool.close()
+        if cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+    return record
+
+
+def load_previous(path, corpus_size):
+    """Returns the last record in path benchmarked on a corpus of the same size, or None"""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("corpus_size") == corpus_size:
+                    previous = record
+    return previous
+
+
+def compare(record, previous):
+    """Prints the p50 and throughput change of every result since a previous record"""
+    earlier = {(r["mode"], r["concurrency"]): r for r in previous["results"]}
+    print(f"\nChange since {previous.get('git_commit') or 'previous run'} "
+          f"({time.strftime('%Y-%m-%d %H:%M', time.localtime(previous['timestamp']))}):")
+    for result in record["results"]:
+        before = earlier.get((result["mode"], result["concurrency"]))
+        if before is None or not before["p50"] or not before["scenes_per_minute"]:
+            continue
+        print(f"{result['mode']:>8} {result['concurrency']:>5} p50 {result['p50'] / before['p50'] - 1:>+7.1%} "
+              f"throughput {result['scenes_per_minute'] / before['scenes_per_minute'] - 1:>+7.1%}")
+
+
+def save_record(record, path):
+    """Appends a benchmark record to a JSONL file"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark eval_manim_code across validation modes.")
+    parser.add_argument("--corpus", action="append", default=[],
+                        help="JSONL file of extra scenes (repeatable); the test_manim_run.py scenes are always included")
+    parser.add_argument("--code-field", default="code", help="Corpus field holding the scene code")
+    parser.add_argument("--valid-field", default="valid", help="Corpus field holding the expected validity")
+    parser.add_argument("--modes", default=",".join(BENCHMARK_MODES),
+                        help=f"Comma-separated modes out of {', '.join(BENCHMARK_MODES)}")
+    parser.add_argument("--concurrency", default="1,2,4", help="Comma-separated concurrency levels")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per run")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_PATH, help="JSONL file the results are appended to")
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    unknown = [mode for mode in modes if mode not in BENCHMARK_MODES]
+    if unknown:
+        parser.error(f"Unknown modes: {', '.join(unknown)}")
+
+    corpus = list(BUILTIN_CORPUS)
+    for path in args.corpus:
+        corpus.extend(load_corpus(path, args.code_field, args.valid_field))
+
+    record = benchmark(corpus, modes, [int(n) for n in args.concurrency.split(",")], args.repeat)
+    previous = load_previous(args.output, len(corpus))
+    save_record(record, args.output)
+    print(f"\nResults appended to {args.output}")
+    if previous is not None:
+        compare(record, previous)
+    sys.exit(1 if any(result["mismatches"] for result in record["results"]) else 0)
@@ -0,0 +1,281 @@
+import ast
+import json
+import time
+import argparse
+import numpy as np
+from manim import Scene, Text, MathTex, VGroup, Rectangle
+
+# Import from utils directly since it's at the project root level
+from bounding_box import (if_box_overlap, find_overlapping_pairs, get_bounding_boxes, check_mobject_overlaps,
+                          get_mobject_name, create_bounding_box)
+from code_utils import ManimCodeTransformer
+
+# Manim's default frame size in scene units
+FRAME_WIDTH = 14.2
+FRAME_HEIGHT = 8.0
+
+# Prototypes of the mobject types synthetic scenes are built from; each scene
+# mobject is a copy, stretched and moved to a random box
+SCENE_MOBJECT_TYPES = {
+    "Text": lambda: Text("Label"),
+    "MathTex": lambda: MathTex(r"x^2 + y^2 = r^2"),
+    "VGroup": lambda: VGroup(Rectangle(width=1, height=0.5), Rectangle(width=0.5, height=1)),
+}
+
+# Smallest box side, so stretching never collapses a mobject to zero size
+MIN_MOBJECT_SIZE = 1e-3
+
+
+def random_boxes(n, mean_size=0.5, seed=0):
+    """
+    Creates n random bounding boxes spread over the Manim frame.
+
+    Args:
+        n (int): Number of boxes
+        mean_size (float): Mean width/height of a box in scene units
+        seed (int): Random seed
+
+    Returns:
+        np.ndarray: Array of shape (n, 4) with center x, center y, width and height
+    """
+    rng = np.random.default_rng(seed)
+    boxes = np.empty((n, 4))
+    boxes[:, 0] = rng.uniform(-FRAME_WIDTH / 2, FRAME_WIDTH / 2, n)
+    boxes[:, 1] = rng.uniform(-FRAME_HEIGHT / 2, FRAME_HEIGHT / 2, n)
+    boxes[:, 2:] = rng.exponential(mean_size, (n, 2))
+    return boxes
+
+
+def naive_overlapping_pairs(boxes):
+    """The previous O(n^2) pass: if_box_overlap on every pair of boxes"""
+    bboxes = [((x, y), width, height) for x, y, width, height in boxes.tolist()]
+    pairs = []
+    for i in range(len(bboxes)):
+        for j in range(i + 1, len(bboxes)):
+            if if_box_overlap(bboxes[i], bboxes[j]):
+                pairs.append((i, j))
+    return pairs
+
+
+def time_call(fn, *args, repeat=3):
+    """Returns the best wall-clock time of repeat calls and the last result"""
+    best = float('inf')
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start_time)
+    return best, result
+
+
+def benchmark(sizes=(100, 1000, 10000), mean_size=0.1, skip_naive_above=10000):
+    print(f"{'mobjects':>10} {'pairs':>10} {'naive (s)':>12} {'sweep (s)':>12} {'speedup':>9}")
+    for n in sizes:
+        boxes = random_boxes(n, mean_size)
+        sweep_time, sweep_pairs = time_call(find_overlapping_pairs, boxes)
+
+        if n <= skip_naive_above:
+            naive_time, naive_pairs = time_call(naive_overlapping_pairs, boxes, repeat=1)
+            assert naive_pairs == sweep_pairs, f"Sweep result differs from naive result at n={n}"
+            print(f"{n:>10} {len(sweep_pairs):>10} {naive_time:>12.4f} {sweep_time:>12.4f} {naive_time / sweep_time:>8.1f}x")
+        else:
+            print(f"{n:>10} {len(sweep_pairs):>10} {'-':>12} {sweep_time:>12.4f} {'-':>9}")
+
+
+class StaticScene(Scene):
+    """Scene whose play calls do nothing, so only the injected overlap checks are timed"""
+    def play(self, *args, **kwargs):
+        pass
+
+
+# Stand-in for check_mobject_overlaps in instrumented benchmark scenes. It runs
+# the real check, records how many pairs it reported and reports none itself,
+# so construct runs every injected check instead of returning at the first
+# overlap. It is executed in the scene namespace, so the real check's name
+# lookup sees the same caller scope as it would without the stand-in.
+RECORDING_CHECK_SOURCE = """
+def check_mobject_overlaps(scene):
+    recorded_checks.append(len(real_check_mobject_overlaps(scene)))
+    return []
+"""
+
+
+def synthetic_scene_mobjects(n, mix, density, seed=0):
+    """
+    Builds the mobjects of a synthetic scene.
+
+    Box sizes are drawn so that the total box area is density times the frame
+    area, which keeps the expected number of overlaps per mobject the same at
+    every scene size.
+
+    Args:
+        n (int): Number of mobjects
+        mix (dict): Relative weight of each SCENE_MOBJECT_TYPES type, e.g. {'Text': 2, 'VGroup': 1}
+        density (float): Total box area as a fraction of the frame area
+        seed (int): Random seed
+
+    Returns:
+        list: The mobjects, in random type order
+    """
+    rng = np.random.default_rng(seed)
+    # Exponential widths and heights with mean s give an expected box area of s ** 2
+    mean_size = np.sqrt(density * FRAME_WIDTH * FRAME_HEIGHT / n) if n else 0.0
+    boxes = random_boxes(n, mean_size, seed)
+
+    weights = np.array(list(mix.values()), dtype=float)
+    types = rng.choice(list(mix), size=n, p=weights / weights.sum())
+    prototypes = {name: SCENE_MOBJECT_TYPES[name]() for name in mix}
+
+    mobjects = []
+    for name, (x, y, width, height) in zip(types, boxes.tolist()):
+        mobject = prototypes[name].copy()
+        mobject.stretch_to_fit_width(max(width, MIN_MOBJECT_SIZE))
+        mobject.stretch_to_fit_height(max(height, MIN_MOBJECT_SIZE))
+        mobject.move_to([x, y, 0])
+        mobjects.append(mobject)
+    return mobjects
+
+
+def injected_scene_source(n, plays):
+    """
+    Source of a scene that adds mobjects m0..m{n-1} in plays equal batches, with a self.play after each.
+
+    Returns:
+        str: The source, before instrumentation
+    """
+    lines = ["class OverlapBenchmarkScene(StaticScene):", "    def construct(self):"]
+    for batch in np.array_split(np.arange(n), plays):
+        if len(batch):
+            lines.append(f"        self.add({', '.join(f'm{k}' for k in batch)})")
+        lines.append("        self.play()")
+    return "\n".join(lines) + "\n"
+
+
+def run_scene(code, namespace):
+    """Runs the construct of a compiled OverlapBenchmarkScene and returns the scene"""
+    exec(code, namespace)
+    scene = namespace["OverlapBenchmarkScene"]()
+    scene.construct()
+    return scene
+
+
+def benchmark_scenes(sizes=(10, 100, 1000), mix=None, density=0.3, plays=10, repeat=3, skip_scan_above=1000,
+                     output=None):
+    """
+    Times the overlap helpers on synthetic scenes of growing size.
+
+    For each size this times create_bounding_box on every mobject,
+    get_mobject_name on every mobject through a frame scan (without a name
+    index), a single check_mobject_overlaps on the full scene, and the
+    overhead of the checks ManimCodeTransformer injects after every self.play
+    (the instrumented construct minus the plain one). Mobjects are named
+    m0..m{n-1} in the scope the checks run in, as in a generated scene.
+
+    In a real evaluation the first check that finds an overlap ends construct.
+    Here every injected check runs (see RECORDING_CHECK_SOURCE), so the
+    overhead covers all of them at any density; the number of checks that
+    found an overlap is reported alongside.
+
+    Args:
+        sizes (tuple): Mobject counts
+        mix (dict, optional): Relative weight of each mobject type (all SCENE_MOBJECT_TYPES equally if None)
+        density (float): Total box area as a fraction of the frame area
+        plays (int): Number of self.play calls the mobjects are spread over
+        repeat (int): Timing repeats (the best is reported)
+        skip_scan_above (int): Largest size the O(n^2) frame scan is timed at
+        output (str, optional): JSON file the scaling curves are written to
+
+    Returns:
+        list: One dict of timings per size
+    """
+    mix = mix or {name: 1 for name in SCENE_MOBJECT_TYPES}
+    rows = []
+    print(f"{'mobjects':>9} {'pairs':>7} {'reported':>9} {'boxes (s)':>10} {'names (s)':>10} {'check (s)':>10} "
+          f"{'checks':>7} {'flagged':>8} {'injected (s)':>13} {'per check (s)':>14}")
+    for n in sizes:
+        mobjects = synthetic_scene_mobjects(n, mix, density)
+        namespace = {"StaticScene": StaticScene, "check_mobject_overlaps": check_mobject_overlaps,
+                     "get_mobject_name": get_mobject_name}
+        namespace.update({f"m{k}": mobject for k, mobject in enumerate(mobjects)})
+        scene = StaticScene()
+        scene.add(*mobjects)
+        namespace["scene"] = scene
+
+        boxes_time, _ = time_call(lambda: [create_bounding_box(mobject) for mobject in mobjects], repeat=repeat)
+        # Module-level code, so get_mobject_name and check_mobject_overlaps see the names as their caller's scope
+        check_code = compile("overlaps = check_mobject_overlaps(scene)", "<overlap benchmark>", "exec")
+        check_time, _ = time_call(exec, check_code, namespace, repeat=repeat)
+        reported = namespace["overlaps"]
+        names_time = None
+        if n <= skip_scan_above:
+            scan_code = compile("names = []\nfor m in scene.mobjects:\n    names.append(get_mobject_name(m))",
+                                "<overlap benchmark>", "exec")
+            names_time, _ = time_call(exec, scan_code, namespace, repeat=repeat)
+
+        plain_code = compile(injected_scene_source(n, plays), "<overlap benchmark>", "exec")
+        injected_tree = ast.fix_missing_locations(ManimCodeTransformer(inject_overlap_check=True).visit(
+            ast.parse(injected_scene_source(n, plays))))
+        injected_code = compile(injected_tree, "<overlap benchmark>", "exec")
+        plain_time, _ = time_call(run_scene, plain_code, namespace, repeat=repeat)
+
+        recorded_checks = []
+        injected_namespace = dict(namespace, recorded_checks=recorded_checks,
+                                  real_check_mobject_overlaps=check_mobject_overlaps)
+        exec(RECORDING_CHECK_SOURCE, injected_namespace)
+        injected_time, _ = time_call(run_scene, injected_code, injected_namespace, repeat=repeat)
+        # Every repeat runs the same checks; keep the first run's
+        checks = len(recorded_checks) // repeat
+        flagged = sum(1 for pairs in recorded_checks[:checks] if pairs)
+        # Not clamped: a negative value means the checks are lost in timing noise
+        overhead = injected_time - plain_time
+
+        row = {
+            "mobjects": n,
+            "overlapping_pairs": len(find_overlapping_pairs(get_bounding_boxes(mobjects))),
+            "reported_pairs": len(reported),
+            "create_bounding_box": boxes_time,
+            "get_mobject_name_scan": names_time,
+            "check_mobject_overlaps": check_time,
+            "injected_checks": checks,
+            "checks_with_overlaps": flagged,
+            "injected_overhead": overhead,
+            "per_injected_check": overhead / checks if checks else None,
+        }
+        rows.append(row)
+        print(f"{n:>9} {row['overlapping_pairs']:>7} {row['reported_pairs']:>9} {boxes_time:>10.4f} "
+              f"{names_time if names_time is not None else float('nan'):>10.4f} {check_time:>10.4f} {checks:>7} {flagged:>8} "
+              f"{overhead:>13.4f} {row['per_injected_check'] or 0.0:>14.5f}")
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump({"mix": mix, "density": density, "plays": plays, "curves": rows}, f, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bounding box overlap pass.")
+    parser.add_argument("--sizes", default=None,
+                        help="Comma-separated mobject counts (default 100,1000,10000, or 10,100,1000 with --scenes)")
+    parser.add_argument("--mean-size", type=float, default=0.1, help="Mean box width/height in scene units")
+    parser.add_argument("--skip-naive-above", type=int, default=10000,
+                        help="Largest size the naive O(n^2) pass is timed at")
+    parser.add_argument("--scenes", action="store_true",
+                        help="Time the overlap helpers on synthetic scenes of real mobjects instead of random boxes")
+    parser.add_argument("--mix", default="Text=1,MathTex=1,VGroup=1",
+                        help=f"Relative weights of the scene mobject types ({', '.join(SCENE_MOBJECT_TYPES)})")
+    parser.add_argument("--density", type=float, default=0.3,
+                        help="Total mobject box area as a fraction of the frame area")
+    parser.add_argument("--plays", type=int, default=10, help="Number of self.play calls in a synthetic scene")
+    parser.add_argument("--skip-scan-above", type=int, default=1000,
+                        help="Largest size the get_mobject_name frame scan is timed at")
+    parser.add_argument("--output", help="JSON file the scene scaling curves are written to")
+    args = parser.parse_args()
+    if args.scenes:
+        mix = {name: float(weight) for name, weight in (item.split("=") for item in args.mix.split(","))}
+        unknown = [name for name in mix if name not in SCENE_MOBJECT_TYPES]
+        if unknown:
+            parser.error(f"Unknown mobject types: {', '.join(unknown)}")
+        benchmark_scenes([int(n) for n in (args.sizes or "10,100,1000").split(",")], mix, args.density,
+                         args.plays, skip_scan_above=args.skip_scan_above, output=args.output)
+    else:
+        benchmark([int(n) for n in (args.sizes or "100,1000,10000").split(",")], args.mean_size,
+                  args.skip_naive_above)
@@ -1,7 +1,11 @@
-from manim import Rectangle, VGroup, RED, Mobject 
+from manim import Rectangle, VGroup, Group, RED, Mobject 
 from manim import Text, MathTex, Tex, SingleStringMathTex
+import numpy as np
 import inspect
 
+# Mobject types whose overlaps are reported by check_mobject_overlaps
+TEXT_LIKE_TYPES = (Text, MathTex, Tex, SingleStringMathTex, VGroup)
+
 
 # Helper function for creating bounding boxes
 def create_bounding_box(obj, color=RED):
@@ -66,6 +70,77 @@ def if_box_overlap(bbox1, bbox2):
     
     return False
 
+def get_bounding_boxes(mobjects):
+    """
+    Gather the bounding boxes of several mobjects into a single array.
+    
+    Args:
+        mobjects (list): List of Manim mobjects
+    
+    Returns:
+        np.ndarray: Array of shape (n, 4) with center x, center y, width and height per mobject
+    """
+    boxes = np.empty((len(mobjects), 4))
+    for k, mobject in enumerate(mobjects):
+        center, width, height = get_bounding_box(mobject)
+        boxes[k] = center[0], center[1], width, height
+    return boxes
+
+
+def find_overlapping_pairs(boxes):
+    """
+    Find all pairs of overlapping bounding boxes with a sort-and-sweep pass.
+    
+    Boxes are sorted by their left edge, so each box only needs to be tested
+    against the boxes that start before its right edge. The final test uses the
+    same comparisons as if_box_overlap, so the result is identical to checking
+    every pair.
+    
+    Args:
+        boxes (np.ndarray): Array of shape (n, 4) as returned by get_bounding_boxes
+    
+    Returns:
+        list: Sorted list of (i, j) index tuples with i < j
+    """
+    n = len(boxes)
+    if n < 2:
+        return []
+
+    center_x, center_y = boxes[:, 0], boxes[:, 1]
+    half_width, half_height = boxes[:, 2] / 2, boxes[:, 3] / 2
+
+    # Pad the sweep intervals so rounding can never drop a pair; the exact test decides
+    pad = 1e-9 * (1 + np.abs(boxes[:, :3]).max())
+    left = center_x - half_width - pad
+    right = center_x + half_width + pad
+
+    order = np.argsort(left, kind='stable')
+    sorted_left = left[order]
+    # For each box in sweep order, the end of the run of boxes starting before its right edge
+    ends = np.searchsorted(sorted_left, right[order], side='left')
+
+    first, second = [], []
+    for k in range(n - 1):
+        if ends[k] <= k + 1:
+            continue
+        a = order[k]
+        candidates = order[k + 1:ends[k]]
+        hits = candidates[
+            (np.abs(center_x[a] - center_x[candidates]) < half_width[a] + half_width[candidates])
+            & (np.abs(center_y[a] - center_y[candidates]) < half_height[a] + half_height[candidates])
+        ]
+        if len(hits):
+            first.append(np.minimum(a, hits))
+            second.append(np.maximum(a, hits))
+
+    if not first:
+        return []
+    first = np.concatenate(first)
+    second = np.concatenate(second)
+    ordering = np.lexsort((second, first))
+    return list(zip(first[ordering].tolist(), second[ordering].tolist()))
+
+
 def check_two_mobjects_overlap(mobject1: Mobject, mobject2: Mobject):
     """
     Check if two Manim mobjects overlap using their bounding boxes.
@@ -85,17 +160,58 @@ def check_two_mobjects_overlap(mobject1: Mobject, mobject2: Mobject):
     return if_box_overlap(bbox1, bbox2)
 
 
-def get_mobject_name(mobject, frame=None):
+def _index_submobjects(index, group, name, depth):
+    """Adds names like group[2] for the submobjects of a named group"""
+    if depth == 0 or not isinstance(group, (VGroup, Group)):
+        return
+    for k, submobject in enumerate(group.submobjects):
+        sub_name = f"{name}[{k}]"
+        if index.setdefault(id(submobject), sub_name) == sub_name:
+            _index_submobjects(index, submobject, sub_name, depth - 1)
+
+
+def build_name_index(frame, max_depth=3):
+    """
+    Build a reverse index from object identity to variable name for a frame.
+    
+    Local variables take precedence over globals, and direct names over
+    submobject names. Submobjects of named groups are indexed as name[i],
+    nested up to max_depth levels.
+    
+    Args:
+        frame: The frame whose locals and globals are indexed
+        max_depth (int): How many levels of group nesting to index
+        
+    Returns:
+        dict: Mapping of id(obj) to its name
+    """
+    index = {}
+    named = []
+    for scope in (frame.f_locals, frame.f_globals):
+        for name, obj in scope.items():
+            if index.setdefault(id(obj), name) == name:
+                named.append((name, obj))
+    for name, obj in named:
+        _index_submobjects(index, obj, name, max_depth)
+    return index
+
+
+def get_mobject_name(mobject, frame=None, name_index=None):
     """
     Dynamically find the variable name of a mobject by inspecting the caller's scope.
     
     Args:
         mobject: The mobject to find the name for
         frame: Optional frame to inspect (defaults to caller's frame)
+        name_index (dict, optional): Index from build_name_index; when given,
+                                     the lookup is a single dict access
         
     Returns:
-        str: The variable name, or repr(mobject) if name not found
+        str: The variable name, or None if name not found
     """
+    if name_index is not None:
+        return name_index.get(id(mobject))
+
     if frame is None:
         # Get the caller's frame (skip this function's frame)
         frame = inspect.currentframe().f_back
@@ -129,16 +245,17 @@ def check_mobject_overlaps(scene):
     caller_frame = inspect.currentframe().f_back
     
     mobjects = scene.mobjects
-    # Check all possible pairs, but only for text-like mobjects
-    for i in range(len(mobjects)):
-        # Skip if not a text-like or group mobject
-        if not isinstance(mobjects[i], (Text, MathTex, Tex, SingleStringMathTex, VGroup)):
+    boxes = get_bounding_boxes(mobjects)
+    name_index = None
+    for i, j in find_overlapping_pairs(boxes):
+        # Only report pairs whose first mobject is text-like or a group
+        if not isinstance(mobjects[i], TEXT_LIKE_TYPES):
             continue
-
-        for j in range(i + 1, len(mobjects)):
-            if check_two_mobjects_overlap(mobjects[i], mobjects[j]):
-                name_i = get_mobject_name(mobjects[i], caller_frame)
-                name_j = get_mobject_name(mobjects[j], caller_frame)
-                if name_i and name_j:
-                    overlapping_pairs.append((name_i, name_j))
+        # Build the name index once, and only if there is something to report
+        if name_index is None:
+            name_index = build_name_index(caller_frame)
+        name_i = get_mobject_name(mobjects[i], name_index=name_index)
+        name_j = get_mobject_name(mobjects[j], name_index=name_index)
+        if name_i and name_j:
+            overlapping_pairs.append((name_i, name_j))
     return overlapping_pairs
@@ -2,105 +2,77 @@ from manim import tempconfig
 import sys
 from io import StringIO
 import inspect
-from textwrap import dedent
 import ast
 import sys
 import functools
-import traceback
 import os
+import shutil
+import marshal
+import hashlib
 import subprocess
+import time
 
-def add_necessary_imports(code_string):
-    """
-    Adds required imports if they're not already present in the code.
-    """
-    required_imports = [
-        "from manim import *",
-        "import numpy as np",
-        "import os",
-        "import sys",
-        "sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))",
-        "from utils.bounding_box import create_bounding_box, check_mobject_overlaps"
-    ]
-    
-    existing_imports = [line.strip() for line in code_string.split('\n') if line.strip().startswith(('import', 'from'))]
-    
-    new_imports = []
-    for imp in required_imports:
-        if imp not in existing_imports:
-            new_imports.append(imp)
-    
-    if new_imports:
-        return '\n'.join(new_imports) + '\n\n' + code_string
-    return code_string
+# Repository root, so generated scripts can import utils from any work directory
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-def inject_overlap_check(code_string):
-    """
-    Injects overlap checking code after self.play calls, except for FadeOut.
-    """
-    lines = code_string.split('\n')
-    modified_lines = []
-    i = 0
-    line_number = 0  # Track actual line numbers
+# Parent directory of the per-job evaluation work directories
+JOBS_DIR = os.path.join('temp', 'jobs')
 
-    
-    while i < len(lines):
-        line = lines[i]
-        modified_lines.append(line)
-        line_number += 1
+sys.path.append(REPO_ROOT)
+from utils.eval_cache import make_cache_key, CACHEABLE_ERROR_TYPES
+from utils.error_parser import distill_error, error_signature
+from utils.manim_worker import CANCEL_POLL_INTERVAL
+from utils.frame_capture import CAPTURE_FILE, load_captured_frames
+from utils.api_index import precheck_manim_code, bound_names
 
-        # Functions that we don't want to check for overlaps after
-        ignore_functions = ['FadeOut']
-        
-        # Check if line contains self.play and none of the ignored functions
-        if 'self.play' in line and not any(func in line for func in ignore_functions):
-            # Look ahead to find the end of the self.play statement
-            next_i = i + 1
-            open_parens = line.count('(') - line.count(')')
-            
-            while open_parens > 0 and next_i < len(lines):
-                modified_lines.append(lines[next_i])
-                line_number += 1
-                open_parens += lines[next_i].count('(') - lines[next_i].count(')')
-                i = next_i
-                next_i += 1
-            
-            # Get the indentation of the self.play line
-            indentation = len(line) - len(line.lstrip())
-            indent = ' ' * indentation
-            
-            # Add a blank line before overlap check
-            modified_lines.append("")
-            # Add the overlap check with proper indentation and line number capture
-            modified_lines.append(f"{indent}self.overlap_objects = check_mobject_overlaps(self)")
-            modified_lines.append(f"{indent}if self.overlap_objects:")
-            modified_lines.append(f"{indent}    self.overlap_line = {line_number}")  # Store line number
-            modified_lines.append(f"{indent}    return")
-            # Add a blank line after overlap check
-            modified_lines.append("")
-            line_number += 6  # Account for the added lines
-        
-        i += 1
-    
-    return '\n'.join(modified_lines)
+# Runs a marshalled code object (argv[1]) as the script argv[2] in a fresh interpreter,
+# capturing frames to argv[3] if given
+RUN_COMPILED_BOOTSTRAP = (
+    f"import sys; sys.path.append({REPO_ROOT!r}); "
+    "from utils.manim_worker import exec_compiled; exec_compiled(*sys.argv[1:])"
+)
+
+# Validation tiers, from cheapest to most expensive. Each tier overrides the
+# full-quality settings from get_tempconfig_settings().
+VALIDATION_TIERS = {
+    # Executes construct() without rendering or writing any frames
+    "dry_run": {
+        "quality": "low_quality",
+        "frame_rate": 15,
+        "write_to_movie": False,
+        "dry_run": True,
+    },
+    # Low-quality render to catch errors that only show up while rendering
+    "preview": {
+        "quality": "low_quality",
+        "frame_rate": 15,
+    },
+    # Final render for samples that are kept
+    "full": {},
+    # Frames for the critic only: save_last_frame makes manim skip animation frames and no
+    # movie is written; use with capture_frames, which renders one frame per play call
+    "capture": {
+        "quality": "low_quality",
+        "write_to_movie": False,
+        "save_last_frame": True,
+    },
+}
+
+# Order in which tiers are tried by eval_manim_code_tiers
+DEFAULT_TIER_LADDER = ("dry_run", "preview", "full")
 
-def remove_wait_calls(code_string):
+def get_tempconfig_settings(media_dir=None, tier="full"):
     """
-    Removes all self.wait() calls from the code.
+    Returns the tempconfig settings for a validation tier as a dictionary.
     
     Args:
-        code_string (str): Original Manim code string
-        
-    Returns:
-        str: Code string with self.wait() calls removed
+        media_dir (str, optional): Directory manim writes its outputs to
+                                   (defaults to manim's own media_dir)
+        tier (str): One of VALIDATION_TIERS
     """
-    lines = code_string.split('\n')
-    return '\n'.join(line for line in lines if not line.strip().startswith('self.wait'))
-
-
-def get_tempconfig_settings():
-    """Returns the default tempconfig settings as a dictionary"""
-    return {
+    if tier not in VALIDATION_TIERS:
+        raise ValueError(f"Unknown validation tier: {tier}. Use one of {list(VALIDATION_TIERS)}.")
+    settings = {
         "quality": "high_quality",
         "frame_rate": 30,
         "preview": False,
@@ -109,8 +81,71 @@ def get_tempconfig_settings():
         "write_to_movie": True,
         "save_last_frame": False,
         "verbosity": "ERROR",
-        # "dry_run": True,
     }
+    settings.update(VALIDATION_TIERS[tier])
+    if media_dir:
+        settings["media_dir"] = media_dir
+    return settings
+
+# Imports every processed script starts with (unless already present)
+REQUIRED_IMPORTS = [
+    "from manim import *",
+    "import numpy as np",
+    "import os",
+    "import sys",
+    f"sys.path.append({REPO_ROOT!r})",
+    "from utils.bounding_box import create_bounding_box, check_mobject_overlaps"
+]
+
+# Names the processed script binds through REQUIRED_IMPORTS, which the user code may use
+REQUIRED_IMPORT_NAMES = bound_names(ast.parse("\n".join(REQUIRED_IMPORTS)))
+
+# Animations after which we don't check for overlaps
+OVERLAP_CHECK_IGNORE = ('FadeOut',)
+
+# Statements appended to render the scene; {CONFIG} and {SCENE_CLASS} are filled in
+TEMPCONFIG_TEMPLATE = """
+with tempconfig({CONFIG}):
+    # Create scene instance
+    scene = {SCENE_CLASS}()
+    scene.render()
+"""
+
+def _set_location(nodes, lineno):
+    """Gives injected nodes (and all their children) the given line number"""
+    for node in nodes:
+        for child in ast.walk(node):
+            if 'lineno' in child._attributes:
+                child.lineno = child.end_lineno = lineno
+                child.col_offset = child.end_col_offset = 0
+    return nodes
+
+def _is_self_method_call(node, method):
+    """Checks whether a statement is an expression statement calling self.<method>(...)"""
+    return (
+        isinstance(node, ast.Expr)
+        and isinstance(node.value, ast.Call)
+        and isinstance(node.value.func, ast.Attribute)
+        and node.value.func.attr == method
+        and isinstance(node.value.func.value, ast.Name)
+        and node.value.func.value.id == 'self'
+    )
+
+def find_scene_class(tree):
+    """
+    Finds the name of the Scene class in a parsed module.
+    
+    Args:
+        tree (ast.Module): Parsed Manim code
+        
+    Returns:
+        str: Name of the first class inheriting from Scene, or None if not found
+    """
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            if any(isinstance(base, ast.Name) and base.id == 'Scene' for base in node.bases):
+                return node.name
+    return None
 
 def find_scene_class_name(code_string):
     """
@@ -120,91 +155,165 @@ def find_scene_class_name(code_string):
         code_string (str): Original Manim code string
         
     Returns:
-        str: Name of the Scene class, or None if not found
+        str: Name of the Scene class, or None if not found (or the code does not parse)
     """
-    import re
-    # Look for class definition that inherits from Scene
-    match = re.search(r'class\s+(\w+)\s*\(\s*Scene\s*\)', code_string)
-    if match:
-        return match.group(1)
-    return None
+    try:
+        return find_scene_class(ast.parse(code_string))
+    except SyntaxError:
+        return None
 
-def template_scene():
+class ManimCodeTransformer(ast.NodeTransformer):
     """
-    with tempconfig({CONFIG}):
-        # Create scene instance
-        scene = {SCENE_CLASS}()
-        scene.render()
+    Single-pass instrumentation of a parsed Manim module.
+    
+    Optionally removes self.wait() calls and injects an overlap check after every
+    self.play() call (except ignored animations such as FadeOut). Injected nodes
+    carry the line number of the statement they follow, so self.overlap_line and
+    tracebacks point at the original source.
     """
-    pass
+    def __init__(self, inject_overlap_check=False, remove_wait_calls=False, ignore_functions=OVERLAP_CHECK_IGNORE):
+        self.inject_overlap_check = inject_overlap_check
+        self.remove_wait_calls = remove_wait_calls
+        self.ignore_functions = ignore_functions
+        self._function_depth = 0
 
-def add_tempconfig(code_string):
+    def visit_FunctionDef(self, node):
+        self._function_depth += 1
+        self.generic_visit(node)
+        self._function_depth -= 1
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def _calls_ignored_function(self, node):
+        for child in ast.walk(node):
+            name = child.id if isinstance(child, ast.Name) else child.attr if isinstance(child, ast.Attribute) else None
+            if name in self.ignore_functions:
+                return True
+        return False
+
+    def visit_Expr(self, node):
+        if self.remove_wait_calls and _is_self_method_call(node, 'wait'):
+            # Keep a placeholder so the enclosing block never becomes empty
+            return ast.copy_location(ast.Pass(), node)
+
+        if (self.inject_overlap_check and self._function_depth > 0
+                and _is_self_method_call(node, 'play') and not self._calls_ignored_function(node)):
+            check = ast.parse(
+                "self.overlap_objects = check_mobject_overlaps(self)\n"
+                "if self.overlap_objects:\n"
+                f"    self.overlap_line = {node.lineno}\n"
+                "    return\n"
+            ).body
+            return [node] + _set_location(check, node.end_lineno)
+        return node
+
+def add_necessary_imports(tree):
+    """
+    Adds REQUIRED_IMPORTS to a parsed module if they're not already present.
+    Imports go after the docstring and any __future__ imports.
     """
-    Adds tempconfig settings to the code if not already present.
+    existing = {ast.dump(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom, ast.Expr))}
+    new_nodes = [node for node in ast.parse("\n".join(REQUIRED_IMPORTS)).body if ast.dump(node) not in existing]
+
+    position = 0
+    for node in tree.body:
+        is_docstring = position == 0 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+        if is_docstring or (isinstance(node, ast.ImportFrom) and node.module == '__future__'):
+            position += 1
+        else:
+            break
+    tree.body[position:position] = _set_location(new_nodes, 1)
+    return tree
+
+def add_tempconfig(tree, media_dir=None, tier="full"):
+    """
+    Appends the tempconfig render block to a parsed module unless it already uses tempconfig.
     
     Args:
-        code_string (str): Original Manim code string
+        tree (ast.Module): Parsed Manim code
+        media_dir (str, optional): Directory manim writes its outputs to
+        tier (str): Validation tier whose settings are used
         
     Returns:
-        str: Code string with tempconfig added
+        ast.Module: The module, or None if no Scene class was found
     """
-    if "tempconfig" not in code_string:
-        # Get the scene class name
-        scene_class = find_scene_class_name(code_string)
-        if not scene_class:
-            return False
-            
-        # Get the template from the docstring
-        template = dedent(template_scene.__doc__)
-        
-        # Convert config dictionary to a formatted string
-        config_dict = get_tempconfig_settings()
-        config_str = "{\n    " + ",\n    ".join(
-            f'"{k}": {repr(v)}' for k, v in config_dict.items()
-        ) + "\n}"
-        
-        # Replace the placeholders
-        template = template.replace("{CONFIG}", config_str)
-        template = template.replace("{SCENE_CLASS}", scene_class)
-        
-        # Add the template to the original code
-        code_string += "\n" + template
-        
-    return code_string
+    if any(isinstance(node, ast.Name) and node.id == 'tempconfig' for node in ast.walk(tree)):
+        return tree
 
-def add_result_return(code_string):
-    """
-    Adds lines to store both overlap_objects and overlap_line in return_dict.
-    """
-    return_lines = """
-# Store the results in the provided return_dict
-return_dict['result'] = getattr(scene, 'overlap_objects', None)
-return_dict['line_number'] = getattr(scene, 'overlap_line', None)
-"""
-    return code_string + return_lines
+    scene_class = find_scene_class(tree)
+    if not scene_class:
+        return None
 
-def process_manim_code(code_string):
+    config_dict = get_tempconfig_settings(media_dir, tier)
+    template = TEMPCONFIG_TEMPLATE.replace("{CONFIG}", repr(config_dict)).replace("{SCENE_CLASS}", scene_class)
+    # Put the render block just past the end of the source so it never maps onto user lines
+    last_line = max((node.end_lineno for node in tree.body), default=0)
+    tree.body.extend(_set_location(ast.parse(template).body, last_line + 1))
+    return tree
+
+def transform_manim_code(code_string, media_dir=None, tier="full", inject_overlap_check=False, remove_wait_calls=False):
     """
-    Processes a Manim code string by:
+    Parses Manim code once and applies all instrumentation to the AST:
     1. Adding necessary imports
-    2. Injecting overlap checking code after self.play calls 
-    3. Removing self.wait() calls
+    2. Injecting overlap checking code after self.play calls (optional)
+    3. Removing self.wait() calls (optional)
     4. Adding tempconfig settings
-    5. Adding result return line
     
     Args:
         code_string (str): Original Manim code string
+        media_dir (str, optional): Directory manim writes its outputs to
+        tier (str): Validation tier whose settings are used
+        inject_overlap_check (bool): Whether to check for overlaps after self.play calls
+        remove_wait_calls (bool): Whether to remove self.wait() calls
         
     Returns:
-        str: Processed Manim code string
+        ast.Module: The instrumented module, or None if no Scene class was found
+        
+    Raises:
+        SyntaxError: If the code does not parse
     """
-    code_string = add_necessary_imports(code_string)
-    # code_string = remove_wait_calls(code_string)
-    # code_string = inject_overlap_check(code_string)
-    code_string = add_tempconfig(code_string)
-    if not code_string: return False
-    # code_string = add_result_return(code_string)
-    return code_string
+    tree = ast.parse(code_string)
+    tree = ManimCodeTransformer(inject_overlap_check, remove_wait_calls).visit(tree)
+    tree = add_necessary_imports(tree)
+    return add_tempconfig(tree, media_dir, tier)
+
+def process_manim_code(code_string, media_dir=None, tier="full"):
+    """
+    Processes a Manim code string with transform_manim_code and returns the source.
+    
+    Args:
+        code_string (str): Original Manim code string
+        media_dir (str, optional): Directory manim writes its outputs to
+        tier (str): Validation tier whose settings are used
+        
+    Returns:
+        str: Processed Manim code string, or False if processing failed
+    """
+    try:
+        tree = transform_manim_code(code_string, media_dir, tier)
+    except SyntaxError:
+        return False
+    if tree is None:
+        return False
+    return ast.unparse(tree)
+
+def format_syntax_error(e):
+    """Formats a SyntaxError as a clear message with line number and a pointer"""
+    error_class = e.__class__.__name__
+    line_number = e.lineno
+    error_message = str(e)
+    
+    # Format the error message with line information
+    full_error = f"{error_class} at line {line_number}: {error_message}\n"
+    
+    # Add the problematic line if available
+    if hasattr(e, 'text') and e.text:
+        full_error += f"Line content: {e.text.strip()}\n"
+        if hasattr(e, 'offset') and e.offset:
+            # Add a pointer to the error position
+            full_error += " " * (e.offset - 1) + "^\n"
+    return full_error
 
 # Quick pre-checks before running expensive Manim validation
 def quick_syntax_check(code_string):
@@ -224,97 +333,307 @@ def quick_syntax_check(code_string):
     
     return True, ""
 
+class ManimJobDir:
+    """
+    Isolated work directory for a single Manim evaluation.
+    
+    The directory name is derived from a hash of the code, and each job gets its
+    own script path and media directory so concurrent evaluations never share files.
+    Used as a context manager, the directory is removed on exit unless keep=True.
+    """
+    def __init__(self, code_string, root=JOBS_DIR, keep=False):
+        """
+        Args:
+            code_string (str): The code evaluated in this directory (used for the name)
+            root (str): Parent directory for job directories
+            keep (bool): Whether to keep the directory and its outputs on exit
+        """
+        self.code_hash = hashlib.sha256(code_string.encode('utf-8')).hexdigest()
+        self.root = os.path.abspath(root)
+        self.keep = keep
+        self.path = None
+
+    @property
+    def script_path(self):
+        return os.path.join(self.path, 'manim_scene.py')
+
+    @property
+    def code_path(self):
+        return os.path.join(self.path, 'manim_scene.bin')
+
+    @property
+    def capture_path(self):
+        return os.path.join(self.path, CAPTURE_FILE)
+
+    @property
+    def media_dir(self):
+        return os.path.join(self.path, 'media')
+
+    def create(self):
+        """Creates the directory, adding a suffix if the same code is already being evaluated"""
+        os.makedirs(self.root, exist_ok=True)
+        name = self.code_hash[:16]
+        suffix = 0
+        while True:
+            path = os.path.join(self.root, name if suffix == 0 else f"{name}-{suffix}")
+            try:
+                os.mkdir(path)
+                break
+            except FileExistsError:
+                suffix += 1
+        self.path = path
+        return self
+
+    def cleanup(self):
+        """Removes the directory and everything rendered into it"""
+        if self.path and os.path.isdir(self.path):
+            shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self.create()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if not self.keep:
+            self.cleanup()
+        return False
+
 # @functools.lru_cache(maxsize=256)
-def eval_manim_code(code_string, save_code_py=True):
+def eval_manim_code(code_string, save_code_py=True, keep_outputs=False, pool=None, cache=None, tier="full",
+                    cancel_event=None, capture_frames=False, precheck=True):
     """
     Evaluates Manim code and returns success status and details.
     
+    Each evaluation runs in its own ManimJobDir, so concurrent calls never
+    overwrite each other's script or media files.
+    
     Args:
         code_string (str): The Manim code to evaluate
-        save_code_py (bool): Whether to save the code to a file
+        save_code_py (bool): Whether to also save the processed code to temp/manim_scene.py
+        keep_outputs (bool): Whether to keep the job directory and rendered media;
+                             its paths are returned in details['work_dir'] and details['media_dir']
+        pool (ManimWorkerPool, optional): Warm worker pool to render in instead of
+                                          launching a fresh interpreter
+        cache (EvalCache, optional): Persistent result cache; hits skip rendering entirely
+        tier (str): Validation tier to render with (see VALIDATION_TIERS); recorded in details['tier']
+        cancel_event (threading.Event, optional): Setting it stops the render; the result is then
+                                                  a failure with error_type 'cancelled'
+        capture_frames (bool): Whether to snapshot the frame at the end of every self.play call;
+                               the (scene time, PNG bytes) frames are returned in details['frames']
+                               and the cache is bypassed
+        precheck (bool): Whether to check names, attributes and call keywords against the
+                         manim API index before rendering; code that fails is rejected with
+                         error_type 'api' and the problems in details['api_problems']
         
     Returns:
-        tuple: (success, details) where success is a boolean and details is a dictionary
+        tuple: (success, details) where success is a boolean and details is a dictionary;
+               details['timings'] holds the seconds spent per phase ('process', 'cache',
+               'precheck', 'compile', 'subprocess')
     """
+    timings = {}
     try:
-        # Process the code string
-        code_string = process_manim_code(code_string)
-        if not code_string: 
-            return False, {'error': "Manim code processing failed, code likely has errors", 'error_type': 'processing'}
+        # Parse and instrument the code once; the compiled result goes straight to the renderer
+        phase_start = time.perf_counter()
+        try:
+            tree = transform_manim_code(code_string, tier=tier)
+        except SyntaxError as e:
+            return False, {'error': format_syntax_error(e), 'error_type': 'syntax', 'tier': tier,
+                           'error_signature': error_signature('SyntaxError', e.msg), 'error_line': e.lineno,
+                           'timings': {'process': time.perf_counter() - phase_start}}
+        timings['process'] = time.perf_counter() - phase_start
+        if tree is None:
+            return False, {'error': "Manim code processing failed, code likely has errors", 'error_type': 'processing',
+                           'tier': tier, 'timings': timings}
+
+        cache_key = None
+        # Cached results don't hold frames
+        if cache is not None and not capture_frames:
+            phase_start = time.perf_counter()
+            cache_key = make_cache_key(code_string, get_tempconfig_settings(tier=tier))
+            cached = cache.get(cache_key)
+            timings['cache'] = time.perf_counter() - phase_start
+            # A hit is only usable if the artifacts it points to still exist
+            if cached is not None and (not keep_outputs or os.path.isdir(cached[1].get('media_dir', ''))):
+                success, details = cached
+                details['cached'] = True
+                details['timings'] = timings
+                return success, details
+
+        # Hallucinated names and keywords fail here in milliseconds instead of in a render
+        if precheck:
+            phase_start = time.perf_counter()
+            passed, precheck_details = precheck_manim_code(code_string, extra_names=REQUIRED_IMPORT_NAMES)
+            timings['precheck'] = time.perf_counter() - phase_start
+            if not passed:
+                precheck_details.update({'error_type': 'api', 'tier': tier, 'timings': timings})
+                return False, precheck_details
+
+        if cancel_event is not None and cancel_event.is_set():
+            return False, {'error': "Evaluation cancelled", 'error_type': 'cancelled', 'tier': tier}
+
+        job_dir = ManimJobDir(code_string, keep=keep_outputs)
+        with job_dir:
+            success, details = _eval_in_job_dir(code_string, tree, job_dir, save_code_py, pool, cancel_event,
+                                                capture_frames, timings)
+        details['tier'] = tier
+        details['timings'] = timings
+        if keep_outputs and job_dir.path:
+            details['work_dir'] = job_dir.path
+            details['media_dir'] = job_dir.media_dir
+
+        if cache_key and (success or details.get('error_type') in CACHEABLE_ERROR_TYPES):
+            cache.put(cache_key, success, details)
+        return success, details
+    except Exception as e:
+        # Handle any unexpected errors in our evaluation code
+        return False, {'error': f"Error evaluating code: {str(e)}", 'error_type': 'evaluation', 'tier': tier,
+                       'timings': timings}
+
+def eval_manim_code_tiers(code_string, tiers=DEFAULT_TIER_LADDER, **kwargs):
+    """
+    Evaluates Manim code through a ladder of validation tiers, cheapest first,
+    stopping at the first tier that fails.
+    
+    Args:
+        code_string (str): The Manim code to evaluate
+        tiers (tuple): Tier names to run in order
+        **kwargs: Additional arguments passed to eval_manim_code
+        
+    Returns:
+        tuple: (success, details) of the last tier that ran; details['tiers_passed']
+               lists the tiers the code passed and details['tier_timings'] the phase
+               timings of every tier that ran
+    """
+    tiers_passed = []
+    tier_timings = {}
+    for tier in tiers:
+        success, details = eval_manim_code(code_string, tier=tier, **kwargs)
+        tier_timings[tier] = details.get('timings', {})
+        if not success:
+            break
+        tiers_passed.append(tier)
+    details['tiers_passed'] = tiers_passed
+    details['tier_timings'] = tier_timings
+    return success, details
+
+def _run_subprocess(args, cwd, timeout, cancel_event=None):
+    """
+    Runs a command like subprocess.run, but kills it as soon as cancel_event is set.
+    
+    Returns:
+        tuple: (returncode, stdout, stderr, cancelled)
+    """
+    process = subprocess.Popen(args, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    deadline = time.time() + timeout
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=CANCEL_POLL_INTERVAL if cancel_event else timeout)
+            return process.returncode, stdout, stderr, False
+        except subprocess.TimeoutExpired:
+            cancelled = cancel_event is not None and cancel_event.is_set()
+            if cancelled or time.time() > deadline:
+                process.kill()
+                stdout, stderr = process.communicate()
+                if not cancelled:
+                    raise subprocess.TimeoutExpired(args, timeout)
+                return process.returncode, stdout, stderr, True
+
+def _eval_in_job_dir(code_string, tree, job_dir, save_code_py, pool, cancel_event=None, capture_frames=False,
+                     timings=None):
+    """
+    Compiles the instrumented module and runs it inside an already created job directory.
+    The seconds spent compiling and running are added to timings.
+    """
+    timings = {} if timings is None else timings
+    try:
+        # The original source goes to the script path, so tracebacks and line
+        # numbers of the compiled code point at the code the model wrote
+        temp_file = job_dir.script_path
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            f.write(code_string)
         
-        # Save processed code
+        # Keep a copy of the last evaluated (processed) script for inspection
         if save_code_py:
             temp_dir = 'temp'
             os.makedirs(temp_dir, exist_ok=True)
-            temp_file = os.path.join(temp_dir, 'manim_scene.py')
-            
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                f.write(code_string)
+            saved_file = os.path.join(temp_dir, 'manim_scene.py')
+            partial_file = f"{saved_file}.{os.getpid()}.tmp"
+            with open(partial_file, 'w', encoding='utf-8') as f:
+                f.write(ast.unparse(tree))
+            os.replace(partial_file, saved_file)
         
-        # First, try to compile the code to catch syntax errors
+        # Compile the instrumented AST; some errors (e.g. 'return' outside function) only show up here
+        phase_start = time.perf_counter()
         try:
-            compiled_code = compile(code_string, '<string>', 'exec')
+            compiled_code = compile(tree, temp_file, 'exec')
         except SyntaxError as e:
-            # For syntax errors, format a clear error message with line number
-            error_class = e.__class__.__name__
-            line_number = e.lineno
-            error_message = str(e)
-            
-            # Format the error message with line information
-            full_error = f"{error_class} at line {line_number}: {error_message}\n"
-            
-            # Add the problematic line if available
-            if hasattr(e, 'text') and e.text:
-                full_error += f"Line content: {e.text.strip()}\n"
-                if hasattr(e, 'offset') and e.offset:
-                    # Add a pointer to the error position
-                    full_error += " " * (e.offset - 1) + "^\n"
-            
-            return False, {'error': full_error, 'error_type': 'syntax'}
+            timings['compile'] = time.perf_counter() - phase_start
+            return False, {'error': format_syntax_error(e), 'error_type': 'syntax',
+                           'error_signature': error_signature('SyntaxError', e.msg), 'error_line': e.lineno}
+        
+        code_path = job_dir.code_path
+        with open(code_path, 'wb') as f:
+            marshal.dump(compiled_code, f)
+        timings['compile'] = time.perf_counter() - phase_start
+        
+        capture_path = job_dir.capture_path if capture_frames else None
         
         # If compilation succeeded, run the file as a subprocess to get detailed error output
+        phase_start = time.perf_counter()
         try:
-            # Run the Python file as a subprocess
-            result = subprocess.run(
-                [sys.executable, temp_file],
-                capture_output=True,
-                text=True,
-                timeout=30  # Set a timeout to prevent hanging
-            )
+            if pool is not None:
+                # Run the file in a warm worker that has already imported manim
+                result = pool.run(temp_file, job_dir.path, timeout=30, code_path=code_path,
+                                  cancel_event=cancel_event, capture_path=capture_path)
+                if result['timed_out']:
+                    raise subprocess.TimeoutExpired(temp_file, 30)
+                returncode, stdout, stderr = result['returncode'], result['stdout'], result['stderr']
+                cancelled = result.get('cancelled', False)
+                crashed = result.get('crashed', False)
+            else:
+                # Run the compiled code in a fresh interpreter
+                command = [sys.executable, '-c', RUN_COMPILED_BOOTSTRAP, code_path, temp_file]
+                if capture_path:
+                    command.append(capture_path)
+                crashed = False
+                returncode, stdout, stderr, cancelled = _run_subprocess(
+                    command,
+                    cwd=job_dir.path,
+                    timeout=30,  # Set a timeout to prevent hanging
+                    cancel_event=cancel_event
+                )
+            
+            timings['subprocess'] = time.perf_counter() - phase_start
+            if cancelled:
+                return False, {'error': "Evaluation cancelled", 'error_type': 'cancelled'}
+            
+            captured = {'frames': load_captured_frames(capture_path)} if capture_path else {}
             
             # Check if there was an error
-            if result.returncode != 0:
-                # Get the error output
-                error_output = result.stderr
-                
-                # Extract the relevant part of the error message
-                # This will include the code snippet with the pointer
-                return False, {'error': error_output, 'error_type': 'runtime', 'stdout': result.stdout}
+            if returncode != 0:
+                # Reduce the output to the exception and the failing user-code line;
+                # the full output is kept in raw_error
+                details = distill_error(stderr, code_string, temp_file)
+                details.update({'error_type': 'runtime', 'stdout': stdout, 'raw_error': stderr}, **captured)
+                # Worker crashes and signal deaths (e.g. the OOM killer) say nothing about the code,
+                # and neither does an exit without a traceback; 'crash' results are never cached
+                if crashed or returncode < 0 or details['error_class'] is None:
+                    details['error_type'] = 'crash'
+                    if returncode < 0:
+                        details['error'] = "\n".join(filter(None, [f"Render process killed by signal {-returncode}",
+                                                                   details['error']]))
+                return False, details
             
             # If we get here, execution was successful
-            return True, {'message': 'Code executed successfully', 'stdout': result.stdout}
+            return True, {'message': 'Code executed successfully', 'stdout': stdout, **captured}
             
         except subprocess.TimeoutExpired:
+            timings['subprocess'] = time.perf_counter() - phase_start
             return False, {'error': "Code execution timed out after 30 seconds", 'error_type': 'timeout'}
         except Exception as e:
-            # Fallback to the in-process execution if subprocess fails
-            globals_dict = {'return_dict': {}}
-            
-            try:
-                # Execute the code
-                exec(compiled_code, globals_dict)
-                return True, {'message': 'Code executed successfully'}
-            except Exception as e:
-                # Capture the full traceback
-                exc_type, exc_value, exc_traceback = sys.exc_info()
-                tb_lines = traceback.format_exception(exc_type, exc_value, exc_traceback)
-                full_traceback = ''.join(tb_lines)
-                
-                error_class = e.__class__.__name__
-                error_message = str(e)
-                full_error = f"{error_class}: {error_message}\n\nFull traceback:\n{full_traceback}"
-                
-                return False, {'error': full_error, 'error_type': 'runtime'}
+            # Never fall back to running the code in this process: it would render
+            # outside the job directory and run generated code in the caller
+            timings['subprocess'] = time.perf_counter() - phase_start
+            return False, {'error': f"Error running the render process: {str(e)}", 'error_type': 'evaluation'}
     
     except Exception as e:
         # Handle any unexpected errors in our evaluation code
@@ -0,0 +1,186 @@
+import os
+import re
+
+# Python traceback frame: File "path", line N, in function
+FRAME_PATTERN = re.compile(r'File "(?P<file>[^"]+)", line (?P<line>\d+), in (?P<function>\S+)')
+
+# Frame header of rich's traceback panels, as installed by manim: path:N in function
+RICH_FRAME_PATTERN = re.compile(r'(?P<file>[^\s│]+\.py):(?P<line>\d+) in (?P<function>[^\s│]+)')
+
+# Final exception line: ExceptionClass: message
+EXCEPTION_PATTERN = re.compile(r'^(?P<type>[A-Za-z_][\w.]*(?:Error|Exception|Exit|Interrupt))(?::\s*(?P<message>.*))?$')
+
+# Box-drawing characters rich uses to frame tracebacks
+RICH_BOX_CHARS = "│╭╮╰╯─❱ "
+
+# Normalized error categories, keyed on the exception class name
+ERROR_CATEGORIES = {
+    'NameError': 'undefined_name',
+    'UnboundLocalError': 'undefined_name',
+    'ImportError': 'import',
+    'ModuleNotFoundError': 'import',
+    'AttributeError': 'attribute',
+    'TypeError': 'type',
+    'ValueError': 'value',
+    'IndexError': 'index',
+    'KeyError': 'index',
+    'ZeroDivisionError': 'math',
+    'FloatingPointError': 'math',
+    'OverflowError': 'math',
+    'AssertionError': 'assertion',
+    'NotImplementedError': 'not_implemented',
+    'RecursionError': 'recursion',
+    'MemoryError': 'resources',
+    'FileNotFoundError': 'file',
+    'SyntaxError': 'syntax',
+    'IndentationError': 'syntax',
+}
+
+# Messages that identify a category regardless of the exception class
+MESSAGE_CATEGORIES = [
+    (re.compile(r'latex error|\.tex\b|dvisvgm', re.IGNORECASE), 'latex'),
+    (re.compile(r'overlap', re.IGNORECASE), 'overlap'),
+]
+
+# Parts of a message that differ between otherwise identical errors
+SIGNATURE_SUBSTITUTIONS = [
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "'<str>'"),
+    (re.compile(r'0x[0-9a-fA-F]+'), '<addr>'),
+    (re.compile(r'(?:[A-Za-z]:)?(?:/[\w.\-]+)+'), '<path>'),
+    (re.compile(r'-?\d+(?:\.\d+)?'), '<num>'),
+]
+
+
+def _strip_rich_box(line):
+    return line.strip(RICH_BOX_CHARS).rstrip()
+
+
+def parse_traceback(stderr):
+    """
+    Extracts the frames and the exception from a traceback in process output.
+
+    Understands both plain Python tracebacks and rich-formatted ones; lines that
+    belong to neither (logging, LaTeX and cairo noise) are ignored.
+
+    Args:
+        stderr (str): Output of the failed process
+
+    Returns:
+        tuple: (frames, exception_type, message), where frames is a list of
+               (file, line, function) tuples from the outermost to the innermost call
+    """
+    frames = []
+    for line in stderr.splitlines():
+        match = FRAME_PATTERN.search(line) or RICH_FRAME_PATTERN.search(line)
+        if match:
+            frames.append((match.group('file'), int(match.group('line')), match.group('function')))
+
+    exception_type, message = None, ''
+    for line in reversed(stderr.splitlines()):
+        match = EXCEPTION_PATTERN.match(_strip_rich_box(line))
+        if match:
+            exception_type = match.group('type').rsplit('.', 1)[-1]
+            message = (match.group('message') or '').strip()
+            break
+    return frames, exception_type, message
+
+
+def categorize_error(exception_type, message):
+    """Maps an exception class and message to a normalized error category"""
+    for pattern, category in MESSAGE_CATEGORIES:
+        if pattern.search(message):
+            return category
+    return ERROR_CATEGORIES.get(exception_type, 'other' if exception_type else 'unknown')
+
+
+def error_signature(exception_type, message):
+    """
+    Builds a signature that is equal for errors of the same kind.
+
+    Names, paths and numbers are replaced by placeholders, so for example every
+    "name 'X' is not defined" error shares one signature.
+
+    Args:
+        exception_type (str): Exception class name
+        message (str): Exception message
+
+    Returns:
+        str: The signature
+    """
+    normalized = message
+    for pattern, replacement in SIGNATURE_SUBSTITUTIONS:
+        normalized = pattern.sub(replacement, normalized)
+    return f"{exception_type or 'UnknownError'}: {normalized}"
+
+
+def code_snippet(code_string, line_number, context_lines=2):
+    """
+    Returns the lines around line_number, numbered, with the failing line marked.
+
+    Args:
+        code_string (str): The source code
+        line_number (int): 1-based line to center on
+        context_lines (int): Number of lines shown before and after it
+
+    Returns:
+        str: The snippet, or '' if the line is outside the code
+    """
+    lines = code_string.splitlines()
+    if not 1 <= line_number <= len(lines):
+        return ''
+    start = max(1, line_number - context_lines)
+    end = min(len(lines), line_number + context_lines)
+    width = len(str(end))
+    return "\n".join(
+        f"{'>' if number == line_number else ' '} {number:>{width}} | {lines[number - 1]}"
+        for number in range(start, end + 1)
+    )
+
+
+def distill_error(stderr, code_string, script_path, context_lines=2):
+    """
+    Turns the raw output of a failed run into a compact, structured error.
+
+    The failing line is the innermost traceback frame in script_path, the file
+    the user code was compiled as, so its line numbers are user-code line numbers.
+
+    Args:
+        stderr (str): Output of the failed process
+        code_string (str): The code that was run
+        script_path (str): Path the code was run (compiled) as
+        context_lines (int): Lines of context around the failing line in the snippet
+
+    Returns:
+        dict: 'error' (compact message for the fix prompt), 'error_class',
+              'error_category', 'error_signature', 'error_line' and 'error_function'
+    """
+    frames, exception_type, message = parse_traceback(stderr)
+
+    # Frames past the last line belong to the injected render block, not to the user code
+    script_name = os.path.basename(script_path)
+    line_count = len(code_string.splitlines())
+    user_frames = [frame for frame in frames
+                   if (frame[0] == script_path or os.path.basename(frame[0]) == script_name)
+                   and frame[1] <= line_count]
+    line_number, function = (user_frames[-1][1], user_frames[-1][2]) if user_frames else (None, None)
+    snippet = code_snippet(code_string, line_number, context_lines) if line_number else ''
+
+    if exception_type:
+        headline = f"{exception_type}: {message}" if message else exception_type
+    else:
+        # No recognizable traceback; fall back to the last lines of output
+        headline = "\n".join(_strip_rich_box(line) for line in stderr.strip().splitlines()[-5:])
+
+    parts = [headline]
+    if line_number:
+        parts.append(f"at line {line_number}, in {function}:")
+        if snippet:
+            parts.append(snippet)
+    return {
+        'error': "\n".join(parts),
+        'error_class': exception_type,
+        'error_category': categorize_error(exception_type, message),
+        'error_signature': error_signature(exception_type, message if exception_type else headline),
+        'error_line': line_number,
+        'error_function': function,
+    }
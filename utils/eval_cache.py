@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import contextlib
+
+# Default location of the on-disk evaluation cache
+DEFAULT_CACHE_PATH = os.path.join('temp', 'eval_cache.sqlite')
+
+# Error types that depend on the code alone, so caching them is safe.
+# Timeouts, crashes (worker failures, signal deaths) and internal evaluation
+# errors can be transient and are never cached.
+CACHEABLE_ERROR_TYPES = ('syntax', 'processing', 'runtime')
+
+# Version of the stored details format; bumped whenever its fields or the key change
+CACHE_FORMAT_VERSION = 3
+
+
+def get_manim_version():
+    """Returns the installed manim version, or 'unknown' if it cannot be determined"""
+    try:
+        import manim
+        return getattr(manim, '__version__', 'unknown')
+    except ImportError:
+        return 'unknown'
+
+
+def make_cache_key(code_string, settings):
+    """
+    Builds the cache key for an evaluation.
+
+    The key covers the code exactly as submitted: cached failures hold line
+    numbers and snippets of that source, so code differing only in comments
+    or layout must not share an entry.
+
+    Args:
+        code_string (str): The code as passed to eval_manim_code
+        settings (dict): The tempconfig settings used for rendering
+
+    Returns:
+        str: Hex digest identifying the evaluation
+    """
+    hasher = hashlib.sha256()
+    hasher.update(code_string.encode('utf-8'))
+    hasher.update(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    hasher.update(get_manim_version().encode('utf-8'))
+    hasher.update(str(CACHE_FORMAT_VERSION).encode('utf-8'))
+    return hasher.hexdigest()
+
+
+class EvalCache:
+    """
+    Persistent SQLite cache of eval_manim_code results.
+
+    Entries are keyed on make_cache_key() and hold the success flag and the
+    details dict (error, stdout, artifact paths). When the stored entries grow
+    past max_size_mb, the least recently used ones are evicted. Safe to share
+    between threads and processes; every operation opens its own connection.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_size_mb=256):
+        """
+        Open (and create if needed) the cache.
+
+        Args:
+            path (str): Path of the SQLite database
+            max_size_mb (float): Maximum total size of stored entries in megabytes
+        """
+        self.path = path
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    success INTEGER NOT NULL,
+                    details TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Yields a connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """
+        Looks up a cached result and marks it as recently used.
+
+        Args:
+            key (str): Cache key from make_cache_key()
+
+        Returns:
+            tuple: (success, details), or None on a miss
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT success, details FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        return bool(row[0]), json.loads(row[1])
+
+    def put(self, key, success, details):
+        """
+        Stores a result and evicts least recently used entries if over the size limit.
+
+        Args:
+            key (str): Cache key from make_cache_key()
+            success (bool): Whether the evaluation succeeded
+            details (dict): The evaluation details
+        """
+        payload = json.dumps(details)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, success, details, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, int(success), payload, len(payload), time.time())
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        evicted_keys = []
+        for key, size in conn.execute("SELECT key, size FROM results ORDER BY last_access ASC"):
+            if total <= self.max_size_bytes:
+                break
+            evicted_keys.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM results WHERE key = ?", evicted_keys)
+
+    def clear(self):
+        """Removes all cached results"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
@@ -0,0 +1,95 @@
+import io
+import zipfile
+import numpy as np
+from PIL import Image
+
+# File in the job directory the evaluation child writes its captured frames to.
+# The child runs generated code, so the file is plain arrays the parent loads
+# without unpickling.
+CAPTURE_FILE = 'captured_frames.npz'
+
+# Upper bound on captured frames per scene, so runaway scenes can't fill memory
+MAX_CAPTURED_FRAMES = 64
+
+
+def encode_frame(pixels):
+    """
+    Compresses a camera pixel array.
+
+    Args:
+        pixels (np.ndarray): RGB or RGBA pixel array of shape (height, width, channels)
+
+    Returns:
+        bytes: PNG bytes of the frame (fast compression; the frames are short-lived)
+    """
+    buffer = io.BytesIO()
+    Image.fromarray(np.asarray(pixels, dtype=np.uint8)).convert("RGB").save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def snapshot(scene):
+    """
+    Renders the scene's current state and returns the camera's pixel array.
+
+    update_frame renders even when the renderer skips animation frames, so this
+    works in tiers that never write a movie.
+    """
+    scene.renderer.update_frame(scene)
+    return scene.renderer.get_frame()
+
+
+def install_capture_hook(max_frames=MAX_CAPTURED_FRAMES):
+    """
+    Patches manim's Scene.play to snapshot the frame at the end of every play call.
+
+    Args:
+        max_frames (int): Maximum number of frames captured
+
+    Returns:
+        list: The list the (scene time in seconds, PNG bytes) snapshots are appended to
+    """
+    from manim import Scene
+
+    frames = []
+    original_play = Scene.play
+
+    def play(self, *args, **kwargs):
+        result = original_play(self, *args, **kwargs)
+        if len(frames) < max_frames:
+            frames.append((float(self.renderer.time), encode_frame(snapshot(self))))
+        return result
+
+    Scene.play = play
+    return frames
+
+
+def save_captured_frames(frames, path):
+    """Writes captured frames for the parent process to pick up: their times and one uint8 array of PNG bytes each"""
+    arrays = {f"frame_{i}": np.frombuffer(data, dtype=np.uint8) for i, (_, data) in enumerate(frames)}
+    with open(path, 'wb') as f:
+        np.savez(f, times=np.array([timestamp for timestamp, _ in frames], dtype=np.float64), **arrays)
+
+
+def load_captured_frames(path, max_frames=MAX_CAPTURED_FRAMES):
+    """
+    Reads the frames written by save_captured_frames.
+
+    The file is loaded with allow_pickle=False, so whatever the scene code
+    wrote there can't run code in this process.
+
+    Returns:
+        list: (scene time in seconds, PNG bytes) tuples, or an empty list if nothing
+              (readable) was captured
+    """
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            times = data["times"]
+            return [(float(timestamp), data[f"frame_{i}"].astype(np.uint8, copy=False).tobytes())
+                    for i, timestamp in enumerate(times.reshape(-1)[:max_frames])]
+    except (OSError, KeyError, ValueError, TypeError, zipfile.BadZipFile):
+        return []
+
+
+def decode_frames(frames):
+    """Turns captured (time, PNG bytes) frames into (time, PIL.Image) tuples"""
+    return [(timestamp, Image.open(io.BytesIO(data))) for timestamp, data in frames]
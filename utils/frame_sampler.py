@@ -0,0 +1,207 @@
+import io
+import base64
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from utils.frame_capture import decode_frames
+
+# Video extensions the critic samples frames from instead of sending as-is
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.webm', '.gif')
+
+
+def iter_video_frames(video_path, fps=1.0):
+    """
+    Decodes a video and yields frames at (roughly) the requested rate.
+
+    Args:
+        video_path (str): Path of the rendered video
+        fps (float): Frames to keep per second of video
+
+    Yields:
+        tuple: (timestamp in seconds, PIL.Image) of each sampled frame
+    """
+    # PyAV ships with manim, which uses it to write the videos
+    import av
+
+    interval = 1.0 / fps
+    next_timestamp = 0.0
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+        for frame in container.decode(stream):
+            timestamp = float(frame.time) if frame.time is not None else next_timestamp
+            if timestamp + 1e-6 >= next_timestamp:
+                yield timestamp, frame.to_image()
+                # Skip ahead by whole intervals so long gaps don't produce bursts of frames
+                next_timestamp += interval * (int((timestamp - next_timestamp) / interval) + 1)
+
+
+def dhash(image, hash_size=8):
+    """
+    Computes the difference hash of an image.
+
+    Args:
+        image (PIL.Image): The image
+        hash_size (int): Width and height of the hash grid (hash_size ** 2 bits)
+
+    Returns:
+        int: The hash
+    """
+    pixels = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(hash_a, hash_b):
+    """Returns the number of differing bits between two hashes"""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def dedupe_frames(frames, threshold=4, hash_size=8):
+    """
+    Drops frames that look almost the same as the last kept frame.
+
+    Args:
+        frames (iterable): (timestamp, PIL.Image) tuples in playback order
+        threshold (int): Maximum dHash distance at which a frame counts as a duplicate
+        hash_size (int): dHash grid size
+
+    Returns:
+        list: The kept (timestamp, PIL.Image) tuples
+    """
+    kept = []
+    last_hash = None
+    for timestamp, image in frames:
+        frame_hash = dhash(image, hash_size)
+        if last_hash is None or hamming_distance(frame_hash, last_hash) > threshold:
+            kept.append((timestamp, image))
+            last_hash = frame_hash
+    return kept
+
+
+def tile_contact_sheet(frames, columns=3, thumb_width=384, first_number=1, padding=4):
+    """
+    Tiles frames into one numbered contact sheet.
+
+    Args:
+        frames (list): (timestamp, PIL.Image) tuples
+        columns (int): Number of thumbnails per row
+        thumb_width (int): Width of each thumbnail in pixels
+        first_number (int): Number shown on the first thumbnail
+        padding (int): Pixels between thumbnails
+
+    Returns:
+        PIL.Image: The contact sheet
+    """
+    width, height = frames[0][1].size
+    thumb_height = max(1, round(height * thumb_width / width))
+    rows = (len(frames) + columns - 1) // columns
+    sheet = Image.new("RGB", (
+        columns * thumb_width + (columns + 1) * padding,
+        rows * thumb_height + (rows + 1) * padding
+    ), "white")
+    draw = ImageDraw.Draw(sheet)
+    try:
+        font = ImageFont.load_default(size=max(12, thumb_width // 20))
+    except TypeError:  # Pillow < 10.1 only has the fixed-size bitmap font
+        font = ImageFont.load_default()
+
+    for index, (timestamp, image) in enumerate(frames):
+        x = padding + (index % columns) * (thumb_width + padding)
+        y = padding + (index // columns) * (thumb_height + padding)
+        sheet.paste(image.convert("RGB").resize((thumb_width, thumb_height), Image.LANCZOS), (x, y))
+        label = f"#{first_number + index} @ {timestamp:.1f}s"
+        left, top, right, bottom = draw.textbbox((x + 4, y + 4), label, font=font)
+        draw.rectangle((left - 2, top - 2, right + 2, bottom + 2), fill="black")
+        draw.text((x + 4, y + 4), label, fill="yellow", font=font)
+    return sheet
+
+
+class FrameSampler:
+    """
+    Turns a rendered video into a few numbered contact sheets for the critic.
+
+    Frames are decoded at fps, near-duplicates (dHash distance at most
+    dedupe_threshold from the last kept frame) are dropped, and the rest are
+    downscaled and tiled, rows x columns per sheet. If more frames remain than
+    max_sheets can hold, an evenly spaced subset is kept.
+    """
+    def __init__(self, fps=1.0, dedupe_threshold=4, columns=3, rows=3, max_sheets=2, thumb_width=384,
+                 image_format="PNG"):
+        """
+        Args:
+            fps (float): Frames sampled per second of video
+            dedupe_threshold (int): dHash distance at or below which frames count as duplicates
+            columns (int): Thumbnails per row of a sheet
+            rows (int): Rows per sheet
+            max_sheets (int): Maximum number of sheets per video
+            thumb_width (int): Width of each thumbnail in pixels
+            image_format (str): Format the sheets are encoded in ('PNG' or 'JPEG')
+        """
+        self.fps = fps
+        self.dedupe_threshold = dedupe_threshold
+        self.columns = columns
+        self.rows = rows
+        self.max_sheets = max_sheets
+        self.thumb_width = thumb_width
+        self.image_format = image_format.upper()
+
+    @property
+    def mime_type(self):
+        return f"image/{self.image_format.lower()}"
+
+    def sample(self, video_path):
+        """
+        Returns the deduplicated frames of a video that go on the sheets.
+
+        Returns:
+            list: (timestamp, PIL.Image) tuples
+        """
+        return self.select(iter_video_frames(video_path, self.fps))
+
+    def select(self, frames):
+        """
+        Drops near-duplicate frames and keeps an evenly spaced subset that fits on the sheets.
+
+        Args:
+            frames (iterable): (timestamp, PIL.Image) tuples in playback order
+
+        Returns:
+            list: The selected (timestamp, PIL.Image) tuples
+        """
+        frames = dedupe_frames(frames, self.dedupe_threshold)
+        capacity = self.columns * self.rows * self.max_sheets
+        if len(frames) > capacity:
+            indices = np.linspace(0, len(frames) - 1, capacity).round().astype(int)
+            frames = [frames[i] for i in indices]
+        return frames
+
+    def contact_sheets(self, frames):
+        """Tiles sampled frames into numbered contact sheets"""
+        per_sheet = self.columns * self.rows
+        return [
+            tile_contact_sheet(frames[start:start + per_sheet], self.columns, self.thumb_width, first_number=start + 1)
+            for start in range(0, len(frames), per_sheet)
+        ]
+
+    def encode(self, image):
+        """Encodes an image in image_format and returns it base64-encoded"""
+        buffer = io.BytesIO()
+        if self.image_format == "JPEG":
+            image.convert("RGB").save(buffer, format="JPEG", quality=85, optimize=True)
+        else:
+            image.save(buffer, format=self.image_format, optimize=True)
+        return base64.b64encode(buffer.getvalue()).decode()
+
+    def __call__(self, source):
+        """
+        Samples a video, or frames captured while rendering, into contact sheets.
+
+        Args:
+            source (str or list): Path of the rendered video, or (scene time, PNG bytes)
+                                  frames as returned by eval_manim_code(capture_frames=True)
+
+        Returns:
+            list: Base64-encoded contact sheet images
+        """
+        frames = self.sample(source) if isinstance(source, str) else self.select(decode_frames(source))
+        return [self.encode(sheet) for sheet in self.contact_sheets(frames)] if frames else []
@@ -0,0 +1,330 @@
+import os
+import sys
+import time
+import queue
+import signal
+import runpy
+import marshal
+import builtins
+import traceback
+import threading
+import multiprocessing
+
+# Modules imported once by every warm worker, so forked jobs start with them loaded
+PRELOAD_MODULES = ["manim", "numpy"]
+
+# Sent to a worker to kill the job it is running
+CANCEL_MESSAGE = 'cancel'
+
+# Seconds between checks of a job's cancel event while waiting for its result
+CANCEL_POLL_INTERVAL = 0.05
+
+# Seconds between checks whether the pool was closed while waiting for a free worker
+IDLE_POLL_INTERVAL = 0.1
+
+
+def exec_compiled(code_path, script_path, capture_path=None):
+    """
+    Executes a marshalled code object as __main__ with fresh globals.
+
+    Args:
+        code_path (str): Path of the file written with marshal.dump
+        script_path (str): Path of the source file the code was compiled from
+        capture_path (str, optional): If given, a frame is captured at the end of every
+                                      Scene.play call and the frames are written here
+    """
+    with open(code_path, 'rb') as f:
+        code = marshal.load(f)
+    sys.argv = [script_path]
+    if not capture_path:
+        exec(code, {'__name__': '__main__', '__file__': script_path, '__builtins__': builtins})
+        return
+
+    from utils.frame_capture import install_capture_hook, save_captured_frames
+    frames = install_capture_hook()
+    try:
+        exec(code, {'__name__': '__main__', '__file__': script_path, '__builtins__': builtins})
+    finally:
+        # Frames up to a failure are still useful to the critic
+        save_captured_frames(frames, capture_path)
+
+
+def _run_script_in_child(script_path, cwd, code_path=None, capture_path=None):
+    """
+    Runs a script (or its precompiled code object) in the current, freshly
+    forked process and exits. Output is redirected to files in cwd so the
+    worker can collect it.
+    """
+    exit_code = 0
+    try:
+        os.chdir(cwd)
+        stdout_fd = os.open('stdout.txt', os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        stderr_fd = os.open('stderr.txt', os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        if code_path:
+            exec_compiled(code_path, script_path, capture_path)
+        else:
+            sys.argv = [script_path]
+            # run_path executes the script with its own fresh globals
+            runpy.run_path(script_path, run_name='__main__')
+    except SystemExit as e:
+        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def _read_output(path):
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+    except OSError:
+        return ''
+
+
+def _run_job(job, conn=None):
+    """
+    Forks a child for the job, waits for it with a timeout and collects its output.
+    A CANCEL_MESSAGE arriving on conn while the job runs kills the child.
+    """
+    script_path, cwd, timeout = job['script_path'], job['cwd'], job['timeout']
+    pid = os.fork()
+    if pid == 0:
+        _run_script_in_child(script_path, cwd, job.get('code_path'), job.get('capture_path'))
+
+    deadline = time.time() + timeout
+    timed_out = cancelled = False
+    while True:
+        finished_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+        if finished_pid:
+            break
+        cancelled = conn is not None and conn.poll() and conn.recv() == CANCEL_MESSAGE
+        timed_out = time.time() > deadline
+        if cancelled or timed_out:
+            os.kill(pid, signal.SIGKILL)
+            _, status, rusage = os.wait4(pid, 0)
+            break
+        time.sleep(0.01)
+
+    return {
+        'returncode': os.waitstatus_to_exitcode(status),
+        'stdout': _read_output(os.path.join(cwd, 'stdout.txt')),
+        'stderr': _read_output(os.path.join(cwd, 'stderr.txt')),
+        'timed_out': timed_out,
+        'cancelled': cancelled,
+        'max_rss_mb': rusage.ru_maxrss / 1024,
+    }
+
+
+def _worker_main(conn, preload_modules, max_jobs, max_rss_mb):
+    """
+    Entry point of a warm worker process.
+
+    Imports the heavy modules once, then forks a child for every submitted job.
+    Exits after max_jobs jobs or once a job's peak RSS exceeds max_rss_mb,
+    telling the pool to replace it.
+    """
+    # Jobs inherit the worker's own process group, so the pool can kill a
+    # worker together with a job it left running
+    try:
+        os.setpgid(0, 0)
+    except OSError:
+        pass
+
+    for module in preload_modules:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+
+    jobs_done = 0
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        if job == CANCEL_MESSAGE:
+            # Cancellation of a job that finished before the message arrived
+            continue
+
+        try:
+            result = _run_job(job, conn)
+        except Exception as e:
+            result = {'returncode': 1, 'stdout': '', 'stderr': f"Worker error: {str(e)}", 'timed_out': False,
+                      'cancelled': False, 'crashed': True}
+
+        jobs_done += 1
+        result['recycle'] = jobs_done >= max_jobs or result.get('max_rss_mb', 0) > max_rss_mb
+        try:
+            conn.send(result)
+        except OSError:
+            # The pool closed or gave up on this worker while the job ran
+            return
+        if result['recycle']:
+            return
+
+
+class ManimWorkerPool:
+    """
+    Pool of long-lived workers that import manim once and render each submitted
+    scene script in a forked child with isolated globals.
+
+    Workers are recycled after max_jobs_per_worker jobs or after a job whose
+    peak RSS grew past max_rss_mb. The pool is thread-safe: run() blocks until a worker is free.
+    """
+    def __init__(self, size=None, max_jobs_per_worker=100, max_rss_mb=2048, preload_modules=None):
+        """
+        Start the pool.
+
+        Args:
+            size (int, optional): Number of workers (defaults to the CPU count)
+            max_jobs_per_worker (int): Number of jobs after which a worker is replaced
+            max_rss_mb (float): Peak job RSS in megabytes after which a worker is replaced
+            preload_modules (list, optional): Modules each worker imports up front
+        """
+        self.size = size or os.cpu_count() or 1
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_rss_mb = max_rss_mb
+        self.preload_modules = preload_modules if preload_modules is not None else PRELOAD_MODULES
+
+        # forkserver keeps worker startup cheap once the server has imported manim
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self._ctx = multiprocessing.get_context('forkserver')
+            self._ctx.set_forkserver_preload(self.preload_modules)
+        else:
+            self._ctx = multiprocessing.get_context('spawn')
+
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._closed = False
+        for _ in range(self.size):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.preload_modules, self.max_jobs_per_worker, self.max_rss_mb),
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        worker = (process, parent_conn)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _retire_worker(self, worker):
+        process, conn = worker
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        conn.close()
+        process.join(timeout=1)
+        # Kill the worker's whole process group: after a crash or a timeout the
+        # forked job may still be running, even if the worker itself is gone
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        process.join()
+
+    def _get_idle_worker(self):
+        """Blocks until a worker is free; raises RuntimeError once the pool is closed"""
+        while True:
+            if self._closed:
+                raise RuntimeError("ManimWorkerPool is closed")
+            try:
+                return self._idle.get(timeout=IDLE_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+    def _release_worker(self, worker, replace):
+        """Hands a worker back after a job, replacing it first if needed; a closed pool gets no workers back"""
+        if replace:
+            self._retire_worker(worker)
+            if self._closed:
+                return
+            worker = self._start_worker()
+        if self._closed:
+            # close() may have taken its list of workers before this one started
+            self._retire_worker(worker)
+        else:
+            self._idle.put(worker)
+
+    def run(self, script_path, cwd, timeout=30, code_path=None, cancel_event=None, capture_path=None):
+        """
+        Runs a script in a warm worker.
+
+        Args:
+            script_path (str): Path of the script to execute
+            cwd (str): Working directory for the script
+            timeout (float): Seconds after which the job is killed
+            code_path (str, optional): Marshalled code object compiled from script_path;
+                                       executed instead of re-reading and compiling the script
+            cancel_event (threading.Event, optional): Setting it kills the running job
+            capture_path (str, optional): File the job writes its captured frames to
+                                          (see exec_compiled; needs code_path)
+
+        Returns:
+            dict: 'returncode', 'stdout', 'stderr', 'timed_out' and 'cancelled' of the job;
+                  'crashed' is set if the worker failed rather than the job
+        """
+        worker = self._get_idle_worker()
+        process, conn = worker
+        result = None
+        try:
+            conn.send({
+                'script_path': os.path.abspath(script_path),
+                'code_path': os.path.abspath(code_path) if code_path else None,
+                'capture_path': os.path.abspath(capture_path) if capture_path else None,
+                'cwd': os.path.abspath(cwd),
+                'timeout': timeout
+            })
+            # The worker enforces the timeout itself; the margin covers fork and output collection
+            deadline = time.time() + timeout + 10
+            cancel_sent = False
+            while not conn.poll(CANCEL_POLL_INTERVAL):
+                if cancel_event is not None and cancel_event.is_set() and not cancel_sent:
+                    conn.send(CANCEL_MESSAGE)
+                    cancel_sent = True
+                if time.time() > deadline:
+                    raise TimeoutError("Worker did not respond")
+            result = conn.recv()
+        except (EOFError, OSError, TimeoutError) as e:
+            return {'returncode': 1, 'stdout': '', 'stderr': f"Worker crashed: {str(e)}", 'timed_out': False,
+                    'cancelled': False, 'crashed': True}
+        finally:
+            # Without a result (crash, timeout, interrupt) the worker's state is unknown; replace it
+            self._release_worker(worker, replace=result is None or result.pop('recycle', False))
+        return result
+
+    def close(self):
+        """Stops all workers"""
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+        for process, conn in workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            self._retire_worker(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import threading
+import contextlib
+import contextvars
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Prefix of every exported Prometheus metric
+METRIC_PREFIX = "animai"
+
+# Span attributes that become Prometheus labels; everything else only goes to the JSONL log
+PROMETHEUS_LABELS = ("stage", "tier", "phase", "generator", "model", "success", "cached")
+
+# Histogram buckets in seconds; LLM calls take seconds to minutes, eval phases milliseconds to seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+RATE_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed section of work; attributes can be added while it runs"""
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.attrs = attrs
+        self.start = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attrs):
+        """Adds attributes to the span"""
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {"name": self.name, "trace_id": self.trace_id, "span_id": self.span_id,
+                "parent_id": self.parent_id, "start": self.start, "duration": self.duration, **self.attrs}
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRecorder:
+    """
+    Collects timing spans and metrics of a run.
+
+    Spans nest: a span started while another is active (in the same thread or
+    asyncio task) becomes its child, so every span of a prompt shares the
+    trace id of its outermost span. Finished spans are appended to a JSONL
+    file (if one is set) and aggregated into Prometheus histograms, which can
+    be written to a file in the text exposition format or served over HTTP.
+    """
+    def __init__(self, jsonl_path=None):
+        """
+        Args:
+            jsonl_path (str, optional): File finished spans are appended to, one JSON object per line
+        """
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._jsonl = None
+        self._server = None
+        if jsonl_path:
+            directory = os.path.dirname(jsonl_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._jsonl = open(jsonl_path, "a", encoding="utf-8")
+
+    @contextlib.contextmanager
+    def span(self, name, **attrs):
+        """
+        Times the enclosed block as a span.
+
+        Args:
+            name (str): Name of the span (e.g. 'scene_script' or 'eval.subprocess')
+            **attrs: Attributes of the span
+
+        Yields:
+            Span: The span, to add attributes to while it runs
+        """
+        span = Span(name, _current_span.get(), **attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.duration = time.perf_counter() - span._start
+            self._finish(span)
+
+    def record_span(self, name, duration, **attrs):
+        """
+        Records a span that was timed elsewhere (e.g. in another process) as a child of the current span.
+
+        Args:
+            name (str): Name of the span
+            duration (float): Its duration in seconds
+            **attrs: Attributes of the span
+        """
+        span = Span(name, _current_span.get(), **attrs)
+        span.duration = duration
+        span.start -= duration
+        self._finish(span)
+
+    def _finish(self, span):
+        labels = {key: span.attrs[key] for key in PROMETHEUS_LABELS if span.attrs.get(key) is not None}
+        self.observe("span_duration_seconds", span.duration, span=span.name, **labels)
+        if self._jsonl is not None:
+            line = json.dumps(span.to_dict(), default=str)
+            with self._lock:
+                self._jsonl.write(line + "\n")
+                self._jsonl.flush()
+
+    def observe(self, metric, value, buckets=DURATION_BUCKETS, **labels):
+        """Adds a value to a histogram metric"""
+        key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, metric, value=1, **labels):
+        """Adds to a counter metric"""
+        key = (metric, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def record_llm_call(self, span, completion_tokens, first_token_time=None, sent_time=None):
+        """
+        Adds LLM throughput attributes to a span and to the metrics.
+
+        Args:
+            span (Span): The span of the call (started when the request was queued)
+            completion_tokens (int): Number of generated tokens
+            first_token_time (float, optional): time.perf_counter() when the first chunk arrived
+                                                (streams only)
+            sent_time (float, optional): time.perf_counter() when the request was sent, i.e. when
+                                         the rate limiter granted it a slot (the span start if None)
+        """
+        now = time.perf_counter()
+        labels = {key: span.attrs[key] for key in ("generator", "model") if span.attrs.get(key)}
+        attrs = {"completion_tokens": completion_tokens}
+        if sent_time is None:
+            sent_time = span._start
+        else:
+            # Waiting for the rate limiter, including backoffs of failed attempts
+            attrs["queue_wait"] = sent_time - span._start
+            self.observe("llm_queue_wait_seconds", attrs["queue_wait"], **labels)
+        if first_token_time is not None:
+            attrs["ttft"] = first_token_time - sent_time
+            self.observe("llm_time_to_first_token_seconds", attrs["ttft"], **labels)
+            # Generation speed after the first token, so server-side queueing doesn't count against it
+            generation_time = now - first_token_time
+        else:
+            generation_time = now - sent_time
+        if generation_time > 0:
+            attrs["tokens_per_second"] = completion_tokens / generation_time
+            self.observe("llm_tokens_per_second", attrs["tokens_per_second"], buckets=RATE_BUCKETS, **labels)
+        self.increment("llm_completion_tokens_total", completion_tokens, **labels)
+        span.set(**attrs)
+
+    def render_prometheus(self):
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics
+        """
+        def label_text(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            for metric in sorted({m for m, _ in self._histograms}):
+                name = f"{METRIC_PREFIX}_{metric}"
+                lines.append(f"# TYPE {name} histogram")
+                for (m, labels), histogram in sorted(self._histograms.items()):
+                    if m != metric:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{label_text(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{label_text(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{label_text(labels)} {histogram.count}")
+            for metric in sorted({m for m, _ in self._counters}):
+                name = f"{METRIC_PREFIX}_{metric}"
+                lines.append(f"# TYPE {name} counter")
+                for (m, labels), value in sorted(self._counters.items()):
+                    if m == metric:
+                        lines.append(f"{name}{label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Writes the metrics to a file (e.g. for node_exporter's textfile collector)"""
+        partial_path = f"{path}.{os.getpid()}.tmp"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(partial_path, path)
+
+    def serve_prometheus(self, port, host="127.0.0.1"):
+        """
+        Serves the metrics at http://host:port/metrics from a background thread.
+
+        Returns:
+            ThreadingHTTPServer: The server (stopped by close)
+        """
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = recorder.render_prometheus().encode("utf-8")
+                self.send_response(200 if self.path.startswith("/metrics") else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def close(self):
+        """Stops the HTTP endpoint and closes the JSONL file"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._jsonl is not None:
+            with self._lock:
+                self._jsonl.close()
+                self._jsonl = None
+
+
+_recorder = MetricsRecorder()
+
+
+def get_recorder():
+    """Returns the process-wide metrics recorder"""
+    return _recorder
+
+
+def configure_metrics(jsonl_path=None, prometheus_port=None):
+    """
+    Replaces the process-wide recorder with one that writes spans to jsonl_path
+    and, with prometheus_port, serves the metrics over HTTP.
+
+    Returns:
+        MetricsRecorder: The new recorder
+    """
+    global _recorder
+    _recorder.close()
+    _recorder = MetricsRecorder(jsonl_path)
+    if prometheus_port:
+        _recorder.serve_prometheus(prometheus_port)
+    return _recorder
+
+
+def span(name, **attrs):
+    """Times the enclosed block as a span of the process-wide recorder (see MetricsRecorder.span)"""
+    return _recorder.span(name, **attrs)
+
+
+def record_eval_timings(details, tier=None):
+    """
+    Records the phase timings eval_manim_code returns in details['timings'] as spans.
+
+    Evaluations often run in pool processes, so they report their phases
+    instead of recording spans themselves.
+
+    Args:
+        details (dict): Details returned by eval_manim_code or eval_manim_code_tiers
+        tier (str, optional): Tier the timings belong to
+    """
+    tier_timings = details.get("tier_timings") or {tier or details.get("tier"): details.get("timings") or {}}
+    for tier_name, timings in tier_timings.items():
+        for phase, duration in timings.items():
+            _recorder.record_span(f"eval.{phase}", duration, tier=tier_name, phase=phase)